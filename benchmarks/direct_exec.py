@@ -0,0 +1,61 @@
+"""
+Compare shell and direct execution of simple commands.
+
+Runs plans of simple commands (the kind ``direct_argv`` accepts) with the
+shell-less fast path on and off and reports wall time per command.
+
+Usage: python benchmarks/direct_exec.py [plan size] [rounds]
+"""
+
+import asyncio
+import sys
+import time
+
+from pilotcmd.executor.command_executor import CommandExecutor
+from pilotcmd.executor.direct_exec import direct_argv
+from pilotcmd.nlp.parser import Command
+from pilotcmd.os_utils.detector import OSDetector
+
+UNIX_COMMANDS = ["true", "uname -a", "ls -la", "id", "date", "pwd -P"]
+WINDOWS_COMMANDS = ["hostname", "whoami", "where python"]
+
+
+def build_plan(size: int, windows: bool) -> list:
+    candidates = WINDOWS_COMMANDS if windows else UNIX_COMMANDS
+    simple = [command for command in candidates if direct_argv(command, windows)]
+    if not simple:
+        raise SystemExit("No directly executable commands found on this system")
+    return [Command(simple[i % len(simple)], "") for i in range(size)]
+
+
+async def run_plan(executor: CommandExecutor, plan: list) -> float:
+    started = time.perf_counter()
+    results = await executor.execute_commands(plan)
+    elapsed = time.perf_counter() - started
+    failed = [result.command.command for result in results if not result.success]
+    if failed:
+        raise SystemExit(f"Commands failed: {', '.join(sorted(set(failed)))}")
+    return elapsed
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    os_info = OSDetector().detect()
+    plan = build_plan(size, os_info.is_windows())
+
+    timings = {}
+    for label, direct in (("shell", False), ("direct", True)):
+        executor = CommandExecutor(os_info, direct_exec=direct)
+        timings[label] = min(asyncio.run(run_plan(executor, plan)) for _ in range(rounds))
+
+    for label, elapsed in timings.items():
+        print(
+            f"{label:>6}: {elapsed:.3f}s for {size} commands "
+            f"({elapsed / size * 1000:.2f} ms/command)"
+        )
+    print(f"speedup: {timings['shell'] / timings['direct']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Time ranked full-text history searches on a large synthetic history.
+
+Fills a temporary database with entries whose prompts mention one of about
+a thousand topics and reports the mean ``get_history(search=...)`` latency
+for a few queries.
+
+Usage: python benchmarks/history_search.py [entries] [searches]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from pilotcmd.context_db.manager import ContextManager
+
+QUERIES = ["topic42", "topic9", "prompt number 123", "echo"]
+
+
+def build_history(manager: ContextManager, entries: int) -> None:
+    with manager._db.transaction() as cursor:
+        cursor.executemany(
+            """
+            INSERT INTO command_history
+            (timestamp, prompt, commands, os_info, success, execution_time)
+            VALUES ('2024-01-01', ?, ?, '{}', 1, 0)
+            """,
+            [(f"prompt number {i} about topic{i % 997}", f'["echo {i}"]') for i in range(entries)],
+        )
+
+
+def main() -> None:
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    searches = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    with tempfile.TemporaryDirectory() as directory:
+        manager = ContextManager(db_path=str(Path(directory) / "context.db"))
+        if not manager.full_text_search:
+            raise SystemExit("SQLite built without FTS5")
+        started = time.perf_counter()
+        build_history(manager, entries)
+        print(f"indexed {entries} entries in {time.perf_counter() - started:.1f}s")
+
+        for query in QUERIES:
+            started = time.perf_counter()
+            for _ in range(searches):
+                manager.get_history(search=query, limit=10)
+            elapsed = (time.perf_counter() - started) / searches
+            print(f"{elapsed * 1000:7.3f} ms  {query}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Time similar-command lookups on a large synthetic history.
+
+Fills a temporary database with prompts drawn from a Zipf-like vocabulary
+(a few very common words, a long tail of rare ones), indexes them and
+reports the mean ``get_similar_commands`` latency for a few queries.
+
+Usage: python benchmarks/similar_commands.py [entries] [lookups]
+"""
+
+import itertools
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from pilotcmd.context_db import prompt_index
+from pilotcmd.context_db.manager import ContextManager
+
+COMMON_WORDS = ["show", "the", "list", "all", "files", "in", "my", "check", "disk", "network"]
+QUERIES = [
+    "show disk usage of w17",
+    "list the files in w4000",
+    "restart w12 service",
+    "show the network",
+]
+
+
+def build_history(manager: ContextManager, entries: int, rng: random.Random) -> None:
+    vocabulary = COMMON_WORDS + [f"w{i}" for i in range(20000)]
+    weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(vocabulary))))
+    with manager._db.transaction() as cursor:
+        for _ in range(entries):
+            prompt = " ".join(rng.choices(vocabulary, cum_weights=weights, k=rng.randint(3, 8)))
+            cursor.execute(
+                """
+                INSERT INTO command_history
+                (timestamp, prompt, commands, os_info, success, execution_time)
+                VALUES ('', ?, '[]', '{}', 1, 0)
+                """,
+                (prompt,),
+            )
+            prompt_index.index_prompt(cursor, cursor.lastrowid, prompt)
+
+
+def main() -> None:
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    with tempfile.TemporaryDirectory() as directory:
+        manager = ContextManager(db_path=str(Path(directory) / "context.db"))
+        started = time.perf_counter()
+        build_history(manager, entries, random.Random(0))
+        print(f"indexed {entries} prompts in {time.perf_counter() - started:.1f}s")
+
+        for query in QUERIES:
+            started = time.perf_counter()
+            for _ in range(lookups):
+                manager.get_similar_commands(query)
+            elapsed = (time.perf_counter() - started) / lookups
+            print(f"{elapsed * 1000:7.3f} ms  {query}")
+
+
+if __name__ == "__main__":
+    main()
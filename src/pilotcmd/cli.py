@@ -1,24 +1,38 @@
 #!/usr/bin/env python3
 
 import asyncio
+import shlex
 import subprocess
+import time
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, List, Optional, Set
 
 import typer
 from prompt_toolkit import PromptSession
 from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
 from prompt_toolkit.history import FileHistory
 from rich.console import Console
+from rich.markup import escape
 from rich.panel import Panel
-
-from pilotcmd.context_db.manager import ContextManager
-from pilotcmd.executor.command_executor import CommandExecutor
+from rich.table import Table
+
+from pilotcmd.config.manager import ConfigManager
+from pilotcmd.context_db.archive import open_archive, read_archive, write_archive
+from pilotcmd.context_db.manager import MATCH_END, MATCH_START, ContextManager
+from pilotcmd.context_db.retention import PruneReport, RetentionPolicy
+from pilotcmd.executor.command_executor import CommandExecutor, ExecutionResult
+from pilotcmd.executor.fanout import FanoutRunner, TargetResult
+from pilotcmd.executor.persistent_shell import PersistentShell
+from pilotcmd.executor.resources import resource_limits_from_config
+from pilotcmd.executor.result_cache import ResultCache
+from pilotcmd.executor.timeouts import TimeoutPolicy
+from pilotcmd.executor.transports import Transport, expand_targets, read_targets_file
 from pilotcmd.models.factory import ModelFactory
-from pilotcmd.nlp.parser import NLPParser
+from pilotcmd.nlp.parser import Command, NLPParser
 from pilotcmd.nlp.simple_parser import SimpleParser
 from pilotcmd.os_utils.detector import OSDetector
 from pilotcmd.container import is_docker_available
+from pilotcmd.utils.command_signature import command_signature
 
 app = typer.Typer(
     name="pilotcmd",
@@ -29,6 +43,9 @@ app = typer.Typer(
 
 console = Console()
 
+# Plans expected to take at least this many seconds get an ETA up front
+LONG_RUN_SECONDS = 5.0
+
 
 @app.callback()
 def main(
@@ -60,6 +77,71 @@ def main(
     ctx.obj["thinking"] = thinking
 
 
+def _print_analysis(result: ExecutionResult) -> None:
+    """Show the output analyzer's summary for a successful command."""
+    if result.analysis is not None and result.success:
+        console.print(f"[cyan]💡 {result.analysis.summary}[/cyan]")
+
+
+def _print_output_line(command: Command, stream_name: str, line: str) -> None:
+    """Show a line of command output as soon as it arrives."""
+    style = "yellow" if stream_name == "stderr" else None
+    console.print(line, style=style, markup=False, highlight=False)
+
+
+class _PlanProgress:
+    """Spinner naming the running step and the estimated time left."""
+
+    def __init__(self, commands: List[Command], timeout_policy: TimeoutPolicy) -> None:
+        self.commands = commands
+        self.timeout_policy = timeout_policy
+        self.finished: Set[int] = set()
+        self.started_at = time.monotonic()
+        self.status = console.status("Running...")
+
+    def __enter__(self) -> "_PlanProgress":
+        self.status.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.status.stop()
+
+    def __call__(
+        self, index: int, command: Command, result: Optional[ExecutionResult]
+    ) -> None:
+        if result is not None:
+            self.finished.add(index)
+        text = f"Step {index + 1}/{len(self.commands)}: {command.command}"
+        remaining = self.timeout_policy.estimate_plan(
+            [cmd for i, cmd in enumerate(self.commands) if i not in self.finished]
+        )
+        if remaining is not None:
+            text += f" [dim](~{remaining:.0f}s left)[/dim]"
+        else:
+            text += f" [dim]({time.monotonic() - self.started_at:.0f}s elapsed)[/dim]"
+        self.status.update(text)
+
+
+ProgressCallback = Callable[[int, Command, Optional[ExecutionResult]], None]
+
+
+def _chain_progress(*callbacks: ProgressCallback) -> ProgressCallback:
+    """Progress callback forwarding to several callbacks in order."""
+    def progress(index: int, command: Command, result: Optional[ExecutionResult]) -> None:
+        for callback in callbacks:
+            callback(index, command, result)
+
+    return progress
+
+
+def _flush_history(context_manager: ContextManager) -> None:
+    """Commit queued history writes, reporting any that failed."""
+    try:
+        context_manager.flush()
+    except Exception as e:
+        console.print(f"[yellow]⚠️  History was not fully saved: {escape(str(e))}[/yellow]")
+
+
 @app.command("run", help="Execute a natural language command")
 def run_command(
     ctx: typer.Context,
@@ -79,6 +161,29 @@ def run_command(
     thinking: bool = typer.Option(
         False, "--thinking", help="Enable multi-step planning mode with numbered steps"
     ),
+    speculate: bool = typer.Option(
+        False,
+        "--speculate",
+        help="Prefetch read-only commands while waiting for confirmation",
+    ),
+    parallel: int = typer.Option(
+        1,
+        "--parallel",
+        "-p",
+        min=1,
+        help="Run up to N independent commands at the same time",
+    ),
+    stream: bool = typer.Option(
+        True, "--stream/--no-stream", help="Show command output live as it arrives"
+    ),
+    persistent: bool = typer.Option(
+        False,
+        "--persistent",
+        help="Run all steps in one long-lived shell so cd/export carry over",
+    ),
+    fresh: bool = typer.Option(
+        False, "--fresh", help="Ignore cached results of read-only commands"
+    ),
     allowed_commands: Optional[List[str]] = typer.Option(None, hidden=True),
     blocked_commands: Optional[List[str]] = typer.Option(None, hidden=True),
 ) -> None:
@@ -190,21 +295,116 @@ def run_command(
             console.print("[yellow]🔍 Dry run mode - commands not executed[/yellow]")
             # Save to history even in dry run mode
             context_manager.save_prompt(prompt, commands, os_info)
+            _flush_history(context_manager)
             return
 
+        # The shell REPL shares one persistent shell across prompts
+        session_shell = ctx.obj.get("persistent_shell")
+        owned_shell = None
+        if session_shell is None and persistent and PersistentShell.supported(os_info):
+            session_shell = owned_shell = PersistentShell.for_os(os_info)
+
+        # Shared across prompts by the shell REPL, otherwise kept for this plan
+        result_cache = ctx.obj.get("result_cache")
+        if result_cache is None:
+            result_cache = ResultCache()
+
+        config = ConfigManager().get_config()
+        timeout_policy = TimeoutPolicy(
+            context_manager.get_timings(
+                [command_signature(cmd.command) for cmd in commands]
+            ),
+            default_timeout=config.default_timeout,
+        )
+        executor = CommandExecutor(
+            os_info,
+            timeout=config.default_timeout,
+            output_limit=config.output_buffer_size,
+            output_callback=_print_output_line if stream else None,
+            persistent_shell=session_shell,
+            timeout_provider=timeout_policy.timeout_for,
+            resource_limits=resource_limits_from_config(config.resource_limits),
+            result_cache=result_cache,
+            fresh=fresh,
+        )
+        executor.set_parallel(parallel)
+
         # Ask for confirmation unless auto-run is enabled
         if not auto_run:
-            if not typer.confirm(f"→ Run these commands?"):
+            if speculate and executor.start_speculation(commands) and verbose:
+                console.print(
+                    "[dim]→ Prefetching read-only commands while waiting for confirmation[/dim]"
+                )
+            try:
+                confirmed = typer.confirm(f"→ Run these commands?")
+            except (typer.Abort, KeyboardInterrupt):
+                executor.discard_speculation()
+                raise
+            if not confirmed:
+                executor.discard_speculation()
                 console.print("[yellow]Operation cancelled[/yellow]")
                 return
 
-        # Execute commands
-        executor = CommandExecutor(os_info)
+        # Save prompt before execution; each step is stored as it finishes
+        entry_id = context_manager.save_prompt(prompt, commands, os_info)
+        history = context_manager.history_writer(entry_id)
+        executor.progress_callback = history.progress
 
-        # Save prompt before execution
-        context_manager.save_prompt(prompt, commands, os_info)
+        eta = timeout_policy.estimate_plan(commands)
+        if eta is not None and (eta >= LONG_RUN_SECONDS or verbose):
+            console.print(f"[dim]→ Estimated time: ~{eta:.1f}s[/dim]")
+        if verbose:
+            for cmd in commands:
+                console.print(
+                    f"[dim]→ Timeout for {cmd.command}: {executor.timeout_for(cmd):.0f}s[/dim]"
+                )
 
-        results = asyncio.run(executor.execute_commands(commands))
+        try:
+            if console.is_terminal:
+                with _PlanProgress(commands, timeout_policy) as progress:
+                    executor.progress_callback = _chain_progress(history.progress, progress)
+                    results = asyncio.run(executor.execute_commands(commands))
+            else:
+                results = asyncio.run(executor.execute_commands(commands))
+        finally:
+            if owned_shell is not None:
+                owned_shell.close()
+
+        if executor.last_hidden_latency:
+            console.print(
+                f"[dim]→ Speculative prefetch hid {executor.last_hidden_latency:.2f}s of latency[/dim]"
+            )
+
+        if verbose:
+            cache = executor.result_cache
+            if cache is not None:
+                console.print(
+                    f"[dim]→ Result cache: {cache.hits} hits, {cache.misses} misses, "
+                    f"{len(cache)} entries[/dim]"
+                )
+            for result in results:
+                if result.cached:
+                    console.print(f"[dim]→ {result.command.command}: reused cached result[/dim]")
+                resources = result.resource_usage
+                if resources is not None:
+                    console.print(
+                        f"[dim]→ {result.command.command}: {result.execution_time:.2f}s wall, "
+                        f"{resources.cpu_time:.2f}s CPU, "
+                        f"{resources.max_rss_kb / 1024:.1f} MiB peak RSS, "
+                        f"{resources.block_input + resources.block_output} block I/O ops[/dim]"
+                    )
+            groups = {
+                result.parallel_group: result
+                for result in results
+                if result.parallel_group is not None
+            }
+            if groups:
+                wall_time = sum(result.group_wall_time or 0.0 for result in groups.values())
+                summed_time = sum(result.group_summed_time or 0.0 for result in groups.values())
+                console.print(
+                    f"[dim]→ Parallel groups: {wall_time:.2f}s wall-clock vs "
+                    f"{summed_time:.2f}s summed ({summed_time / max(wall_time, 1e-9):.1f}x speedup)[/dim]"
+                )
 
         # Show results
         success_count = sum(1 for result in results if result.success)
@@ -220,6 +420,19 @@ def run_command(
             )
 
         for result in results:
+            if result.output_truncated and verbose:
+                console.print(
+                    f"[dim]→ Kept the head and tail of {result.stdout_bytes + result.stderr_bytes} "
+                    f"output bytes for: {result.command.command}[/dim]"
+                )
+            if result.streamed:
+                # Output was already shown live
+                _print_analysis(result)
+                if not result.success:
+                    console.print(f"[red]❌ Failed: {result.command}[/red]")
+                    if result.error_message:
+                        console.print(f"   [dim]Reason: {result.error_message}[/dim]")
+                continue
             if result.success:
                 if result.stdout:
                     console.print(
@@ -239,6 +452,7 @@ def run_command(
                             expand=False,
                         )
                     )
+                _print_analysis(result)
             else:
                 console.print(f"[red]❌ Failed: {result.command}[/red]")
                 if result.stderr:
@@ -253,8 +467,9 @@ def run_command(
                 if result.error_message:
                     console.print(f"   [dim]Reason: {result.error_message}[/dim]")
 
-        # Save execution results to history
-        context_manager.save_execution_results(results)
+        # Store steps that bypassed the progress callback and the outcome
+        history.finish(results)
+        _flush_history(context_manager)
 
     except KeyboardInterrupt:
         console.print("\n[yellow]Operation cancelled by user[/yellow]")
@@ -267,12 +482,334 @@ def run_command(
         raise typer.Exit(1)
 
 
+@app.command("batch", help="Translate many prompts from a file in packed requests")
+def batch_command(
+    ctx: typer.Context,
+    prompts_file: Path = typer.Argument(
+        ..., help="File with one natural language prompt per line"
+    ),
+    model: Optional[str] = typer.Option(
+        None, "--model", "-m", help="AI model to use (openai, ollama)"
+    ),
+    batch_size: int = typer.Option(
+        20, "--batch-size", "-b", help="Maximum prompts packed into one request"
+    ),
+    verbose: bool = typer.Option(
+        False, "--verbose", "-v", help="Enable verbose output"
+    ),
+) -> None:
+    """
+    Translate a runbook of prompts into commands without executing them.
+
+    Prompts share one model request per pack, so the system prompt and command
+    mappings are only sent once per pack. Blank lines and lines starting with
+    '#' are ignored.
+
+    Example:
+        pilotcmd batch runbook.txt --batch-size 10
+    """
+    if not ctx.obj:
+        ctx.obj = {}
+
+    model = model or ctx.obj.get("model", "openai")
+    verbose = verbose or ctx.obj.get("verbose", False)
+
+    try:
+        prompts = [
+            line.strip()
+            for line in prompts_file.read_text(encoding="utf-8").splitlines()
+            if line.strip() and not line.strip().startswith("#")
+        ]
+        if not prompts:
+            console.print("[yellow]No prompts found in file[/yellow]")
+            return
+
+        os_info = OSDetector().detect()
+        context_manager = ContextManager()
+
+        try:
+            ai_model = ModelFactory().get_model(model)
+            parser = NLPParser(ai_model, os_info)
+            if verbose:
+                console.print(f"[dim]→ Using model: {model}[/dim]")
+            plans = asyncio.run(parser.parse_batch(prompts, max_batch_size=batch_size))
+        except Exception as e:
+            if verbose:
+                console.print(
+                    f"[dim]→ AI model not available ({str(e)}), using simple parser[/dim]"
+                )
+            parser = SimpleParser(os_info)
+            plans = [asyncio.run(parser.parse(prompt)) for prompt in prompts]
+
+        if verbose and getattr(parser, "last_usage", None):
+            usage = parser.last_usage
+            console.print(
+                f"[dim]→ Token usage: input {usage['prompt_tokens']}, output {usage['completion_tokens']}, total {usage['total_tokens']}[/dim]"
+            )
+
+        for i, (prompt, commands) in enumerate(zip(prompts, plans), 1):
+            console.print(f"[bold]{i}. {prompt}[/bold]")
+            if not commands:
+                console.print("   [yellow]❓ Could not understand the prompt[/yellow]")
+                continue
+            for cmd in commands:
+                console.print(f"   • [cyan]{cmd.command}[/cyan]")
+            context_manager.save_prompt(prompt, commands, os_info)
+        _flush_history(context_manager)
+
+    except Exception as e:
+        if verbose:
+            console.print_exception()
+        else:
+            console.print(f"[red]❌ Error: {str(e)}[/red]")
+        raise typer.Exit(1)
+
+
+@app.command("fanout", help="Run one plan on many directories, containers or hosts")
+def fanout_command(
+    ctx: typer.Context,
+    prompt: str = typer.Argument(..., help="Natural language command prompt"),
+    targets: Optional[List[str]] = typer.Option(
+        None,
+        "--target",
+        "-t",
+        help="Directory (globs allowed), docker:<container> or ssh:[user@]host; repeatable",
+    ),
+    targets_file: Optional[Path] = typer.Option(
+        None, "--targets-file", help="File with one target per line"
+    ),
+    model: Optional[str] = typer.Option(
+        None, "--model", "-m", help="AI model to use (openai, ollama)"
+    ),
+    parallel: int = typer.Option(
+        4, "--parallel", "-p", help="Maximum targets running at once"
+    ),
+    target_timeout: Optional[float] = typer.Option(
+        None, "--target-timeout", help="Seconds allowed for the whole plan on one target"
+    ),
+    ssh_command: Optional[str] = typer.Option(
+        None, "--ssh-command", help="ssh-compatible client and options to use"
+    ),
+    auto_run: bool = typer.Option(
+        False, "--run", "-r", help="Execute without confirmation"
+    ),
+    stream: bool = typer.Option(
+        True, "--stream/--no-stream", help="Show command output live as it arrives"
+    ),
+    verbose: bool = typer.Option(
+        False, "--verbose", "-v", help="Enable verbose output"
+    ),
+) -> None:
+    """
+    Translate a prompt once and run the resulting plan on every target.
+
+    The plan is generated for this machine's OS; remote targets are expected
+    to run a compatible system.
+
+    Example:
+        pilotcmd fanout "show git status" -t "~/src/*"
+        pilotcmd fanout "show disk usage" -t ssh:web1 -t ssh:web2 -t docker:db
+    """
+    if not ctx.obj:
+        ctx.obj = {}
+
+    model = model or ctx.obj.get("model", "openai")
+    auto_run = auto_run or ctx.obj.get("auto_run", False)
+    verbose = verbose or ctx.obj.get("verbose", False)
+
+    try:
+        specs = list(targets or [])
+        if targets_file is not None:
+            specs.extend(read_targets_file(str(targets_file)))
+        transports = expand_targets(
+            specs, shlex.split(ssh_command) if ssh_command else None
+        )
+        if not transports:
+            console.print("[yellow]No targets given (use --target or --targets-file)[/yellow]")
+            raise typer.Exit(1)
+
+        os_info = OSDetector().detect()
+        context_manager = ContextManager()
+        try:
+            parser = NLPParser(ModelFactory().get_model(model), os_info)
+            if verbose:
+                console.print(f"[dim]→ Using model: {model}[/dim]")
+        except Exception as e:
+            if verbose:
+                console.print(
+                    f"[dim]→ AI model not available ({str(e)}), using simple parser[/dim]"
+                )
+            parser = SimpleParser(os_info)
+
+        commands = asyncio.run(parser.parse(prompt))
+        if not commands:
+            console.print(
+                "[yellow]❓ Could not understand the prompt. Please try rephrasing.[/yellow]"
+            )
+            return
+
+        console.print("→ Suggested commands:")
+        for i, cmd in enumerate(commands, 1):
+            console.print(f"  {i}. [cyan]{cmd.command}[/cyan]")
+        console.print(f"→ Targets ({len(transports)}):")
+        for transport in transports:
+            console.print(f"  • {transport.name}")
+
+        if not auto_run and not typer.confirm(
+            f"→ Run these commands on {len(transports)} targets?"
+        ):
+            console.print("[yellow]Operation cancelled[/yellow]")
+            return
+
+        entry_id = context_manager.save_prompt(prompt, commands, os_info)
+        history = context_manager.history_writer(entry_id)
+
+        config = ConfigManager().get_config()
+        timeout_policy = TimeoutPolicy(
+            context_manager.get_timings(
+                [command_signature(cmd.command) for cmd in commands]
+            ),
+            default_timeout=config.default_timeout,
+        )
+        resource_limits = resource_limits_from_config(config.resource_limits)
+
+        def make_executor(transport: Transport) -> CommandExecutor:
+            def print_line(command: Command, stream_name: str, line: str) -> None:
+                style = "yellow" if stream_name == "stderr" else None
+                console.print(
+                    f"[{transport.name}] {line}", style=style, markup=False, highlight=False
+                )
+
+            return CommandExecutor(
+                os_info,
+                timeout=config.default_timeout,
+                output_limit=config.output_buffer_size,
+                output_callback=print_line if stream else None,
+                timeout_provider=timeout_policy.timeout_for,
+                resource_limits=resource_limits,
+                transport=transport,
+            )
+
+        def report(outcome: TargetResult) -> None:
+            for result in outcome.results:
+                history.record_step(result, target=outcome.target)
+            if outcome.success:
+                console.print(
+                    f"[green]✅ {outcome.target}[/green] [dim]({outcome.elapsed:.2f}s)[/dim]"
+                )
+                return
+            reason = "timed out" if outcome.timed_out else outcome.error
+            if reason is None:
+                failed = next(result for result in outcome.results if not result.success)
+                reason = f"failed: {failed.command.command}"
+            console.print(f"[red]❌ {outcome.target}[/red] [dim]{reason}[/dim]")
+
+        runner = FanoutRunner(
+            make_executor,
+            max_parallel=parallel,
+            target_timeout=target_timeout,
+            on_target_done=report,
+        )
+        outcomes = asyncio.run(runner.run(commands, transports))
+
+        table = Table(title="Fan-out results")
+        table.add_column("Target")
+        table.add_column("Status")
+        table.add_column("Steps", justify="right")
+        table.add_column("Time", justify="right")
+        for outcome in outcomes:
+            status = "[green]ok[/green]" if outcome.success else (
+                "[red]timeout[/red]" if outcome.timed_out else "[red]failed[/red]"
+            )
+            succeeded = sum(1 for result in outcome.results if result.success)
+            table.add_row(
+                outcome.target,
+                status,
+                f"{succeeded}/{len(commands)}",
+                f"{outcome.elapsed:.2f}s",
+            )
+            if not stream:
+                for result in outcome.results:
+                    if result.stdout.strip():
+                        console.print(
+                            Panel(
+                                result.stdout.strip(),
+                                title=f"[bold]{outcome.target}: {result.command.command}[/bold]",
+                                expand=False,
+                            )
+                        )
+        console.print(table)
+
+        failed_targets = sum(1 for outcome in outcomes if not outcome.success)
+        if failed_targets:
+            console.print(
+                f"[yellow]⚠️  {len(outcomes) - failed_targets} targets succeeded, "
+                f"{failed_targets} failed[/yellow]"
+            )
+        else:
+            console.print(f"[green]✅ Plan succeeded on all {len(outcomes)} targets[/green]")
+
+        history.finish(success=not failed_targets)
+        _flush_history(context_manager)
+        if failed_targets:
+            raise typer.Exit(1)
+
+    except typer.Exit:
+        raise
+    except Exception as e:
+        if verbose:
+            console.print_exception()
+        else:
+            console.print(f"[red]❌ Error: {str(e)}[/red]")
+        raise typer.Exit(1)
+
+
+def _run_prompt(
+    ctx: typer.Context,
+    prompt: str,
+    allowed_commands: Optional[List[str]] = None,
+    blocked_commands: Optional[List[str]] = None,
+) -> None:
+    """
+    Run a prompt with the run command's defaults.
+
+    Typer fills in option defaults only when it parses a command line; called
+    directly, run_command would receive its OptionInfo objects instead.
+    """
+    run_command(
+        ctx,
+        prompt,
+        model=None,
+        dry_run=False,
+        auto_run=False,
+        verbose=False,
+        thinking=False,
+        speculate=False,
+        parallel=1,
+        stream=True,
+        persistent=False,
+        fresh=False,
+        allowed_commands=allowed_commands,
+        blocked_commands=blocked_commands,
+    )
+
+
 @app.command("shell", help="Start interactive shell session")
 def shell(
     ctx: typer.Context,
     mode: str = typer.Option(
         "auto", "--mode", help="Execution mode: restricted, container or auto"
     ),
+    persistent: bool = typer.Option(
+        True,
+        "--persistent/--no-persistent",
+        help="Keep one shell for the whole session so cd/export carry over",
+    ),
+    cache: bool = typer.Option(
+        True,
+        "--cache/--no-cache",
+        help="Reuse recent results of read-only commands during the session",
+    ),
 ) -> None:
     """Launch an interactive REPL that keeps session history."""
 
@@ -318,7 +855,7 @@ def shell(
         return
 
     # Restricted shell mode
-    whitelist = {"ls", "cat", "ipconfig", "ping", "echo"}
+    whitelist = {"ls", "cat", "ipconfig", "ping", "echo", "cd", "pwd"}
     blacklist = {"rm", "shutdown", "reboot", "curl", "wget", "ssh"}
 
     history_dir = Path.home() / ".pilotcmd"
@@ -329,50 +866,174 @@ def shell(
         auto_suggest=AutoSuggestFromHistory(),
     )
 
-    while True:
-        try:
-            prompt_text = session.prompt("pilotcmd> ")
-        except (EOFError, KeyboardInterrupt):
-            break
+    ctx.ensure_object(dict)
+    session_shell = None
+    if persistent:
+        os_info = OSDetector().detect()
+        if PersistentShell.supported(os_info):
+            session_shell = PersistentShell.for_os(os_info)
+            ctx.obj["persistent_shell"] = session_shell
+    if cache:
+        ctx.obj["result_cache"] = ResultCache()
 
-        if prompt_text.strip() in {"exit", "quit"}:
-            break
+    try:
+        while True:
+            try:
+                prompt_text = session.prompt("pilotcmd> ")
+            except (EOFError, KeyboardInterrupt):
+                break
 
-        if not prompt_text.strip():
-            continue
+            if prompt_text.strip() in {"exit", "quit"}:
+                break
 
-        run_command(ctx, prompt_text)
+            if not prompt_text.strip():
+                continue
 
+            _run_prompt(
+                ctx,
+                prompt_text,
+                allowed_commands=sorted(whitelist),
+                blocked_commands=sorted(blacklist),
+            )
+    finally:
+        if session_shell is not None:
+            session_shell.close()
+            ctx.obj.pop("persistent_shell", None)
+        ctx.obj.pop("result_cache", None)
+
+
+def _highlight_snippet(snippet: str) -> str:
+    """Turn a search snippet's match markers into rich markup."""
+    return (
+        escape(snippet)
+        .replace(MATCH_START, "[bold yellow]")
+        .replace(MATCH_END, "[/bold yellow]")
+        .replace("\n", " ; ")
+    )
+
+
+def _show_expensive_commands(context_manager: ContextManager, limit: int) -> None:
+    """Print the command signatures that used the most CPU time."""
+    ranking = context_manager.get_expensive_commands(limit=limit)
+    if not ranking:
+        console.print("[yellow]No resource usage recorded yet[/yellow]")
+        return
+
+    table = Table(title="💸 Most expensive commands")
+    table.add_column("Command", style="cyan")
+    table.add_column("Runs", justify="right")
+    table.add_column("CPU total", justify="right")
+    table.add_column("CPU avg", justify="right")
+    table.add_column("Wall avg", justify="right")
+    table.add_column("Peak RSS", justify="right")
+    table.add_column("Block I/O", justify="right")
+    for row in ranking:
+        table.add_row(
+            row["signature"],
+            str(row["runs"]),
+            f"{row['cpu_time_total']:.2f}s",
+            f"{row['cpu_time_avg']:.2f}s",
+            f"{row['wall_time_avg']:.2f}s",
+            f"{row['max_rss_kb'] / 1024:.1f} MiB",
+            str(row["block_io_total"]),
+        )
+    console.print(table)
+
+
+history_app = typer.Typer(
+    help="Show, search and maintain the command history", invoke_without_command=True
+)
+app.add_typer(history_app, name="history")
 
-@app.command("history")
+
+@history_app.callback()
 def show_history(
+    ctx: typer.Context,
     limit: int = typer.Option(
         10, "--limit", "-l", help="Number of recent commands to show"
     ),
     search: Optional[str] = typer.Option(
         None, "--search", "-s", help="Search in command history"
     ),
+    similar: Optional[str] = typer.Option(
+        None,
+        "--similar",
+        help="Find successful prompts with the same meaning (needs NumPy)",
+    ),
+    show_output: bool = typer.Option(
+        False, "--show-output", "-o", help="Also show the saved command output"
+    ),
+    stats: bool = typer.Option(
+        False, "--stats", help="Rank the most expensive commands by CPU time"
+    ),
 ) -> None:
     """Show command history"""
+    if ctx.invoked_subcommand is not None:
+        return
     try:
         context_manager = ContextManager()
-        history = context_manager.get_history(limit=limit, search=search)
+
+        if stats:
+            _show_expensive_commands(context_manager, limit)
+            return
+
+        if similar:
+            history = context_manager.get_semantic_matches(similar, limit=limit)
+        else:
+            history = context_manager.get_history(limit=limit, search=search)
 
         if not history:
             console.print("[yellow]No command history found[/yellow]")
             return
 
-        console.print(
-            f"[bold blue]📚 Command History (last {len(history)} entries)[/bold blue]"
-        )
+        if similar:
+            console.print(
+                f"[bold blue]📚 Command History ({len(history)} similar prompts)[/bold blue]"
+            )
+        elif search:
+            console.print(
+                f"[bold blue]📚 Command History ({len(history)} best matches)[/bold blue]"
+            )
+        else:
+            console.print(
+                f"[bold blue]📚 Command History (last {len(history)} entries)[/bold blue]"
+            )
         console.print()
 
         for entry in history:
             console.print(f"[dim]{entry.timestamp}[/dim]")
             console.print(f"[bold]Prompt:[/bold] {entry.prompt}")
+            if entry.snippet:
+                console.print(f"[dim]Match:[/dim] {_highlight_snippet(entry.snippet)}")
+            if entry.similarity is not None:
+                console.print(f"[dim]Similarity: {entry.similarity:.0%}[/dim]")
             console.print(f"[cyan]Commands:[/cyan]")
             for cmd in entry.commands:
                 console.print(f"  • {cmd}")
+            if show_output and entry.id is not None:
+                for result in context_manager.get_results(entry.id):
+                    output = (result.get("stdout") or "").strip()
+                    errors = (result.get("stderr") or "").strip()
+                    if result.get("analysis"):
+                        console.print(f"  [cyan]💡 {result['analysis']['summary']}[/cyan]")
+                    if output:
+                        console.print(
+                            Panel(
+                                output,
+                                title=f"[bold green]Output for: {result['command']}[/bold green]",
+                                border_style="green",
+                                expand=False,
+                            )
+                        )
+                    if errors:
+                        console.print(
+                            Panel(
+                                errors,
+                                title=f"[bold yellow]Errors for: {result['command']}[/bold yellow]",
+                                border_style="yellow",
+                                expand=False,
+                            )
+                        )
             console.print()
 
     except Exception as e:
@@ -380,6 +1041,148 @@ def show_history(
         raise typer.Exit(1)
 
 
+def _print_prune_report(action: str, report: PruneReport) -> None:
+    if report.deleted_entries:
+        console.print(f"[green]✅ Removed {report.deleted_entries} history entries[/green]")
+    console.print(
+        f"[green]✅ {action}: {report.bytes_before / 1024 / 1024:.1f} MiB → "
+        f"{report.bytes_after / 1024 / 1024:.1f} MiB "
+        f"({report.reclaimed_bytes / 1024 / 1024:.1f} MiB reclaimed)[/green]"
+    )
+
+
+@history_app.command("prune", help="Delete history beyond the retention limits")
+def prune_history(
+    max_rows: Optional[int] = typer.Option(
+        None, "--max-rows", help="Keep at most this many entries (default: history_limit)"
+    ),
+    max_age: Optional[int] = typer.Option(
+        None, "--max-age", help="Delete entries older than this many days"
+    ),
+    max_size: Optional[int] = typer.Option(
+        None, "--max-size", help="Keep the history under this many MiB"
+    ),
+) -> None:
+    try:
+        context_manager = ContextManager()
+        policy = context_manager.retention
+        policy = RetentionPolicy(
+            max_rows=policy.max_rows if max_rows is None else max_rows or None,
+            max_age_days=policy.max_age_days if max_age is None else max_age or None,
+            max_bytes=policy.max_bytes if max_size is None else max_size * 1024 * 1024 or None,
+        )
+        if policy.unlimited:
+            console.print("[yellow]No retention limits set; nothing to prune[/yellow]")
+            return
+        _print_prune_report("Pruned", context_manager.prune(policy))
+    except Exception as e:
+        console.print(f"[red]❌ Error pruning history: {str(e)}[/red]")
+        raise typer.Exit(1)
+
+
+@history_app.command("compact", help="Rebuild the history database without free space")
+def compact_history() -> None:
+    try:
+        _print_prune_report("Compacted", ContextManager().compact())
+    except Exception as e:
+        console.print(f"[red]❌ Error compacting history: {str(e)}[/red]")
+        raise typer.Exit(1)
+
+
+@history_app.command("export", help="Write the history to an NDJSON archive")
+def export_history(
+    path: str = typer.Argument(
+        ..., help="Archive file (compressed if it ends in .gz), or - for standard output"
+    ),
+    no_output: bool = typer.Option(
+        False, "--no-output", help="Leave the commands' output out of the archive"
+    ),
+) -> None:
+    try:
+        context_manager = ContextManager()
+        with open_archive(path, "w") as handle:
+            count = write_archive(
+                handle, context_manager.iter_entries(include_output=not no_output)
+            )
+    except Exception as e:
+        console.print(f"[red]❌ Error exporting history: {escape(str(e))}[/red]")
+        raise typer.Exit(1)
+    
+    if path != "-":
+        console.print(f"[green]✅ Exported {count} history entries to {escape(path)}[/green]")
+
+
+@history_app.command("import", help="Merge an NDJSON history archive into the history")
+def import_history(
+    path: str = typer.Argument(
+        ..., help="Archive file (plain or gzip), or - for standard input"
+    ),
+) -> None:
+    try:
+        context_manager = ContextManager()
+        with open_archive(path, "r") as handle:
+            report = context_manager.import_entries(read_archive(handle))
+    except Exception as e:
+        console.print(f"[red]❌ Error importing history: {escape(str(e))}[/red]")
+        raise typer.Exit(1)
+    
+    console.print(
+        f"[green]✅ Imported {report.imported} history entries "
+        f"({report.duplicates} already present)[/green]"
+    )
+
+
+@app.command("stats", help="Show usage statistics")
+def show_stats(
+    top: int = typer.Option(5, "--top", "-t", help="Number of frequent prompts to show"),
+) -> None:
+    try:
+        stats = ContextManager().get_stats(top=top)
+    except Exception as e:
+        console.print(f"[red]❌ Error reading statistics: {str(e)}[/red]")
+        raise typer.Exit(1)
+
+    if not stats["total_commands"]:
+        console.print("[yellow]No commands recorded yet[/yellow]")
+        return
+
+    console.print("[bold blue]📊 Usage Statistics[/bold blue]")
+    console.print(f"Prompts run: [cyan]{stats['total_commands']}[/cyan]")
+    console.print(
+        f"Successful: [cyan]{stats['successful_commands']}[/cyan] "
+        f"([cyan]{stats['success_rate']:.0%}[/cyan])"
+    )
+    console.print(
+        f"Average run time: [cyan]{stats['average_execution_time']:.2f}s[/cyan] "
+        f"(total {stats['total_execution_time']:.1f}s)"
+    )
+
+    histogram = stats["execution_time_histogram"]
+    largest = max((row["count"] for row in histogram), default=0)
+    if largest:
+        table = Table(title="Run time of successful prompts")
+        table.add_column("Time")
+        table.add_column("Count", justify="right")
+        table.add_column("")
+        for row in histogram:
+            table.add_row(
+                row["bucket"], str(row["count"]), "█" * round(20 * row["count"] / largest)
+            )
+        console.print(table)
+
+    if stats["common_prompts"]:
+        table = Table(title="Most frequent prompts")
+        table.add_column("Prompt")
+        table.add_column("Count", justify="right")
+        for row in stats["common_prompts"]:
+            # Space-Saving counts may overestimate by up to the error
+            count = str(row["count"])
+            if row["error"]:
+                count = f"≤{row['count']} (≥{row['count'] - row['error']})"
+            table.add_row(escape(row["prompt"]), count)
+        console.print(table)
+
+
 @app.command("explain")
 def explain_command(
     ctx: typer.Context,
@@ -565,6 +1368,62 @@ def configure(
         raise typer.Exit(1)
 
 
+patterns_app = typer.Typer(help="Manage offline pattern packs for the local parser")
+app.add_typer(patterns_app, name="patterns")
+
+
+@patterns_app.command("compile")
+def compile_patterns(
+    sources: List[Path] = typer.Argument(
+        ..., help="JSON or YAML pattern sources, in priority order"
+    ),
+    output: Optional[Path] = typer.Option(
+        None,
+        "--output",
+        "-o",
+        help="Pack file to write (default: ~/.pilotcmd/patterns/<name>.pcpk)",
+    ),
+    os_name: Optional[str] = typer.Option(
+        None, "--os", help="Target OS: windows, linux, macos, unix or any"
+    ),
+) -> None:
+    """Compile pattern sources into a memory-mappable pattern pack"""
+    from pilotcmd.nlp.pattern_pack import PACK_SUFFIX, compile_pack, default_packs_dir
+
+    try:
+        if output is None:
+            output = default_packs_dir() / f"{sources[0].stem}{PACK_SUFFIX}"
+        count = compile_pack(sources, output, os_name=os_name)
+        console.print(f"[green]✅ Compiled {count} patterns into {output}[/green]")
+    except Exception as e:
+        console.print(f"[red]❌ Error compiling patterns: {str(e)}[/red]")
+        raise typer.Exit(1)
+
+
+@patterns_app.command("list")
+def list_patterns() -> None:
+    """List installed pattern packs"""
+    from pilotcmd.nlp.pattern_pack import PACK_SUFFIX, PatternPack, default_packs_dir
+
+    packs_dir = default_packs_dir()
+    paths = sorted(packs_dir.glob(f"*{PACK_SUFFIX}")) if packs_dir.is_dir() else []
+    if not paths:
+        console.print(f"[yellow]No pattern packs installed in {packs_dir}[/yellow]")
+        return
+
+    for path in paths:
+        try:
+            pack = PatternPack(str(path))
+        except (OSError, ValueError) as e:
+            console.print(f"[red]❌ {path.name}: {str(e)}[/red]")
+            continue
+        console.print(
+            f"[cyan]{path.name}[/cyan]: {len(pack)} patterns, "
+            f"{pack.key_count} keywords, os={pack.os_name}"
+        )
+        pack.close()
+
+
 # For backwards compatibility, also accept direct prompts as the default command
 @app.command("prompt", hidden=True)
 def prompt_command(
@@ -572,7 +1431,7 @@ def prompt_command(
     prompt: str = typer.Argument(..., help="Natural language command prompt"),
 ) -> None:
     """Hidden backwards compatibility command"""
-    run_command(ctx, prompt)
+    _run_prompt(ctx, prompt)
 
 
 if __name__ == "__main__":
@@ -4,7 +4,7 @@ Configuration manager for PilotCmd settings.
 
 import os
 import json
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
 from typing import Optional, Dict, Any
 from pathlib import Path
 
@@ -19,7 +19,13 @@ class Config:
     auto_confirm: bool = False
     dry_run_by_default: bool = False
     verbose_output: bool = False
+    # History retention; 0 disables a limit
     history_limit: int = 100
+    history_max_age_days: int = 0
+    history_max_size: int = 256 * 1024 * 1024
+    output_buffer_size: int = 1024 * 1024
+    # Per safety level setrlimit overrides, e.g. {"safe": {"cpu_seconds": 60}}
+    resource_limits: Dict[str, Dict[str, int]] = field(default_factory=dict)
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert config to dictionary."""
@@ -102,6 +108,13 @@ class ConfigManager:
         if os.getenv("PILOTCMD_DRY_RUN"):
             config.dry_run_by_default = os.getenv("PILOTCMD_DRY_RUN").lower() in ("true", "1", "yes")
         
+        # Output retained per command stream
+        if os.getenv("PILOTCMD_OUTPUT_BUFFER"):
+            try:
+                config.output_buffer_size = int(os.getenv("PILOTCMD_OUTPUT_BUFFER"))
+            except ValueError:
+                pass
+        
         # Verbose output
         if os.getenv("PILOTCMD_VERBOSE"):
             config.verbose_output = os.getenv("PILOTCMD_VERBOSE").lower() in ("true", "1", "yes")
@@ -163,6 +176,19 @@ class ConfigManager:
         config.history_limit = limit
         self._save_config(config)
     
+    def set_history_retention(self, max_age_days: int, max_size: int) -> None:
+        """Set the maximum age (days) and size (bytes) of the history."""
+        config = self.get_config()
+        config.history_max_age_days = max_age_days
+        config.history_max_size = max_size
+        self._save_config(config)
+    
+    def set_output_buffer_size(self, size: int) -> None:
+        """Set how many bytes of output are retained per command stream."""
+        config = self.get_config()
+        config.output_buffer_size = size
+        self._save_config(config)
+    
     def update_config(self, **kwargs) -> None:
         """Update multiple configuration values at once."""
         config = self.get_config()
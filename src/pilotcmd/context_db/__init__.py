@@ -2,6 +2,7 @@
 Context database module for storing command history and context.
 """
 
+from .history_writer import HistoryWriter
 from .manager import ContextManager, HistoryEntry
 
-__all__ = ["ContextManager", "HistoryEntry"]
+__all__ = ["ContextManager", "HistoryEntry", "HistoryWriter"]
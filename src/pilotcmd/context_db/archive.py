@@ -0,0 +1,150 @@
+"""
+Streaming history archives.
+
+An archive is NDJSON: a header line ``{"format": "pilotcmd-history",
+"version": 1}`` followed by one history entry per line, with its results
+and their outputs inline. Archives ending in ``.gz`` are written with gzip;
+compressed input is recognized by its content. Concatenated archives (from
+several machines, say) are valid archives too.
+
+Entries are identified by a hash of their timestamp, prompt, commands and
+OS, so importing an archive twice, or merging back an archive that already
+contains our entries, adds nothing.
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import sys
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import IO, Any, Dict, Iterable, Iterator, List, Union, cast
+
+FORMAT = "pilotcmd-history"
+FORMAT_VERSION = 1
+
+# Entries read per query when exporting
+EXPORT_PAGE = 500
+
+# Entries inserted per transaction when importing
+IMPORT_BATCH = 1000
+
+REQUIRED_FIELDS = ("timestamp", "prompt", "commands", "os_info")
+
+# zlib's default level: most of the size reduction at a fraction of level 9's time
+GZIP_LEVEL = 6
+
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+@dataclass
+class ImportReport:
+    """Outcome of importing an archive."""
+
+    imported: int = 0
+    duplicates: int = 0
+
+
+def content_hash(timestamp: str, prompt: str, commands: List[str], os_info: Dict[str, Any]) -> str:
+    """Identity of a history entry, the same on every machine."""
+    payload = json.dumps(
+        [timestamp, prompt, commands, os_info],
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@contextmanager
+def open_archive(path: str, mode: str) -> Iterator[IO[str]]:
+    """
+    Open an archive as text; ``-`` is standard input or output.
+
+    Args:
+        path: Archive path; written compressed when it ends in ``.gz``
+        mode: ``"r"`` or ``"w"``
+    """
+    if mode == "w":
+        if path == "-":
+            yield sys.stdout
+            sys.stdout.flush()
+        elif path.endswith(".gz"):
+            with gzip.open(path, "wt", compresslevel=GZIP_LEVEL, encoding="utf-8") as handle:
+                yield handle
+        else:
+            with open(path, "w", encoding="utf-8") as handle:
+                yield handle
+        return
+
+    stdin = sys.stdin.buffer
+    raw: io.BufferedReader
+    if path != "-":
+        raw = open(path, "rb")
+    elif isinstance(stdin, io.BufferedReader):
+        raw = stdin
+    else:
+        # A replaced standard input (such as a BytesIO) cannot peek
+        raw = io.BufferedReader(cast(io.RawIOBase, stdin))
+    try:
+        stream: Union[io.BufferedReader, gzip.GzipFile] = raw
+        if raw.peek(2)[:2] == _GZIP_MAGIC:
+            stream = gzip.GzipFile(fileobj=raw, mode="rb")
+        text = io.TextIOWrapper(stream, encoding="utf-8")
+        yield text
+        # Leave standard input open
+        text.detach()
+    finally:
+        if path != "-":
+            raw.close()
+        elif raw is not stdin:
+            raw.detach()
+
+
+def write_archive(handle: IO[str], entries: Iterable[Dict[str, Any]]) -> int:
+    """Write the header and one line per entry; returns the entry count."""
+    handle.write(json.dumps({"format": FORMAT, "version": FORMAT_VERSION}) + "\n")
+    count = 0
+    for entry in entries:
+        handle.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+        count += 1
+    return count
+
+
+def read_archive(handle: IO[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Entries of an archive, one line at a time.
+
+    Raises:
+        ValueError: The input is not a pilotcmd history archive, is of a
+            newer format, or has a malformed line
+    """
+    started = False
+    for number, line in enumerate(handle, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Line {number}: invalid JSON ({e.msg})") from None
+        if not isinstance(record, dict):
+            raise ValueError(f"Line {number}: expected an object")
+
+        if "format" in record:
+            if record["format"] != FORMAT:
+                raise ValueError(f"Line {number}: not a pilotcmd history archive")
+            if record.get("version", 0) > FORMAT_VERSION:
+                raise ValueError(
+                    f"Line {number}: archive version {record['version']} is newer than "
+                    f"this pilotcmd supports ({FORMAT_VERSION})"
+                )
+            started = True
+            continue
+        if not started:
+            raise ValueError("Not a pilotcmd history archive")
+
+        missing = [field for field in REQUIRED_FIELDS if field not in record]
+        if missing:
+            raise ValueError(f"Line {number}: missing {', '.join(missing)}")
+        yield record
@@ -0,0 +1,88 @@
+"""
+Content-addressed storage for large command outputs.
+
+Outputs above a size threshold are kept out of the history table: each one is
+compressed with zlib and written once to a file named after the SHA-256 of
+its content, so repeated outputs share a single blob. History rows only hold
+the digest, and the output is read back on demand.
+"""
+
+import hashlib
+import os
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Iterable, Iterator
+
+BLOB_SUFFIX = ".z"
+COMPRESSION_LEVEL = 6
+
+
+class BlobStore:
+    """Stores compressed blobs under ``root/<2 hex chars>/<digest>.z``."""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def _path(self, digest: str) -> Path:
+        return self.root / digest[:2] / f"{digest}{BLOB_SUFFIX}"
+
+    def put(self, data: bytes) -> str:
+        """
+        Store data, returning its digest.
+
+        Content that is already stored is not written again; its file is
+        touched instead, which also checks that it is still there. Store
+        outputs under the database's write lock, which is held while
+        orphaned blobs are removed.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        try:
+            os.utime(path)
+            return digest
+        except FileNotFoundError:
+            pass
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(zlib.compress(data, COMPRESSION_LEVEL))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        """Read and decompress a blob. Raises ``FileNotFoundError`` if missing."""
+        return zlib.decompress(self._path(digest).read_bytes())
+
+    def exists(self, digest: str) -> bool:
+        return self._path(digest).exists()
+
+    def digests(self) -> Iterator[str]:
+        """Iterate over the digests of all stored blobs."""
+        if not self.root.is_dir():
+            return
+        for path in self.root.glob(f"*/*{BLOB_SUFFIX}"):
+            yield path.name[: -len(BLOB_SUFFIX)]
+
+    def total_size(self) -> int:
+        """Bytes used by all stored blobs."""
+        if not self.root.is_dir():
+            return 0
+        return sum(path.stat().st_size for path in self.root.glob(f"*/*{BLOB_SUFFIX}"))
+
+    def delete(self, digests: Iterable[str]) -> int:
+        """Remove blobs, returning how many files were deleted."""
+        deleted = 0
+        for digest in digests:
+            try:
+                self._path(digest).unlink()
+                deleted += 1
+            except FileNotFoundError:
+                continue
+        return deleted
@@ -0,0 +1,393 @@
+"""
+Shared SQLite connections for the context database.
+
+Opening a connection, applying pragmas and checking the schema once per
+process (instead of once per query) removes most of the per-call overhead,
+and the connection's statement cache keeps the frequently used queries
+prepared. The database runs in WAL mode so concurrent pilotcmd processes
+and shell sessions can read while one of them writes, with a busy timeout
+instead of immediate "database is locked" errors.
+
+History bookkeeping is written behind: callers queue writes and a
+background thread commits them in groups, so a run does not wait for a
+commit (and its fsync) per step.
+"""
+
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from pilotcmd.context_db.schema import has_table, migrate
+
+# Milliseconds a writer waits for another process's lock
+BUSY_TIMEOUT_MS = 5000
+
+# Prepared statements kept per connection
+CACHED_STATEMENTS = 256
+
+# Seconds a queued write may wait to be grouped with later ones
+FLUSH_INTERVAL = 0.05
+
+# Queued writes that trigger an immediate flush
+MAX_BATCH = 256
+
+# Seconds the background writer waits before retrying a locked database;
+# doubled on every failure up to the maximum
+RETRY_DELAY = 0.1
+MAX_RETRY_DELAY = 5.0
+
+# A queued write: statements run on the cursor of a grouped transaction
+WriteOp = Callable[[sqlite3.Cursor], None]
+
+PRAGMAS = (
+    # Takes effect on new databases; existing ones switch on the next VACUUM
+    "PRAGMA auto_vacuum = INCREMENTAL",
+    "PRAGMA journal_mode = WAL",
+    # Durable at checkpoints; a power loss may drop the last transactions
+    # but never corrupts the database
+    "PRAGMA synchronous = NORMAL",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",
+)
+
+
+class Database:
+    """
+    One SQLite connection shared by every thread of the process.
+
+    Access is serialized with a lock; each :meth:`transaction` commits on
+    success and rolls back on error.
+
+    Writes can also be queued with :meth:`enqueue` and are then applied by a
+    background thread, grouped into one transaction per batch. Guarantees:
+
+    - Queued writes are applied in order, and before any later
+      :meth:`transaction` of this process, so the process always reads its
+      own writes.
+    - A batch commits as a whole or not at all. A write that fails is
+      retried alone and rolled back alone; its error is raised by the next
+      :meth:`flush`, other writes are unaffected.
+    - While another process holds the write lock past the busy timeout,
+      writes stay queued and the background writer retries with a backoff.
+    - :meth:`flush`, :meth:`close` and interpreter exit apply everything
+      queued. If the process is killed, only the writes not yet applied
+      (normally those queued within the last :data:`FLUSH_INTERVAL`) are
+      lost; a batch is never half-written.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._in_transaction = False
+        # Write-behind queue; guarded by its own lock so enqueueing never
+        # waits for a running query
+        self._pending: List[WriteOp] = []
+        self._queue = threading.Condition(threading.Lock())
+        self._writer: Optional[threading.Thread] = None
+        self._closed = False
+        self._errors: List[Exception] = []
+        # Callbacks waiting for the current transaction to commit
+        self._after_commit: List[WriteOp] = []
+        # Autocommit at the driver level: transactions are explicit
+        self._conn = sqlite3.connect(
+            path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            cached_statements=CACHED_STATEMENTS,
+            isolation_level=None,
+        )
+        for pragma in PRAGMAS:
+            self._conn.execute(pragma)
+        self.schema_version = migrate(self._conn)
+
+    def has_table(self, name: str) -> bool:
+        with self._lock:
+            return has_table(self._conn, name)
+
+    @contextmanager
+    def transaction(self, immediate: bool = False) -> Iterator[sqlite3.Cursor]:
+        """
+        Run statements in one transaction.
+
+        Args:
+            immediate: Take the write lock up front (for read-modify-write
+                sequences that must not interleave with other writers)
+        """
+        with self._lock:
+            if not self._in_transaction:
+                try:
+                    self._apply_pending()
+                except sqlite3.OperationalError:
+                    # Another process holds the write lock: the queued
+                    # writes stay queued; a write transaction fails below
+                    if immediate:
+                        raise
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            self._in_transaction = True
+            try:
+                yield cursor
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                self._after_commit.clear()
+                raise
+            finally:
+                self._in_transaction = False
+                cursor.close()
+            self._run_after_commit()
+
+    def after_commit(self, op: WriteOp) -> None:
+        """
+        Run a write once the current transaction commits.
+
+        For cleanup outside the database, such as removing files that
+        deleted rows referenced: if the transaction rolls back (and a queued
+        write is retried), the write is dropped with it. Writes registered
+        by one transaction run together in a new transaction, so they can
+        check, under the write lock, that another process did not reference
+        the files again in between. If that transaction cannot start, the
+        cleanup is skipped.
+        """
+        self._after_commit.append(op)
+
+    def _run_after_commit(self) -> None:
+        ops, self._after_commit = self._after_commit, []
+        if not ops:
+            return
+        cursor = self._conn.cursor()
+        try:
+            try:
+                cursor.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError:
+                return
+            try:
+                for op in ops:
+                    op(cursor)
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+        finally:
+            cursor.close()
+
+    def enqueue(self, op: WriteOp) -> None:
+        """Queue a write for the background writer and return immediately."""
+        with self._queue:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Cannot write to a closed database")
+            self._pending.append(op)
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(
+                    target=self._write_behind, name="pilotcmd-history-writer", daemon=True
+                )
+                self._writer.start()
+            self._queue.notify()
+
+    def flush(self, raise_errors: bool = True) -> None:
+        """
+        Apply every queued write now.
+
+        Raises:
+            sqlite3.OperationalError: The database stayed locked by another
+                process; the writes remain queued
+            The first error of a queued write that failed since the last
+            flush, unless ``raise_errors`` is False
+        """
+        with self._lock:
+            self._apply_pending()
+            if not raise_errors:
+                return
+            errors, self._errors = self._errors, []
+        if errors:
+            raise errors[0]
+
+    def _write_behind(self) -> None:
+        delay = RETRY_DELAY
+        while True:
+            with self._queue:
+                while not self._pending and not self._closed:
+                    self._queue.wait()
+                if self._closed:
+                    return
+                # Give later writes a moment to join the batch
+                deadline = time.monotonic() + FLUSH_INTERVAL
+                while len(self._pending) < MAX_BATCH and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._queue.wait(remaining)
+            try:
+                with self._lock:
+                    if not self._in_transaction:
+                        self._apply_pending()
+                delay = RETRY_DELAY
+            except Exception:
+                # Locked by another process (or closed under us): the writes
+                # are still queued, retry later
+                with self._queue:
+                    if not self._closed:
+                        self._queue.wait(delay)
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+
+    def _apply_pending(self) -> None:
+        """
+        Apply queued writes in one transaction (the lock must be held).
+
+        Raises:
+            sqlite3.OperationalError: The write lock could not be taken; the
+                writes are put back in the queue
+        """
+        with self._queue:
+            ops, self._pending = self._pending, []
+        if not ops:
+            return
+        cursor = self._conn.cursor()
+        try:
+            try:
+                cursor.execute("BEGIN IMMEDIATE")
+            except BaseException:
+                self._requeue(ops)
+                raise
+            try:
+                for op in ops:
+                    op(cursor)
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                self._after_commit.clear()
+            except BaseException:
+                # Interrupted: keep the writes for the next flush
+                cursor.execute("ROLLBACK")
+                self._after_commit.clear()
+                self._requeue(ops)
+                raise
+            else:
+                self._run_after_commit()
+                return
+            # Isolate the failing write
+            for index, op in enumerate(ops):
+                try:
+                    cursor.execute("BEGIN IMMEDIATE")
+                except BaseException:
+                    self._requeue(ops[index:])
+                    raise
+                try:
+                    op(cursor)
+                    cursor.execute("COMMIT")
+                except Exception as e:
+                    cursor.execute("ROLLBACK")
+                    self._after_commit.clear()
+                    self._errors.append(e)
+                else:
+                    self._run_after_commit()
+        finally:
+            cursor.close()
+
+    def _requeue(self, ops: List[WriteOp]) -> None:
+        """Put writes back at the head of the queue, keeping their order."""
+        with self._queue:
+            self._pending[:0] = ops
+            self._queue.notify()
+
+    def pragma(self, name: str) -> int:
+        """Read an integer pragma such as ``page_count``."""
+        with self._lock:
+            value: int = self._conn.execute(f"PRAGMA {name}").fetchone()[0]
+        return value
+
+    def incremental_vacuum(self, pages: int = 0) -> None:
+        """Return up to ``pages`` free pages (0 = all) to the file system."""
+        with self._lock:
+            if self._conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                return
+            # Each step frees one page; executescript steps to completion
+            self._conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+
+    def incremental_vacuum_in_background(self, pages: int) -> threading.Thread:
+        """Run :meth:`incremental_vacuum` on a daemon thread."""
+        thread = threading.Thread(
+            target=self._vacuum_quietly, args=(pages,), name="pilotcmd-vacuum", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def _vacuum_quietly(self, pages: int) -> None:
+        try:
+            self.incremental_vacuum(pages)
+        except sqlite3.Error:
+            # Busy or closed: the pages are reclaimed by a later pass
+            pass
+
+    def checkpoint(self) -> None:
+        """Copy the WAL into the database and truncate it."""
+        with self._lock:
+            self._apply_pending()
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+
+    def vacuum(self) -> None:
+        """
+        Rebuild the database file, dropping all free space.
+
+        Also switches databases created before incremental auto-vacuum.
+        """
+        with self._lock:
+            self._apply_pending()
+            self._conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            self._conn.execute("VACUUM")
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+
+    def close(self) -> None:
+        """Apply queued writes, stop the background writer and close."""
+        with self._queue:
+            self._closed = True
+            self._queue.notify_all()
+        if self._writer is not None and self._writer is not threading.current_thread():
+            self._writer.join()
+        with self._lock:
+            try:
+                self._apply_pending()
+            finally:
+                self._conn.close()
+
+
+_databases: Dict[Tuple[int, str], Database] = {}
+_registry_lock = threading.Lock()
+
+
+def get_database(path: str) -> Database:
+    """Return this process's shared connection to a database file."""
+    # Keyed by pid too: a forked worker must not reuse its parent's connection
+    key = (os.getpid(), os.path.abspath(path))
+    with _registry_lock:
+        database = _databases.get(key)
+        if database is None:
+            database = _databases[key] = Database(path)
+        return database
+
+
+def close_database(path: str) -> None:
+    """Close and forget this process's connection to a database file."""
+    key = (os.getpid(), os.path.abspath(path))
+    with _registry_lock:
+        database = _databases.pop(key, None)
+    if database is not None:
+        database.close()
+
+
+@atexit.register
+def _close_all() -> None:
+    with _registry_lock:
+        databases = [db for (pid, _), db in _databases.items() if pid == os.getpid()]
+        _databases.clear()
+    for database in databases:
+        try:
+            database.close()
+        except sqlite3.Error:
+            pass
@@ -0,0 +1,228 @@
+"""
+Offline vector embeddings of prompts for semantic history lookups.
+
+A prompt is embedded without any model: its words, their character trigrams
+and the concepts they belong to (``space`` and ``disk`` both mean storage)
+are hashed into a fixed-size vector, which is then L2-normalized. Trigrams
+catch spelling variants and inflections ("containers" / "container"), the
+concept lexicon catches paraphrases ("show free space" / "disk usage").
+
+Vectors of successful prompts are appended to a float32 matrix stored next
+to the database and memory-mapped for search, so a lookup is one
+matrix-vector product. Requires NumPy (``pip install 'pilotcmd[semantic]'``).
+"""
+
+import os
+import re
+import unicodedata
+import zlib
+from typing import Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None  # type: ignore
+
+DIMENSIONS = 256
+
+# Results below this cosine similarity are not considered related
+MIN_SIMILARITY = 0.3
+
+# Feature weights: a shared concept counts more than a shared word, which
+# counts more than a shared trigram
+WORD_WEIGHT = 1.0
+TRIGRAM_WEIGHT = 0.5
+CONCEPT_WEIGHT = 2.0
+
+# Words (English and Portuguese, without accents) grouped by meaning
+CONCEPTS = {
+    "storage": (
+        "disk", "disks", "space", "storage", "df", "du", "partition", "partitions",
+        "volume", "volumes", "filesystem", "filesystems", "drive", "drives",
+        "disco", "discos", "espaco", "armazenamento", "particao",
+    ),
+    "memory": ("memory", "ram", "mem", "swap", "memoria"),
+    "usage": (
+        "usage", "used", "use", "consumption", "utilization", "free", "available",
+        "uso", "usado", "livre", "disponivel",
+    ),
+    "size": (
+        "size", "big", "bigger", "biggest", "large", "larger", "largest",
+        "tamanho", "grande", "grandes", "maiores",
+    ),
+    "network": (
+        "network", "net", "ip", "interface", "interfaces", "nic", "wifi",
+        "ethernet", "connection", "connections", "connectivity", "rede", "conexao",
+    ),
+    "port": ("port", "ports", "listening", "socket", "sockets", "porta", "portas"),
+    "process": (
+        "process", "processes", "ps", "running", "task", "tasks", "pid",
+        "processo", "processos", "tarefa", "tarefas",
+    ),
+    "cpu": ("cpu", "processor", "load", "cores", "core", "processador"),
+    "file": (
+        "file", "files", "folder", "folders", "directory", "directories", "dir",
+        "arquivo", "arquivos", "pasta", "pastas", "diretorio",
+    ),
+    "delete": ("delete", "remove", "rm", "erase", "del", "apagar", "deletar", "remover"),
+    "show": (
+        "show", "display", "list", "print", "view", "see", "check", "get",
+        "mostrar", "mostre", "listar", "liste", "ver", "exibir",
+    ),
+    "stop": ("kill", "stop", "terminate", "end", "matar", "parar", "encerrar"),
+    "restart": ("restart", "reboot", "reload", "reiniciar"),
+    "service": ("service", "services", "daemon", "daemons", "systemctl", "servico", "servicos"),
+    "log": ("log", "logs", "journal", "journalctl", "registro", "registros"),
+    "package": (
+        "package", "packages", "install", "installed", "apt", "dnf", "yum", "brew",
+        "pacote", "pacotes", "instalar",
+    ),
+    "user": ("user", "users", "account", "accounts", "whoami", "usuario", "usuarios"),
+    "time": ("time", "date", "clock", "uptime", "hora", "data"),
+    "container": ("docker", "container", "containers", "podman", "image", "images"),
+}
+_CONCEPT_OF = {word: concept for concept, words in CONCEPTS.items() for word in words}
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _normalize(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def features(text: str) -> List[Tuple[str, float]]:
+    """Weighted features of a prompt: words, trigrams and concepts."""
+    result = []
+    for word in _WORD_RE.findall(_normalize(text)):
+        result.append((f"w:{word}", WORD_WEIGHT))
+        padded = f"#{word}#"
+        result.extend(
+            (f"t:{padded[i:i + 3]}", TRIGRAM_WEIGHT) for i in range(len(padded) - 2)
+        )
+        concept = _CONCEPT_OF.get(word)
+        if concept is not None:
+            result.append((f"c:{concept}", CONCEPT_WEIGHT))
+    return result
+
+
+def embed(text: str, dimensions: int = DIMENSIONS) -> "np.ndarray":
+    """
+    Unit-length float32 embedding of a prompt (all zeros if it has no words).
+
+    Features are hashed with CRC32, which is stable across processes and
+    Python versions, so stored vectors stay comparable.
+    """
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for feature, weight in features(text):
+        digest = zlib.crc32(feature.encode("utf-8"))
+        # The top bit gives a sign, so collisions cancel out on average
+        vector[digest % dimensions] += -weight if digest & 0x80000000 else weight
+    norm = float(np.linalg.norm(vector))
+    if norm:
+        vector /= norm
+    return vector
+
+
+class VectorIndex:
+    """
+    Append-only matrix of prompt embeddings, memory-mapped for search.
+
+    Two files are kept: ``<prefix>.<dimensions>.f32`` with one float32 row
+    per vector and ``<prefix>.ids`` with the matching history ids (int64,
+    -1 for removed entries). Writers must be serialized; the context
+    manager appends inside the database's write transaction.
+    """
+
+    def __init__(self, prefix: str, dimensions: int = DIMENSIONS):
+        if np is None:
+            raise RuntimeError("Semantic search requires NumPy")
+        self.dimensions = dimensions
+        self.vectors_path = f"{prefix}.{dimensions}.f32"
+        self.ids_path = f"{prefix}.ids"
+        self._row_bytes = dimensions * 4
+
+    def exists(self) -> bool:
+        return os.path.exists(self.vectors_path) and os.path.exists(self.ids_path)
+
+    def __len__(self) -> int:
+        return self._rows()
+
+    def _rows(self) -> int:
+        try:
+            vectors = os.path.getsize(self.vectors_path) // self._row_bytes
+            ids = os.path.getsize(self.ids_path) // 8
+        except OSError:
+            return 0
+        # A crash between the two appends leaves one file a row ahead
+        return min(vectors, ids)
+
+    def add(self, items: Iterable[Tuple[int, str]]) -> None:
+        """Append the embeddings of ``(history id, prompt)`` pairs (creating the files)."""
+        items = list(items)
+        rows = self._rows()
+        matrix = np.zeros((len(items), self.dimensions), dtype=np.float32)
+        for row, (_, prompt) in enumerate(items):
+            matrix[row] = embed(prompt, self.dimensions)
+        ids = np.array([entry_id for entry_id, _ in items], dtype=np.int64)
+        for path, row_bytes, data in (
+            (self.vectors_path, self._row_bytes, matrix),
+            (self.ids_path, 8, ids),
+        ):
+            with open(path, "ab") as handle:
+                handle.truncate(rows * row_bytes)
+                handle.write(data.tobytes())
+
+    def remove(self, entry_ids: Iterable[int]) -> None:
+        """Mark entries as removed; their rows are skipped by searches."""
+        rows = self._rows()
+        targets = np.fromiter(entry_ids, dtype=np.int64)
+        if not rows or not targets.size:
+            return
+        ids = np.memmap(self.ids_path, dtype=np.int64, mode="r+", shape=(rows,))
+        ids[np.isin(ids, targets)] = -1
+        ids.flush()
+        del ids
+
+    def reset(self) -> None:
+        """Remove every vector."""
+        for path in (self.vectors_path, self.ids_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def search(
+        self, text: str, k: int, min_similarity: float = MIN_SIMILARITY
+    ) -> List[Tuple[int, float]]:
+        """
+        Entries whose prompts are most similar to ``text``.
+
+        Returns:
+            Up to ``k`` ``(history id, cosine similarity)`` pairs, best first
+        """
+        rows = self._rows()
+        query = embed(text, self.dimensions)
+        if not rows or k <= 0 or not query.any():
+            return []
+        vectors = np.memmap(
+            self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dimensions)
+        )
+        ids = np.fromfile(self.ids_path, dtype=np.int64, count=rows)
+        scores = vectors @ query
+        scores[ids < 0] = -np.inf
+        if k < rows:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(rows)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            (int(ids[i]), float(scores[i]))
+            for i in top
+            if scores[i] >= min_similarity
+        ]
+
+
+def open_vector_index(prefix: str) -> Optional[VectorIndex]:
+    """The vector index at ``prefix``, or None without NumPy."""
+    return VectorIndex(prefix) if np is not None else None
@@ -0,0 +1,73 @@
+"""
+Incremental writes of a plan's results to its history entry.
+
+A :class:`HistoryWriter` is bound to the row id returned by
+:meth:`~pilotcmd.context_db.manager.ContextManager.save_prompt`, so results
+never land on another session's entry. Each step is stored in the
+``command_steps`` table as soon as it finishes: a long plan can be inspected
+from another terminal while it runs, and the steps that completed survive a
+crash or Ctrl-C.
+"""
+
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from pilotcmd.executor.command_executor import ExecutionResult
+from pilotcmd.nlp.parser import Command
+
+if TYPE_CHECKING:  # pragma: no cover - import cycle guard
+    from pilotcmd.context_db.manager import ContextManager
+
+
+class HistoryWriter:
+    """Appends the results of one plan to its history entry."""
+
+    def __init__(self, manager: "ContextManager", entry_id: int):
+        self.manager = manager
+        self.entry_id = entry_id
+        self.recorded: Dict[int, ExecutionResult] = {}
+
+    def record_step(
+        self,
+        result: ExecutionResult,
+        index: Optional[int] = None,
+        target: Optional[str] = None,
+    ) -> None:
+        """
+        Store one finished step.
+
+        Args:
+            result: The step's result
+            index: Position in the plan; defaults to after the last recorded step
+            target: Fan-out target the step ran on
+        """
+        if index is None:
+            index = max(self.recorded, default=-1) + 1
+        self.recorded[index] = result
+        self.manager.record_step(self.entry_id, index, result, target)
+
+    def progress(self, index: int, command: Command, result: Optional[ExecutionResult]) -> None:
+        """Executor progress callback recording each step when it ends."""
+        if result is not None:
+            self.record_step(result, index)
+
+    def finish(
+        self,
+        results: Optional[List[ExecutionResult]] = None,
+        success: Optional[bool] = None,
+    ) -> None:
+        """
+        Mark the entry as complete.
+
+        Args:
+            results: The plan's results in order; steps that were not
+                reported while running (e.g. speculative ones) are stored now
+            success: Overall outcome; defaults to every step succeeding
+        """
+        for index, result in enumerate(results or []):
+            if index not in self.recorded:
+                self.record_step(result, index)
+        if success is None:
+            success = bool(self.recorded) and all(
+                result.success for result in self.recorded.values()
+            )
+        self.manager.finish_entry(self.entry_id, success)
@@ -5,14 +5,31 @@ Context manager for storing and retrieving command history and context.
 import sqlite3
 import json
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 from dataclasses import dataclass, asdict
-from typing import List, Optional, Dict, Any
+from typing import Callable, Iterable, Iterator, List, Optional, Dict, Any, Set, Tuple
 from pathlib import Path
 
+from pilotcmd.context_db import prompt_index, usage_stats
+from pilotcmd.context_db.archive import EXPORT_PAGE, IMPORT_BATCH, ImportReport, content_hash
+from pilotcmd.context_db.blob_store import BlobStore
+from pilotcmd.context_db.connection import get_database
+from pilotcmd.context_db.embeddings import VectorIndex, open_vector_index
+from pilotcmd.context_db.retention import (
+    MIN_RETAINED_ENTRIES,
+    PRUNE_BATCH,
+    SIZE_CHECK_INTERVAL,
+    VACUUM_PAGES,
+    PruneReport,
+    RetentionPolicy,
+)
+from pilotcmd.config.manager import ConfigManager
+from pilotcmd.context_db.history_writer import HistoryWriter
 from pilotcmd.nlp.parser import Command
-from pilotcmd.executor.command_executor import ExecutionResult
+from pilotcmd.executor.command_executor import ExecutionResult, ExecutionStatus
+from pilotcmd.executor.timeouts import SAMPLE_WINDOW, CommandTiming
 from pilotcmd.os_utils.detector import OSInfo
+from pilotcmd.utils.command_signature import command_signature
 
 
 @dataclass
@@ -26,76 +43,84 @@ class HistoryEntry:
     success: bool
     execution_time: float
     results: Optional[str] = None
+    # Matching text around a search hit, with terms between MATCH_START/MATCH_END
+    snippet: Optional[str] = None
+    # Cosine similarity to the prompt of a semantic search
+    similarity: Optional[float] = None
+
+
+# Outputs larger than this (in bytes) are stored as compressed blobs
+OUTPUT_SPILL_THRESHOLD = 4096
+
+_OUTPUT_STREAMS = ("stdout", "stderr")
+
+# Markers around matched terms in search snippets
+MATCH_START = "\x02"
+MATCH_END = "\x03"
+
+# Search hits weigh prompt matches above command matches
+_BM25_WEIGHTS = (2.0, 1.0)
+
+# Ranked full-text search: the index yields the matching rows, each joined
+# to its history entry by primary key
+_SEARCH_SQL = f"""
+    SELECT h.id, h.timestamp, h.prompt, h.commands, h.os_info, h.success,
+           h.execution_time,
+           snippet(history_fts, -1, ?, ?, '…', 12)
+    FROM history_fts
+    JOIN command_history h ON h.id = history_fts.rowid
+    WHERE history_fts MATCH ?
+    ORDER BY bm25(history_fts, {_BM25_WEIGHTS[0]}, {_BM25_WEIGHTS[1]})
+    LIMIT ?
+"""
+
+
+def fts_query(search: str) -> str:
+    """
+    Turn free text into an FTS5 query: every word must match, as a prefix.
+
+    Words are quoted, so operators and punctuation in the input (``-``,
+    ``:``, ``OR``) are matched literally instead of being parsed.
+    """
+    terms = [term.replace('"', '""') for term in search.split()]
+    return " ".join(f'"{term}"*' for term in terms if term.strip('"'))
 
 
 class ContextManager:
     """Manages the local SQLite database for command context and history."""
     
-    def __init__(self, db_path: Optional[str] = None):
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        spill_threshold: int = OUTPUT_SPILL_THRESHOLD,
+        retention: Optional[RetentionPolicy] = None,
+        write_behind: bool = True,
+    ):
         # Default database location
         if db_path is None:
             home_dir = Path.home()
             app_dir = home_dir / ".pilotcmd"
             app_dir.mkdir(exist_ok=True)
             db_path = str(app_dir / "context.db")
+            # The user's history follows the configured limits
+            if retention is None:
+                retention = RetentionPolicy.from_config(ConfigManager().get_config())
+        
+        self.retention = retention if retention is not None else RetentionPolicy()
         
         self.db_path = db_path
-        self._init_database()
-    
-    def _init_database(self) -> None:
-        """Initialize the SQLite database with required tables."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Command history table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS command_history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    prompt TEXT NOT NULL,
-                    commands TEXT NOT NULL,  -- JSON array of commands
-                    os_info TEXT NOT NULL,   -- JSON object with OS details
-                    success BOOLEAN NOT NULL,
-                    execution_time REAL NOT NULL,
-                    results TEXT             -- JSON array of execution results
-                )
-            """)
-            
-            # Context metadata table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS context_metadata (
-                    key TEXT PRIMARY KEY,
-                    value TEXT NOT NULL,
-                    created_at TEXT NOT NULL,
-                    updated_at TEXT NOT NULL
-                )
-            """)
-            
-            # Command templates table (for future use)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS command_templates (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT UNIQUE NOT NULL,
-                    description TEXT,
-                    template TEXT NOT NULL,  -- JSON template structure
-                    tags TEXT,               -- JSON array of tags
-                    usage_count INTEGER DEFAULT 0,
-                    created_at TEXT NOT NULL
-                )
-            """)
-            
-            # Create indexes for better search performance
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_command_history_timestamp 
-                ON command_history(timestamp DESC)
-            """)
-            
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_command_history_prompt 
-                ON command_history(prompt)
-            """)
-            
-            conn.commit()
+        self.spill_threshold = spill_threshold
+        # Step results and outcomes are written by a background thread in
+        # grouped transactions; see flush()
+        self.write_behind = write_behind
+        db_file = Path(db_path)
+        self.blobs = BlobStore(str(db_file.parent / f"{db_file.stem}_blobs"))
+        # Shared per process; the schema is created or migrated on first use
+        self._db = get_database(db_path)
+        # Embeddings of successful prompts; None without NumPy
+        self.vectors = open_vector_index(str(db_file.parent / f"{db_file.stem}_vectors"))
+        # Full-text search needs SQLite built with FTS5; LIKE is the fallback
+        self.full_text_search = self._db.has_table("history_fts")
     
     def save_prompt(self, prompt: str, commands: List[Command], os_info: OSInfo) -> int:
         """
@@ -109,85 +134,236 @@ class ContextManager:
         Returns:
             The ID of the saved entry
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        with self._db.transaction() as cursor:
             
             timestamp = datetime.now().isoformat()
-            commands_json = json.dumps([cmd.command for cmd in commands])
-            os_info_json = json.dumps({
+            command_list = [cmd.command for cmd in commands]
+            os_details = {
                 "type": os_info.type.value,
                 "name": os_info.name,
                 "version": os_info.version,
                 "architecture": os_info.architecture,
                 "shell": os_info.shell,
                 "package_manager": os_info.package_manager
-            })
+            }
             
             cursor.execute("""
                 INSERT INTO command_history 
                 (timestamp, prompt, commands, os_info, success, execution_time)
                 VALUES (?, ?, ?, ?, ?, ?)
-            """, (timestamp, prompt, commands_json, os_info_json, False, 0.0))
-            
-            conn.commit()
-            return cursor.lastrowid
+            """, (timestamp, prompt, json.dumps(command_list), json.dumps(os_details), False, 0.0))
+            entry_id = cursor.lastrowid
+            assert entry_id is not None
+            cursor.execute(
+                "INSERT OR IGNORE INTO history_hashes (hash, history_id) VALUES (?, ?)",
+                (content_hash(timestamp, prompt, command_list, os_details), entry_id),
+            )
+        
+        # Bookkeeping stays off the critical path of a run
+        self._write(lambda cursor: self._after_prompt(cursor, entry_id, prompt))
+        return entry_id
+    
+    def _after_prompt(self, cursor: sqlite3.Cursor, entry_id: int, prompt: str) -> None:
+        usage_stats.record_prompt(cursor, prompt)
+        # Retention is paid for in small steps on every write
+        deleted = self._enforce_retention(
+            cursor, self.retention, check_size=entry_id % SIZE_CHECK_INTERVAL == 0
+        )
+        if deleted:
+            self._db.incremental_vacuum_in_background(VACUUM_PAGES)
     
-    def save_execution_results(self, results: List[ExecutionResult]) -> None:
+    def _write(self, op: Callable[[sqlite3.Cursor], None]) -> None:
+        """Queue a write, or apply it now when write-behind is off."""
+        if self.write_behind:
+            self._db.enqueue(op)
+        else:
+            with self._db.transaction(immediate=True) as cursor:
+                op(cursor)
+    
+    def flush(self) -> None:
+        """
+        Wait until every queued history write is committed.
+        
+        Raises:
+            sqlite3.Error: A queued write failed
         """
-        Update the most recent entry with execution results.
+        self._db.flush()
+    
+    def save_execution_results(
+        self, results: List[ExecutionResult], entry_id: Optional[int] = None
+    ) -> None:
+        """
+        Store the results of a whole plan at once.
         
         Args:
             results: List of execution results
+            entry_id: Entry returned by :meth:`save_prompt`; defaults to the
+                newest entry, which is only right without concurrent sessions
         """
         if not results:
             return
         
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Get the most recent entry
-            cursor.execute("""
-                SELECT id FROM command_history 
-                ORDER BY timestamp DESC 
-                LIMIT 1
-            """)
-            
-            row = cursor.fetchone()
-            if not row:
+        if entry_id is None:
+            with self._db.transaction() as cursor:
+                cursor.execute("SELECT MAX(id) FROM command_history")
+                entry_id = cursor.fetchone()[0]
+            if entry_id is None:
                 return
-            
-            entry_id = row[0]
-            
-            # Calculate overall success and execution time
-            success = all(result.success for result in results)
-            total_execution_time = sum(result.execution_time for result in results)
-            
-            # Serialize results
-            results_json = json.dumps([
-                {
-                    "command": result.command.command,
-                    "status": result.status.value,
-                    "return_code": result.return_code,
-                    "stdout": result.stdout,
-                    "stderr": result.stderr,
-                    "execution_time": result.execution_time,
-                    "error_message": result.error_message
-                }
-                for result in results
-            ])
-            
-            # Update the entry
-            cursor.execute("""
-                UPDATE command_history 
-                SET success = ?, execution_time = ?, results = ?
-                WHERE id = ?
-            """, (success, total_execution_time, results_json, entry_id))
-            
-            conn.commit()
+        
+        self.history_writer(entry_id).finish(results)
+    
+    def history_writer(self, entry_id: int) -> "HistoryWriter":
+        """Writer appending each step's result to an entry as it finishes."""
+        return HistoryWriter(self, entry_id)
+    
+    def record_step(
+        self,
+        entry_id: int,
+        step: int,
+        result: ExecutionResult,
+        target: Optional[str] = None,
+    ) -> None:
+        """
+        Store the result of one step of an entry.
+        
+        Args:
+            entry_id: ID of the history entry
+            step: Position of the step in the plan
+            result: The step's result
+            target: Fan-out target the step ran on
+        """
+        self._write(lambda cursor: self._store_step(cursor, entry_id, step, result, target))
+    
+    def _store_step(
+        self,
+        cursor: sqlite3.Cursor,
+        entry_id: int,
+        step: int,
+        result: ExecutionResult,
+        target: Optional[str],
+    ) -> None:
+        data, digests = self._serialize_result(result)
+        if target is not None:
+            data["target"] = target
+        
+        cursor.execute("""
+            INSERT OR REPLACE INTO command_steps 
+            (history_id, step, target, command, status, return_code,
+             execution_time, timestamp, data)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            entry_id,
+            step,
+            target,
+            result.command.command,
+            result.status.value,
+            result.return_code,
+            result.execution_time,
+            datetime.now().isoformat(),
+            json.dumps(data),
+        ))
+        cursor.executemany(
+            "INSERT OR IGNORE INTO output_blobs (history_id, digest) VALUES (?, ?)",
+            [(entry_id, digest) for digest in digests],
+        )
+        # Running time so far; the entry stays unsuccessful until finished
+        cursor.execute("""
+            UPDATE command_history 
+            SET execution_time = (
+                SELECT COALESCE(SUM(execution_time), 0) 
+                FROM command_steps WHERE history_id = ?
+            )
+            WHERE id = ?
+        """, (entry_id, entry_id))
+        self._record_timings(cursor, [result])
+    
+    def finish_entry(self, entry_id: int, success: bool) -> None:
+        """Record the overall outcome of an entry whose steps are stored."""
+        self._write(lambda cursor: self._store_outcome(cursor, entry_id, success))
+    
+    def _store_outcome(self, cursor: sqlite3.Cursor, entry_id: int, success: bool) -> None:
+        # Only prompts that worked are offered as similar commands
+        cursor.execute("""
+            SELECT h.prompt, d.history_id IS NOT NULL
+            FROM command_history h
+            LEFT JOIN prompt_index_docs d ON d.history_id = h.id
+            WHERE h.id = ?
+        """, (entry_id,))
+        row = cursor.fetchone()
+        if row and success:
+            prompt_index.index_prompt(cursor, entry_id, row[0])
+            # Appends are serialized by the write transaction; a missing
+            # matrix is built from the whole history on first search
+            if self.vectors is not None and not row[1] and self.vectors.exists():
+                self.vectors.add([(entry_id, row[0])])
+        elif row:
+            prompt_index.unindex_prompt(cursor, entry_id)
+            if self.vectors is not None and row[1]:
+                self.vectors.remove([entry_id])
+        cursor.execute("""
+            UPDATE command_history 
+            SET success = ?, execution_time = (
+                SELECT COALESCE(SUM(execution_time), 0) 
+                FROM command_steps WHERE history_id = ?
+            )
+            WHERE id = ?
+        """, (success, entry_id, entry_id))
+    
+    def _serialize_result(self, result: ExecutionResult) -> Tuple[Dict[str, Any], Set[str]]:
+        """Result as a JSON-ready dict, spilling large outputs to blobs."""
+        data = {
+            "command": result.command.command,
+            "status": result.status.value,
+            "return_code": result.return_code,
+            "execution_time": result.execution_time,
+            "error_message": result.error_message,
+            "stdout_bytes": result.stdout_bytes,
+            "stderr_bytes": result.stderr_bytes,
+            "output_truncated": result.output_truncated,
+            "cached": result.cached,
+            "resources": (
+                result.resource_usage.to_dict()
+                if result.resource_usage is not None
+                else None
+            ),
+            "analysis": (
+                result.analysis.to_dict() if result.analysis is not None else None
+            ),
+        }
+        for stream in _OUTPUT_STREAMS:
+            data[stream] = getattr(result, stream)
+        return data, self._spill_outputs(data)
+    
+    def _spill_outputs(self, data: Dict[str, Any]) -> Set[str]:
+        """Move large outputs of a result dict to blobs; returns their digests."""
+        digests = set()
+        for stream in _OUTPUT_STREAMS:
+            text = data.get(stream)
+            if text is None:
+                continue
+            encoded = text.encode("utf-8")
+            if len(encoded) > self.spill_threshold:
+                digest = self.blobs.put(encoded)
+                digests.add(digest)
+                data[stream] = None
+                data[f"{stream}_blob"] = digest
+        return digests
+    
+    def _resolve_outputs(self, data: Dict[str, Any]) -> None:
+        """Replace blob references of a result dict with the outputs."""
+        for stream in _OUTPUT_STREAMS:
+            digest = data.get(f"{stream}_blob")
+            if digest and data.get(stream) is None:
+                data[stream] = self.load_output(digest)
     
     def get_history(self, limit: int = 10, search: Optional[str] = None) -> List[HistoryEntry]:
         """
         Get command history entries.
+
+        Searches use the full-text index when available: every word must
+        match a prompt or command word (as a prefix), results are ranked by
+        bm25 and carry a highlighted snippet. Otherwise they fall back to a
+        substring match, newest first.
         
         Args:
             limit: Maximum number of entries to return
@@ -196,132 +372,655 @@ class ContextManager:
         Returns:
             List of HistoryEntry objects
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            query = """
-                SELECT id, timestamp, prompt, commands, os_info, success, execution_time, results
+        query = fts_query(search) if search else ""
+        if query and self.full_text_search:
+            return self._search_history(query, limit)
+
+        with self._db.transaction() as cursor:
+            sql = """
+                SELECT id, timestamp, prompt, commands, os_info, success, execution_time
                 FROM command_history
             """
             params = []
             
             if search:
-                query += " WHERE prompt LIKE ? OR commands LIKE ?"
+                sql += " WHERE prompt LIKE ? OR commands LIKE ?"
                 search_term = f"%{search}%"
                 params.extend([search_term, search_term])
             
-            query += " ORDER BY timestamp DESC LIMIT ?"
+            sql += " ORDER BY timestamp DESC LIMIT ?"
             params.append(limit)
             
-            cursor.execute(query, params)
+            cursor.execute(sql, params)
             rows = cursor.fetchall()
-            
-            entries = []
-            for row in rows:
-                commands_list = json.loads(row[3]) if row[3] else []
-                
-                entry = HistoryEntry(
-                    id=row[0],
-                    timestamp=row[1],
-                    prompt=row[2],
-                    commands=commands_list,
-                    os_info=row[4],
-                    success=bool(row[5]),
-                    execution_time=row[6],
-                    results=row[7]
-                )
-                entries.append(entry)
-            
-            return entries
+        
+        return [self._history_entry(row) for row in rows]
+
+    def _search_history(self, query: str, limit: int) -> List[HistoryEntry]:
+        """Ranked full-text search over prompts and commands."""
+        with self._db.transaction() as cursor:
+            cursor.execute(_SEARCH_SQL, (MATCH_START, MATCH_END, query, limit))
+            rows = cursor.fetchall()
+        
+        entries = []
+        for row in rows:
+            entry = self._history_entry(row)
+            entry.snippet = row[7]
+            entries.append(entry)
+        return entries
+
+    @staticmethod
+    def _history_entry(row: Tuple[Any, ...]) -> HistoryEntry:
+        return HistoryEntry(
+            id=row[0],
+            timestamp=row[1],
+            prompt=row[2],
+            commands=json.loads(row[3]) if row[3] else [],
+            os_info=row[4],
+            success=bool(row[5]),
+            execution_time=row[6]
+        )
     
     def get_similar_commands(self, prompt: str, limit: int = 5) -> List[HistoryEntry]:
         """
         Find similar commands based on prompt similarity.
+
+        Successful prompts are kept in an inverted index, so only entries
+        sharing a word with the prompt are scored (with BM25).
         
         Args:
             prompt: The current prompt to find similar commands for
             limit: Maximum number of similar commands to return
             
         Returns:
-            List of similar HistoryEntry objects
+            List of similar HistoryEntry objects, most similar first
         """
-        # Simple keyword-based similarity for now
-        # In the future, this could use vector embeddings
-        keywords = set(prompt.lower().split())
-        
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        with self._db.transaction() as cursor:
+            best = prompt_index.top_k(cursor, prompt, limit)
+            if not best:
+                return []
             
-            cursor.execute("""
-                SELECT id, timestamp, prompt, commands, os_info, success, execution_time, results
+            ids = [entry_id for entry_id, _ in best]
+            placeholders = ", ".join("?" * len(ids))
+            cursor.execute(f"""
+                SELECT id, timestamp, prompt, commands, os_info, success, execution_time
                 FROM command_history
-                WHERE success = 1
-                ORDER BY timestamp DESC
-            """)
-            
-            rows = cursor.fetchall()
-            scored_entries = []
+                WHERE id IN ({placeholders})
+            """, ids)
+            entries = {row[0]: self._history_entry(row) for row in cursor.fetchall()}
+        
+        return [entries[entry_id] for entry_id in ids if entry_id in entries]
+    
+    def get_semantic_matches(self, prompt: str, limit: int = 5) -> List[HistoryEntry]:
+        """
+        Find successful entries whose prompts mean the same as ``prompt``.
+
+        Unlike :meth:`get_similar_commands`, prompts do not need to share
+        words: "show free space" finds "disk usage". Uses the local
+        embedding index, built from the history on first use.
+        
+        Args:
+            prompt: The prompt to find paraphrases of
+            limit: Maximum number of entries to return
             
-            for row in rows:
-                entry_prompt = row[2].lower()
-                entry_keywords = set(entry_prompt.split())
-                
-                # Calculate simple keyword overlap score
-                overlap = len(keywords.intersection(entry_keywords))
-                if overlap > 0:
-                    commands_list = json.loads(row[3]) if row[3] else []
-                    
-                    entry = HistoryEntry(
-                        id=row[0],
-                        timestamp=row[1],
-                        prompt=row[2],
-                        commands=commands_list,
-                        os_info=row[4],
-                        success=bool(row[5]),
-                        execution_time=row[6],
-                        results=row[7]
-                    )
-                    scored_entries.append((overlap, entry))
+        Returns:
+            Matching HistoryEntry objects with ``similarity`` set, best first
             
-            # Sort by score and return top results
-            scored_entries.sort(key=lambda x: x[0], reverse=True)
-            return [entry for _, entry in scored_entries[:limit]]
-    
-    def get_stats(self) -> Dict[str, Any]:
-        """Get usage statistics."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        Raises:
+            RuntimeError: NumPy is not installed
+        """
+        if self.vectors is None:
+            raise RuntimeError(
+                "Semantic search requires NumPy: pip install 'pilotcmd[semantic]'"
+            )
+        # Queued outcomes append to the vector files
+        self._db.flush(raise_errors=False)
+        if not self.vectors.exists():
+            self._build_vectors(self.vectors)
+        
+        # Extra candidates cover rows of deleted or re-indexed entries
+        matches = self.vectors.search(prompt, limit * 2 + 8)
+        similarity: Dict[int, float] = {}
+        for entry_id, score in matches:
+            similarity.setdefault(entry_id, score)
+        if not similarity:
+            return []
+        
+        placeholders = ", ".join("?" * len(similarity))
+        with self._db.transaction() as cursor:
+            cursor.execute(f"""
+                SELECT id, timestamp, prompt, commands, os_info, success, execution_time
+                FROM command_history
+                WHERE success = 1 AND id IN ({placeholders})
+            """, list(similarity))
+            entries = [self._history_entry(row) for row in cursor.fetchall()]
+        
+        for entry in entries:
+            if entry.id is not None:
+                entry.similarity = similarity[entry.id]
+        entries.sort(key=lambda entry: (entry.similarity, entry.id), reverse=True)
+        return entries[:limit]
+    
+    def _build_vectors(self, vectors: VectorIndex) -> None:
+        """Embed every successful prompt into a new vector index."""
+        with self._db.transaction(immediate=True) as cursor:
+            # Another process may have built it while we waited for the lock
+            if vectors.exists():
+                return
+            cursor.execute("SELECT id, prompt FROM command_history WHERE success = 1 ORDER BY id")
+            rows = cursor.fetchall()
+            vectors.reset()
+            vectors.add(rows)
+    
+    def _record_timings(self, cursor: sqlite3.Cursor, results: List[ExecutionResult]) -> None:
+        """Add run times to the per-signature timing windows."""
+        now = datetime.now().isoformat()
+        for result in results:
+            # Skipped and cached commands did not run; a timeout is a lower
+            # bound, which still pushes the learned timeout up
+            if result.cached or result.status in (
+                ExecutionStatus.SKIPPED, ExecutionStatus.CANCELLED
+            ):
+                continue
+            signature = command_signature(result.command.command)
+            if not signature:
+                continue
             
-            # Total commands
-            cursor.execute("SELECT COUNT(*) FROM command_history")
-            total_commands = cursor.fetchone()[0]
+            cursor.execute(
+                "SELECT samples, count FROM command_timings WHERE signature = ?",
+                (signature,),
+            )
+            row = cursor.fetchone()
+            samples = json.loads(row[0]) if row else []
+            count = (row[1] if row else 0) + 1
+            samples.append(round(result.execution_time, 4))
+            timing = CommandTiming.from_samples(signature, samples, count)
             
-            # Successful commands
-            cursor.execute("SELECT COUNT(*) FROM command_history WHERE success = 1")
-            successful_commands = cursor.fetchone()[0]
+            usage = result.resource_usage
+            if usage is not None:
+                cursor.execute("""
+                    INSERT INTO command_resources 
+                    (signature, runs, cpu_time_total, cpu_time_max, max_rss_kb,
+                     block_io_total, wall_time_total, updated_at)
+                    VALUES (?, 1, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(signature) DO UPDATE SET
+                        runs = runs + 1,
+                        cpu_time_total = cpu_time_total + excluded.cpu_time_total,
+                        cpu_time_max = MAX(cpu_time_max, excluded.cpu_time_max),
+                        max_rss_kb = MAX(max_rss_kb, excluded.max_rss_kb),
+                        block_io_total = block_io_total + excluded.block_io_total,
+                        wall_time_total = wall_time_total + excluded.wall_time_total,
+                        updated_at = excluded.updated_at
+                """, (
+                    signature,
+                    usage.cpu_time,
+                    usage.cpu_time,
+                    usage.max_rss_kb,
+                    usage.block_input + usage.block_output,
+                    result.execution_time,
+                    now,
+                ))
             
-            # Average execution time
-            cursor.execute("SELECT AVG(execution_time) FROM command_history WHERE success = 1")
-            avg_execution_time = cursor.fetchone()[0] or 0.0
+            cursor.execute("""
+                INSERT OR REPLACE INTO command_timings 
+                (signature, samples, count, p50, p95, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (
+                signature,
+                json.dumps(timing.samples[-SAMPLE_WINDOW:]),
+                timing.count,
+                timing.p50,
+                timing.p95,
+                now,
+            ))
+    
+    def get_expensive_commands(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Rank command signatures by the CPU time they have consumed.
+        
+        Args:
+            limit: Maximum number of signatures to return
             
-            # Most common prompts
+        Returns:
+            List of dictionaries with totals, averages and peaks per signature
+        """
+        with self._db.transaction() as cursor:
             cursor.execute("""
-                SELECT prompt, COUNT(*) as count 
-                FROM command_history 
-                GROUP BY prompt 
-                ORDER BY count DESC 
-                LIMIT 5
-            """)
-            common_prompts = cursor.fetchall()
+                SELECT signature, runs, cpu_time_total, cpu_time_max, max_rss_kb,
+                       block_io_total, wall_time_total
+                FROM command_resources
+                ORDER BY cpu_time_total DESC
+                LIMIT ?
+            """, (limit,))
+            return [
+                {
+                    "signature": row[0],
+                    "runs": row[1],
+                    "cpu_time_total": row[2],
+                    "cpu_time_avg": row[2] / row[1],
+                    "cpu_time_max": row[3],
+                    "max_rss_kb": row[4],
+                    "block_io_total": row[5],
+                    "wall_time_avg": row[6] / row[1],
+                }
+                for row in cursor.fetchall()
+            ]
+    
+    def get_timings(self, signatures: List[str]) -> Dict[str, CommandTiming]:
+        """
+        Get recorded run time statistics.
+        
+        Args:
+            signatures: Command signatures to look up
             
+        Returns:
+            Mapping of signature to timing, for signatures with history
+        """
+        signatures = sorted(set(signatures))
+        if not signatures:
+            return {}
+        
+        with self._db.transaction() as cursor:
+            placeholders = ", ".join("?" for _ in signatures)
+            cursor.execute(f"""
+                SELECT signature, samples, count, p50, p95 
+                FROM command_timings 
+                WHERE signature IN ({placeholders})
+            """, signatures)
             return {
-                "total_commands": total_commands,
-                "successful_commands": successful_commands,
-                "success_rate": successful_commands / total_commands if total_commands > 0 else 0.0,
-                "average_execution_time": avg_execution_time,
-                "common_prompts": [{"prompt": row[0], "count": row[1]} for row in common_prompts]
+                row[0]: CommandTiming(
+                    signature=row[0],
+                    samples=json.loads(row[1]),
+                    count=row[2],
+                    p50=row[3],
+                    p95=row[4],
+                )
+                for row in cursor.fetchall()
             }
     
+    def get_results(self, entry_id: int, include_output: bool = True) -> List[Dict[str, Any]]:
+        """
+        Load the execution results of a history entry.
+
+        History listings do not read results; they are only fetched here, and
+        spilled outputs are read from the blob store only when requested.
+        
+        Args:
+            entry_id: ID of the history entry
+            include_output: Resolve spilled stdout/stderr blobs
+            
+        Returns:
+            List of result dictionaries (empty if the entry was not executed)
+        """
+        with self._db.transaction() as cursor:
+            cursor.execute(
+                "SELECT data FROM command_steps WHERE history_id = ? ORDER BY step",
+                (entry_id,),
+            )
+            steps = cursor.fetchall()
+            if not steps:
+                # Entries written before per-step storage keep a JSON array
+                cursor.execute("SELECT results FROM command_history WHERE id = ?", (entry_id,))
+                row = cursor.fetchone()
+        
+        if steps:
+            results = [json.loads(step[0]) for step in steps]
+        elif row and row[0]:
+            results = json.loads(row[0])
+        else:
+            return []
+        if include_output:
+            for data in results:
+                self._resolve_outputs(data)
+        return results
+    
+    def iter_entries(
+        self, include_output: bool = True, page_size: int = EXPORT_PAGE
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Every history entry with its results, oldest first, for archiving.
+
+        Entries are read a page at a time, keyed on the last id seen, so
+        memory use does not grow with the history and no lock is held
+        between pages. Entries added meanwhile are included.
+        
+        Args:
+            include_output: Inline stdout/stderr, reading spilled blobs;
+                otherwise both are left out
+            page_size: Entries read per query
+        """
+        last_id = 0
+        while True:
+            with self._db.transaction() as cursor:
+                cursor.execute("""
+                    SELECT id, timestamp, prompt, commands, os_info, success,
+                           execution_time, results
+                    FROM command_history WHERE id > ? ORDER BY id LIMIT ?
+                """, (last_id, page_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    return
+                cursor.execute("""
+                    SELECT history_id, timestamp, data FROM command_steps
+                    WHERE history_id BETWEEN ? AND ? ORDER BY history_id, step
+                """, (rows[0][0], rows[-1][0]))
+                steps: Dict[int, List[Dict[str, Any]]] = {}
+                for history_id, recorded_at, data in cursor.fetchall():
+                    result = json.loads(data)
+                    result["recorded_at"] = recorded_at
+                    steps.setdefault(history_id, []).append(result)
+            
+            for entry_id, timestamp, prompt, commands, os_info, success, execution_time, legacy in rows:
+                results = steps.get(entry_id) or (json.loads(legacy) if legacy else [])
+                for data in results:
+                    if include_output:
+                        self._resolve_outputs(data)
+                    for stream in _OUTPUT_STREAMS:
+                        data.pop(f"{stream}_blob", None)
+                        if not include_output:
+                            data.pop(stream, None)
+                yield {
+                    "timestamp": timestamp,
+                    "prompt": prompt,
+                    "commands": json.loads(commands),
+                    "os_info": json.loads(os_info),
+                    "success": bool(success),
+                    "execution_time": execution_time,
+                    "results": results,
+                }
+            last_id = rows[-1][0]
+    
+    def import_entries(
+        self, entries: Iterable[Dict[str, Any]], batch_size: int = IMPORT_BATCH
+    ) -> ImportReport:
+        """
+        Add archived entries, skipping those already in the history.
+
+        Entries are inserted ``batch_size`` at a time, each batch in one
+        transaction; an interrupted import keeps the batches it committed
+        and can simply be run again.
+        
+        Args:
+            entries: Entries as produced by :meth:`iter_entries`
+            batch_size: Entries per transaction
+        """
+        report = ImportReport()
+        batch: List[Dict[str, Any]] = []
+        for entry in entries:
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                self._import_batch(batch, report)
+                batch = []
+        if batch:
+            self._import_batch(batch, report)
+        return report
+    
+    def _import_batch(self, entries: List[Dict[str, Any]], report: ImportReport) -> None:
+        hashed = [
+            (content_hash(e["timestamp"], e["prompt"], e["commands"], e["os_info"]), e)
+            for e in entries
+        ]
+        with self._db.transaction(immediate=True) as cursor:
+            placeholders = ", ".join("?" * len(hashed))
+            cursor.execute(
+                f"SELECT hash FROM history_hashes WHERE hash IN ({placeholders})",
+                [digest for digest, _ in hashed],
+            )
+            seen = {row[0] for row in cursor.fetchall()}
+            indexed = []
+            
+            for digest, entry in hashed:
+                if digest in seen:
+                    report.duplicates += 1
+                    continue
+                seen.add(digest)
+                
+                success = bool(entry.get("success"))
+                cursor.execute("""
+                    INSERT INTO command_history 
+                    (timestamp, prompt, commands, os_info, success, execution_time)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (
+                    entry["timestamp"],
+                    entry["prompt"],
+                    json.dumps(entry["commands"]),
+                    json.dumps(entry["os_info"]),
+                    success,
+                    entry.get("execution_time") or 0.0,
+                ))
+                entry_id = cursor.lastrowid
+                assert entry_id is not None
+                cursor.execute(
+                    "INSERT INTO history_hashes (hash, history_id) VALUES (?, ?)",
+                    (digest, entry_id),
+                )
+                
+                steps = []
+                blobs = set()
+                for index, result in enumerate(entry.get("results") or []):
+                    data = dict(result)
+                    recorded_at = data.pop("recorded_at", entry["timestamp"])
+                    blobs |= self._spill_outputs(data)
+                    steps.append((
+                        entry_id,
+                        index,
+                        data.get("target"),
+                        data.get("command", ""),
+                        data.get("status", ""),
+                        data.get("return_code"),
+                        data.get("execution_time") or 0.0,
+                        recorded_at,
+                        json.dumps(data),
+                    ))
+                cursor.executemany("""
+                    INSERT INTO command_steps 
+                    (history_id, step, target, command, status, return_code,
+                     execution_time, timestamp, data)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, steps)
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO output_blobs (history_id, digest) VALUES (?, ?)",
+                    [(entry_id, blob) for blob in blobs],
+                )
+                
+                usage_stats.record_prompt(cursor, entry["prompt"])
+                if success:
+                    prompt_index.index_prompt(cursor, entry_id, entry["prompt"])
+                    indexed.append((entry_id, entry["prompt"]))
+                report.imported += 1
+            
+            if indexed and self.vectors is not None and self.vectors.exists():
+                self.vectors.add(indexed)
+    
+    def _enforce_retention(
+        self, cursor: sqlite3.Cursor, policy: RetentionPolicy, check_size: bool
+    ) -> int:
+        """
+        Delete one batch of the oldest entries over each limit.
+        
+        Returns:
+            Number of entries deleted
+        """
+        deleted = 0
+        if policy.max_rows:
+            deleted += self._delete_entries(cursor, self._oldest_beyond(cursor, policy.max_rows))
+        
+        if policy.max_age_days:
+            cutoff = (datetime.now() - timedelta(days=policy.max_age_days)).isoformat()
+            cursor.execute(
+                "SELECT id FROM command_history WHERE timestamp < ? ORDER BY timestamp LIMIT ?",
+                (cutoff, PRUNE_BATCH),
+            )
+            deleted += self._delete_entries(cursor, [r[0] for r in cursor.fetchall()])
+        
+        if policy.max_bytes and check_size and self._history_size(cursor) > policy.max_bytes:
+            deleted += self._delete_entries(
+                cursor, self._oldest_beyond(cursor, MIN_RETAINED_ENTRIES)
+            )
+        
+        return deleted
+    
+    def _oldest_beyond(self, cursor: sqlite3.Cursor, keep: int) -> List[int]:
+        """
+        Ids of up to one batch of the oldest entries beyond the newest ``keep``.
+        
+        Age is the entry's timestamp, not its id: imported entries get new
+        ids however old they are.
+        """
+        cursor.execute("SELECT COUNT(*) FROM command_history")
+        excess = cursor.fetchone()[0] - keep
+        if excess <= 0:
+            return []
+        cursor.execute(
+            "SELECT id FROM command_history ORDER BY timestamp, id LIMIT ?",
+            (min(excess, PRUNE_BATCH),),
+        )
+        return [row[0] for row in cursor.fetchall()]
+    
+    def _history_size(self, cursor: sqlite3.Cursor) -> int:
+        """Bytes of live data: used database pages plus output blobs."""
+        cursor.execute("PRAGMA page_count")
+        pages: int = cursor.fetchone()[0]
+        cursor.execute("PRAGMA freelist_count")
+        pages -= cursor.fetchone()[0]
+        cursor.execute("PRAGMA page_size")
+        page_size: int = cursor.fetchone()[0]
+        return pages * page_size + self.blobs.total_size()
+    
+    def _delete_entries(self, cursor: sqlite3.Cursor, entry_ids: List[int]) -> int:
+        """
+        Delete entries with their steps, index rows, vectors and unshared blobs.
+        
+        Blobs are removed after the transaction commits, so a rollback never
+        leaves rows whose outputs are gone.
+        """
+        deleted = 0
+        orphaned: List[str] = []
+        for start in range(0, len(entry_ids), 500):
+            chunk = entry_ids[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            cursor.execute(
+                f"SELECT DISTINCT digest FROM output_blobs WHERE history_id IN ({placeholders})",
+                chunk,
+            )
+            digests = [row[0] for row in cursor.fetchall()]
+            # Steps, full-text and prompt index rows go with their entry (triggers)
+            cursor.execute(f"DELETE FROM command_history WHERE id IN ({placeholders})", chunk)
+            deleted += cursor.rowcount
+            cursor.execute(f"DELETE FROM output_blobs WHERE history_id IN ({placeholders})", chunk)
+            if digests:
+                placeholders = ", ".join("?" * len(digests))
+                cursor.execute(
+                    f"SELECT DISTINCT digest FROM output_blobs WHERE digest IN ({placeholders})",
+                    digests,
+                )
+                shared = {row[0] for row in cursor.fetchall()}
+                orphaned += [digest for digest in digests if digest not in shared]
+            if self.vectors is not None:
+                self.vectors.remove(chunk)
+        if orphaned:
+            self._db.after_commit(self._blob_cleanup(orphaned))
+        return deleted
+    
+    def _blob_cleanup(self, digests: List[str]) -> Callable[[sqlite3.Cursor], None]:
+        """
+        A write removing the blobs that are still unreferenced.
+        
+        Outputs are stored under the write lock, so while it is held no other
+        process can start reusing a blob being removed.
+        """
+        def cleanup(cursor: sqlite3.Cursor) -> None:
+            for start in range(0, len(digests), 500):
+                chunk = digests[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                cursor.execute(
+                    f"SELECT DISTINCT digest FROM output_blobs WHERE digest IN ({placeholders})",
+                    chunk,
+                )
+                referenced = {row[0] for row in cursor.fetchall()}
+                self.blobs.delete(digest for digest in chunk if digest not in referenced)
+        
+        return cleanup
+    
+    def disk_usage(self) -> int:
+        """Bytes the history takes on disk: database, WAL, blobs and vectors."""
+        paths = [self.db_path, f"{self.db_path}-wal"]
+        if self.vectors is not None:
+            paths += [self.vectors.vectors_path, self.vectors.ids_path]
+        total = self.blobs.total_size()
+        for path in paths:
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        return total
+    
+    def prune(self, policy: Optional[RetentionPolicy] = None) -> PruneReport:
+        """
+        Apply a retention policy in full and return the freed space to the OS.
+        
+        Args:
+            policy: Limits to apply; defaults to the manager's policy
+        """
+        policy = policy or self.retention
+        before = self.disk_usage()
+        deleted = 0
+        while True:
+            with self._db.transaction(immediate=True) as cursor:
+                batch = self._enforce_retention(cursor, policy, check_size=True)
+            deleted += batch
+            if not batch:
+                break
+        self._db.incremental_vacuum()
+        self._db.checkpoint()
+        return PruneReport(deleted, before, self.disk_usage())
+    
+    def compact(self) -> PruneReport:
+        """Rebuild the database file and the vector index without free space."""
+        before = self.disk_usage()
+        if self.vectors is not None:
+            # Drops removed rows; rebuilt from the history on the next search
+            with self._db.transaction(immediate=True):
+                self.vectors.reset()
+        self._db.vacuum()
+        return PruneReport(0, before, self.disk_usage())
+    
+    def load_output(self, digest: str) -> str:
+        """Read a spilled output by digest."""
+        try:
+            return self.blobs.get(digest).decode("utf-8", errors="replace")
+        except FileNotFoundError:
+            return f"[output {digest[:12]} is no longer available]"
+    
+    def _delete_unreferenced_blobs(self, cursor: sqlite3.Cursor) -> None:
+        """Drop blob references of deleted entries; orphaned blobs go after commit."""
+        cursor.execute("""
+            DELETE FROM output_blobs 
+            WHERE history_id NOT IN (SELECT id FROM command_history)
+        """)
+        if not cursor.rowcount:
+            return
+        
+        cursor.execute("SELECT DISTINCT digest FROM output_blobs")
+        referenced = {row[0] for row in cursor.fetchall()}
+        orphaned = [digest for digest in self.blobs.digests() if digest not in referenced]
+        if orphaned:
+            self._db.after_commit(self._blob_cleanup(orphaned))
+    
+    def get_stats(self, top: int = 5) -> Dict[str, Any]:
+        """
+        Get usage statistics.
+
+        Counters are maintained as entries are written, so this reads a few
+        rows whatever the size of the history. They cover every entry ever
+        recorded, including ones removed by retention or clearing.
+        
+        Args:
+            top: Number of most frequent prompts to return
+        """
+        with self._db.transaction() as cursor:
+            return usage_stats.read_stats(cursor, top)
+    
     def clear_history(self, older_than_days: Optional[int] = None) -> int:
         """
         Clear command history.
@@ -332,16 +1031,16 @@ class ContextManager:
         Returns:
             Number of entries deleted
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        with self._db.transaction(immediate=True) as cursor:
             
             if older_than_days:
-                from datetime import timedelta
                 cutoff_date = (datetime.now() - timedelta(days=older_than_days)).isoformat()
-                cursor.execute("DELETE FROM command_history WHERE timestamp < ?", (cutoff_date,))
-            else:
-                cursor.execute("DELETE FROM command_history")
+                cursor.execute("SELECT id FROM command_history WHERE timestamp < ?", (cutoff_date,))
+                return self._delete_entries(cursor, [row[0] for row in cursor.fetchall()])
             
+            if self.vectors is not None:
+                self.vectors.reset()
+            cursor.execute("DELETE FROM command_history")
             deleted_count = cursor.rowcount
-            conn.commit()
+            self._delete_unreferenced_blobs(cursor)
             return deleted_count
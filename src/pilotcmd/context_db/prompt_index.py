@@ -0,0 +1,147 @@
+"""
+Inverted index of successful prompts for similarity lookups.
+
+Each successful entry's prompt is tokenized once, when the entry finishes,
+into postings of ``(term, entry, term frequency, prompt length)``. A lookup
+reads only postings of the query's terms, scores them with BM25 inside
+SQLite and keeps the best entries, so its cost depends on how many entries
+share the query's rarest words instead of on the size of the history.
+
+Document frequencies and corpus totals are kept up to date by triggers (see
+:mod:`pilotcmd.context_db.schema`).
+"""
+
+import math
+import re
+import sqlite3
+from collections import Counter
+from typing import List, Tuple
+
+# BM25 term-frequency saturation and length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Most entries taken from one term's postings (newest first). Only very
+# common words ("show", "the") have more; queries made of nothing else are
+# ranked among their newest entries
+MAX_POSTINGS = 128
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens of a prompt."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def index_prompt(cursor: sqlite3.Cursor, entry_id: int, prompt: str) -> None:
+    """Add (or re-add) an entry's prompt to the index."""
+    unindex_prompt(cursor, entry_id)
+    terms = Counter(tokenize(prompt))
+    if not terms:
+        return
+    length = sum(terms.values())
+    cursor.execute(
+        "INSERT INTO prompt_index_docs (history_id, length) VALUES (?, ?)",
+        (entry_id, length),
+    )
+    cursor.executemany(
+        "INSERT INTO prompt_index_terms (term, history_id, tf, length) VALUES (?, ?, ?, ?)",
+        [(term, entry_id, tf, length) for term, tf in terms.items()],
+    )
+
+
+def unindex_prompt(cursor: sqlite3.Cursor, entry_id: int) -> None:
+    """Remove an entry from the index."""
+    cursor.execute("DELETE FROM prompt_index_terms WHERE history_id = ?", (entry_id,))
+    cursor.execute("DELETE FROM prompt_index_docs WHERE history_id = ?", (entry_id,))
+
+
+def idf(documents: int, df: int) -> float:
+    """BM25 inverse document frequency, never negative."""
+    return math.log(1.0 + (documents - df + 0.5) / (df + 0.5))
+
+
+def top_k(cursor: sqlite3.Cursor, prompt: str, k: int) -> List[Tuple[int, float]]:
+    """
+    The ``k`` indexed entries most similar to a prompt.
+
+    Returns:
+        ``(entry id, score)`` pairs, best first; ties favor newer entries
+    """
+    terms = set(tokenize(prompt))
+    if not terms or k <= 0:
+        return []
+
+    cursor.execute("SELECT documents, total_length FROM prompt_index_stats")
+    row = cursor.fetchone()
+    if not row or not row[0]:
+        return []
+    documents, total_length = row
+    average_length = total_length / documents
+
+    placeholders = ", ".join("?" * len(terms))
+    cursor.execute(
+        f"SELECT term, df FROM prompt_index_df WHERE term IN ({placeholders})",
+        tuple(terms),
+    )
+    frequencies = dict(cursor.fetchall())
+    if not frequencies:
+        return []
+
+    # MaxScore: candidates come from the postings of the rarest terms only
+    # and are scored on every term inside SQLite. The next most selective
+    # term is added only while an entry matching none of the candidate terms
+    # could still beat the k-th score, so long postings are rarely read
+    weighted = sorted(
+        ((idf(documents, df), df, term) for term, df in frequencies.items()), reverse=True
+    )
+    bounds = [weight * (BM25_K1 + 1) for weight, _, _ in weighted]
+    for essential in range(1, len(weighted) + 1):
+        best = _score_candidates(
+            cursor, weighted, [term for _, _, term in weighted[:essential]], average_length, k
+        )
+        if len(best) >= k and best[-1][1] >= sum(bounds[essential:]):
+            break
+        # Past the postings cap the ranking is approximate anyway
+        if weighted[essential - 1][1] > MAX_POSTINGS:
+            break
+    return best
+
+
+def _score_candidates(
+    cursor: sqlite3.Cursor,
+    weighted: List[Tuple[float, int, str]],
+    sources: List[str],
+    average_length: float,
+    k: int,
+) -> List[Tuple[int, float]]:
+    """BM25 top-k over the entries containing one of the ``sources`` terms."""
+    query_terms = ", ".join("(?, ?)" for _ in weighted)
+    candidates = " UNION ".join(
+        "SELECT history_id FROM (SELECT history_id FROM prompt_index_terms "
+        "WHERE term = ? ORDER BY history_id DESC LIMIT ?)"
+        for _ in sources
+    )
+    params: List[object] = []
+    for weight, _, term in weighted:
+        params.extend((term, weight))
+    for term in sources:
+        params.extend((term, MAX_POSTINGS))
+    params.extend((BM25_K1 + 1, BM25_K1, 1 - BM25_B, BM25_B / average_length, k))
+    cursor.execute(
+        f"""
+        WITH query(term, weight) AS (VALUES {query_terms}),
+             candidates(history_id) AS ({candidates})
+        SELECT c.history_id,
+               SUM(q.weight * p.tf * ? / (p.tf + ? * (? + ? * p.length))) AS score
+        FROM candidates c
+        CROSS JOIN query q
+        JOIN prompt_index_terms p ON p.term = q.term AND p.history_id = c.history_id
+        GROUP BY c.history_id
+        ORDER BY score DESC, c.history_id DESC
+        LIMIT ?
+        """,
+        params,
+    )
+    return cursor.fetchall()
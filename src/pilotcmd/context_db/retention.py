@@ -0,0 +1,60 @@
+"""
+Retention policy for the command history.
+
+Limits are enforced incrementally as entries are written: each new entry
+deletes at most one batch of the oldest entries over the row or age limit,
+and every few entries the size of the database and its output blobs is
+checked against the size limit. ``pilotcmd history prune`` applies the
+policy in full.
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+from pilotcmd.config.manager import Config
+
+# Most entries deleted by one incremental pass
+PRUNE_BATCH = 50
+
+# Entries between two checks of the size limit (it needs a directory scan)
+SIZE_CHECK_INTERVAL = 20
+
+# The size limit never deletes the newest entries (they may still be running)
+MIN_RETAINED_ENTRIES = 10
+
+# Free pages reclaimed by one background incremental vacuum
+VACUUM_PAGES = 1024
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """History limits; ``None`` (or 0 in the config) means unlimited."""
+
+    max_rows: Optional[int] = None
+    max_age_days: Optional[int] = None
+    max_bytes: Optional[int] = None
+
+    @classmethod
+    def from_config(cls, config: Config) -> "RetentionPolicy":
+        return cls(
+            max_rows=config.history_limit or None,
+            max_age_days=config.history_max_age_days or None,
+            max_bytes=config.history_max_size or None,
+        )
+
+    @property
+    def unlimited(self) -> bool:
+        return not (self.max_rows or self.max_age_days or self.max_bytes)
+
+
+@dataclass
+class PruneReport:
+    """Outcome of pruning or compacting the history."""
+
+    deleted_entries: int
+    bytes_before: int
+    bytes_after: int
+
+    @property
+    def reclaimed_bytes(self) -> int:
+        return max(0, self.bytes_before - self.bytes_after)
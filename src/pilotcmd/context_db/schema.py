@@ -0,0 +1,451 @@
+"""
+Versioned schema of the context database.
+
+The schema version is kept in SQLite's ``user_version`` header field. Each
+migration brings the database from the previous version to its own; only
+the missing ones run, so an up-to-date database costs a single pragma read
+on startup instead of re-running every ``CREATE`` statement.
+
+Version 1 is the schema as it existed before versioning. Its statements use
+``IF NOT EXISTS`` so databases created by older releases upgrade cleanly.
+"""
+
+import json
+import sqlite3
+from typing import Callable, List, Tuple, Union
+
+from pilotcmd.context_db.archive import content_hash
+from pilotcmd.context_db.prompt_index import index_prompt
+from pilotcmd.context_db.usage_stats import (
+    HISTOGRAM_BOUNDS,
+    SKETCH_CAPACITY,
+    bucket_sql,
+    prompt_key,
+)
+
+# A migration is a list of statements, or a function for conditional steps
+Migration = Union[List[str], Callable[[sqlite3.Connection], None]]
+
+
+def fts5_available(conn: sqlite3.Connection) -> bool:
+    """Whether this SQLite build includes the FTS5 extension."""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+    except sqlite3.OperationalError:
+        return False
+    conn.execute("DROP TABLE temp.fts5_probe")
+    return True
+
+
+def _create_history_fts(conn: sqlite3.Connection) -> None:
+    """
+    Full-text index over prompts and the individual commands of each entry.
+
+    Commands are indexed as plain text (one per line) rather than as their
+    JSON encoding. Triggers keep the index in sync with command_history.
+    Without FTS5, searches fall back to LIKE and this step is a no-op.
+    """
+    if not fts5_available(conn):
+        return
+    commands_text = "(SELECT group_concat(value, char(10)) FROM json_each({}.commands))"
+    statements = [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+            prompt, commands,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS history_fts_insert AFTER INSERT ON command_history
+        BEGIN
+            INSERT INTO history_fts (rowid, prompt, commands)
+            VALUES (new.id, new.prompt, {commands_text.format("new")});
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS history_fts_delete AFTER DELETE ON command_history
+        BEGIN
+            DELETE FROM history_fts WHERE rowid = old.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS history_fts_update
+        AFTER UPDATE OF prompt, commands ON command_history
+        BEGIN
+            DELETE FROM history_fts WHERE rowid = old.id;
+            INSERT INTO history_fts (rowid, prompt, commands)
+            VALUES (new.id, new.prompt, {commands_text.format("new")});
+        END
+        """,
+        f"""
+        INSERT INTO history_fts (rowid, prompt, commands)
+        SELECT id, prompt, {commands_text.format("command_history")}
+        FROM command_history
+        """,
+    ]
+    for statement in statements:
+        conn.execute(statement)
+
+
+def _create_prompt_index(conn: sqlite3.Connection) -> None:
+    """
+    Inverted index of successful prompts used by similarity lookups.
+
+    Postings are written by :mod:`pilotcmd.context_db.prompt_index` when an
+    entry succeeds; triggers maintain document frequencies and corpus
+    totals, and drop the postings of deleted entries.
+    """
+    statements = [
+        """
+        CREATE TABLE IF NOT EXISTS prompt_index_docs (
+            history_id INTEGER PRIMARY KEY,
+            length INTEGER NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS prompt_index_terms (
+            term TEXT NOT NULL,
+            history_id INTEGER NOT NULL,
+            tf INTEGER NOT NULL,
+            length INTEGER NOT NULL,  -- prompt length, saves a join per posting
+            PRIMARY KEY (term, history_id)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_prompt_index_terms_history
+        ON prompt_index_terms(history_id)
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS prompt_index_df (
+            term TEXT PRIMARY KEY,
+            df INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS prompt_index_stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            documents INTEGER NOT NULL,
+            total_length INTEGER NOT NULL
+        )
+        """,
+        "INSERT OR IGNORE INTO prompt_index_stats (id, documents, total_length) VALUES (1, 0, 0)",
+        """
+        CREATE TRIGGER IF NOT EXISTS prompt_index_docs_insert AFTER INSERT ON prompt_index_docs
+        BEGIN
+            UPDATE prompt_index_stats
+            SET documents = documents + 1, total_length = total_length + new.length;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS prompt_index_docs_delete AFTER DELETE ON prompt_index_docs
+        BEGIN
+            UPDATE prompt_index_stats
+            SET documents = documents - 1, total_length = total_length - old.length;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS prompt_index_terms_insert AFTER INSERT ON prompt_index_terms
+        BEGIN
+            INSERT INTO prompt_index_df (term, df) VALUES (new.term, 1)
+            ON CONFLICT(term) DO UPDATE SET df = df + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS prompt_index_terms_delete AFTER DELETE ON prompt_index_terms
+        BEGIN
+            UPDATE prompt_index_df SET df = df - 1 WHERE term = old.term;
+            DELETE FROM prompt_index_df WHERE term = old.term AND df <= 0;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS prompt_index_history_delete AFTER DELETE ON command_history
+        BEGIN
+            DELETE FROM prompt_index_terms WHERE history_id = old.id;
+            DELETE FROM prompt_index_docs WHERE history_id = old.id;
+        END
+        """,
+    ]
+    for statement in statements:
+        conn.execute(statement)
+
+    cursor = conn.cursor()
+    rows = conn.execute("SELECT id, prompt FROM command_history WHERE success = 1").fetchall()
+    for entry_id, prompt in rows:
+        index_prompt(cursor, entry_id, prompt)
+
+
+def _create_usage_stats(conn: sqlite3.Connection) -> None:
+    """
+    Usage counters kept current by triggers, and the prompt sketch.
+
+    Counters start from an aggregate over the existing history; the sketch
+    starts with its most frequent prompts, counted exactly.
+    """
+    bucket = bucket_sql
+    statements = [
+        """
+        CREATE TABLE IF NOT EXISTS usage_stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            entries INTEGER NOT NULL,
+            successful INTEGER NOT NULL,
+            successful_time_total REAL NOT NULL   -- run time of successful entries
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS usage_time_histogram (
+            bucket INTEGER PRIMARY KEY,
+            count INTEGER NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS prompt_sketch (
+            key TEXT PRIMARY KEY,     -- normalized prompt
+            prompt TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            error INTEGER NOT NULL    -- count inherited from the evicted prompt
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_prompt_sketch_count ON prompt_sketch(count, key)",
+        """
+        INSERT OR IGNORE INTO usage_stats (id, entries, successful, successful_time_total)
+        SELECT 1, COUNT(*), COALESCE(SUM(success = 1), 0),
+               COALESCE(SUM(CASE WHEN success = 1 THEN execution_time ELSE 0 END), 0)
+        FROM command_history
+        """,
+        f"""
+        WITH RECURSIVE buckets(bucket) AS (
+            SELECT 0 UNION ALL SELECT bucket + 1 FROM buckets WHERE bucket < {len(HISTOGRAM_BOUNDS)}
+        )
+        INSERT OR IGNORE INTO usage_time_histogram (bucket, count)
+        SELECT bucket, (
+            SELECT COUNT(*) FROM command_history
+            WHERE success = 1 AND {bucket("execution_time")} = buckets.bucket
+        )
+        FROM buckets
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS usage_stats_insert AFTER INSERT ON command_history
+        BEGIN
+            UPDATE usage_stats SET
+                entries = entries + 1,
+                successful = successful + (new.success = 1),
+                successful_time_total = successful_time_total
+                    + CASE WHEN new.success = 1 THEN new.execution_time ELSE 0 END
+            WHERE id = 1;
+            UPDATE usage_time_histogram SET count = count + 1
+            WHERE new.success = 1 AND bucket = {bucket("new.execution_time")};
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS usage_stats_update
+        AFTER UPDATE OF success, execution_time ON command_history
+        WHEN old.success = 1 OR new.success = 1
+        BEGIN
+            UPDATE usage_stats SET
+                successful = successful - (old.success = 1) + (new.success = 1),
+                successful_time_total = successful_time_total
+                    - CASE WHEN old.success = 1 THEN old.execution_time ELSE 0 END
+                    + CASE WHEN new.success = 1 THEN new.execution_time ELSE 0 END
+            WHERE id = 1;
+            UPDATE usage_time_histogram SET count = count - 1
+            WHERE old.success = 1 AND bucket = {bucket("old.execution_time")};
+            UPDATE usage_time_histogram SET count = count + 1
+            WHERE new.success = 1 AND bucket = {bucket("new.execution_time")};
+        END
+        """,
+    ]
+    for statement in statements:
+        conn.execute(statement)
+
+    rows = conn.execute("""
+        SELECT prompt, COUNT(*) AS count FROM command_history
+        GROUP BY lower(trim(prompt)) ORDER BY count DESC LIMIT ?
+    """, (SKETCH_CAPACITY,)).fetchall()
+    conn.executemany(
+        "INSERT OR IGNORE INTO prompt_sketch (key, prompt, count, error) VALUES (?, ?, ?, 0)",
+        [(prompt_key(prompt), prompt, count) for prompt, count in rows],
+    )
+
+
+def _create_history_hashes(conn: sqlite3.Connection) -> None:
+    """Content hash of every entry, so imported archives are deduplicated."""
+    statements = [
+        """
+        CREATE TABLE IF NOT EXISTS history_hashes (
+            hash TEXT PRIMARY KEY,   -- see archive.content_hash
+            history_id INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_history_hashes_id ON history_hashes(history_id)",
+        """
+        CREATE TRIGGER IF NOT EXISTS history_hashes_delete AFTER DELETE ON command_history
+        BEGIN
+            DELETE FROM history_hashes WHERE history_id = old.id;
+        END
+        """,
+    ]
+    for statement in statements:
+        conn.execute(statement)
+
+    rows = conn.execute("SELECT id, timestamp, prompt, commands, os_info FROM command_history")
+    conn.executemany(
+        "INSERT OR IGNORE INTO history_hashes (hash, history_id) VALUES (?, ?)",
+        (
+            (content_hash(timestamp, prompt, json.loads(commands), json.loads(os_info)), entry_id)
+            for entry_id, timestamp, prompt, commands, os_info in rows
+        ),
+    )
+
+
+def has_table(conn: sqlite3.Connection, name: str) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = ? AND type IN ('table', 'view')",
+        (name,),
+    ).fetchone()
+    return row is not None
+
+
+MIGRATIONS: List[Tuple[int, Migration]] = [
+    (1, [
+        """
+        CREATE TABLE IF NOT EXISTS command_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            prompt TEXT NOT NULL,
+            commands TEXT NOT NULL,  -- JSON array of commands
+            os_info TEXT NOT NULL,   -- JSON object with OS details
+            success BOOLEAN NOT NULL,
+            execution_time REAL NOT NULL,
+            results TEXT             -- JSON array of execution results
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS context_metadata (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+        """,
+        # Command templates (for future use)
+        """
+        CREATE TABLE IF NOT EXISTS command_templates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            description TEXT,
+            template TEXT NOT NULL,  -- JSON template structure
+            tags TEXT,               -- JSON array of tags
+            usage_count INTEGER DEFAULT 0,
+            created_at TEXT NOT NULL
+        )
+        """,
+        # Output blobs referenced by each history entry
+        """
+        CREATE TABLE IF NOT EXISTS output_blobs (
+            history_id INTEGER NOT NULL,
+            digest TEXT NOT NULL,
+            PRIMARY KEY (history_id, digest)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_output_blobs_digest ON output_blobs(digest)",
+        # Recent run times per normalized command signature
+        """
+        CREATE TABLE IF NOT EXISTS command_timings (
+            signature TEXT PRIMARY KEY,
+            samples TEXT NOT NULL,   -- JSON array of recent run times
+            count INTEGER NOT NULL,
+            p50 REAL NOT NULL,
+            p95 REAL NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+        """,
+        # Accumulated resource usage per normalized command signature
+        """
+        CREATE TABLE IF NOT EXISTS command_resources (
+            signature TEXT PRIMARY KEY,
+            runs INTEGER NOT NULL,
+            cpu_time_total REAL NOT NULL,
+            cpu_time_max REAL NOT NULL,
+            max_rss_kb INTEGER NOT NULL,
+            block_io_total INTEGER NOT NULL,
+            wall_time_total REAL NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_command_history_timestamp
+        ON command_history(timestamp DESC)
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_command_history_prompt ON command_history(prompt)",
+    ]),
+    (2, _create_history_fts),
+    # Per-step results, written as each step of a plan finishes
+    (3, [
+        """
+        CREATE TABLE IF NOT EXISTS command_steps (
+            history_id INTEGER NOT NULL,
+            step INTEGER NOT NULL,
+            target TEXT,             -- fan-out target, NULL for local runs
+            command TEXT NOT NULL,
+            status TEXT NOT NULL,
+            return_code INTEGER,
+            execution_time REAL NOT NULL,
+            timestamp TEXT NOT NULL,
+            data TEXT NOT NULL,      -- JSON object with the full result
+            PRIMARY KEY (history_id, step)
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS command_steps_delete AFTER DELETE ON command_history
+        BEGIN
+            DELETE FROM command_steps WHERE history_id = old.id;
+        END
+        """,
+    ]),
+    (4, _create_prompt_index),
+    (5, _create_usage_stats),
+    (6, _create_history_hashes),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    version: int = conn.execute("PRAGMA user_version").fetchone()[0]
+    return version
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Apply the migrations a database is missing.
+
+    Each migration runs in its own transaction together with the version
+    bump, so a failed upgrade leaves the database at the last good version.
+    Concurrent processes serialize on the write lock and re-check the
+    version, so every migration runs exactly once.
+
+    Returns:
+        The resulting schema version
+    """
+    version = schema_version(conn)
+    for target, statements in MIGRATIONS:
+        if target <= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated while we waited for the lock
+            version = schema_version(conn)
+            if target > version:
+                if callable(statements):
+                    statements(conn)
+                else:
+                    for statement in statements:
+                        conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {int(target)}")
+                version = target
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    return version
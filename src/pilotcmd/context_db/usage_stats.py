@@ -0,0 +1,104 @@
+"""
+Materialized usage statistics.
+
+Totals, the success count, run-time sums and a run-time histogram live in
+single-row tables kept current by triggers on ``command_history`` (see
+:mod:`pilotcmd.context_db.schema`), so reading them costs the same for ten
+entries as for a million. They count every entry ever recorded: pruning
+old history does not change them.
+
+The most frequent prompts are tracked with the Space-Saving heavy-hitters
+sketch: at most :data:`SKETCH_CAPACITY` prompts are counted; a new prompt
+evicts the least counted one and inherits its count as an error bound.
+Every prompt seen more than ``entries / SKETCH_CAPACITY`` times is
+guaranteed to be in the sketch.
+"""
+
+import re
+import sqlite3
+from typing import Any, Dict, List
+
+# Upper bounds (seconds) of the run-time histogram buckets; the last bucket
+# holds everything slower
+HISTOGRAM_BOUNDS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+SKETCH_CAPACITY = 128
+
+_SPACES_RE = re.compile(r"\s+")
+
+
+def bucket_sql(column: str) -> str:
+    """SQL expression mapping a run time to its histogram bucket."""
+    cases = " ".join(
+        f"WHEN {column} < {bound} THEN {index}" for index, bound in enumerate(HISTOGRAM_BOUNDS)
+    )
+    return f"(CASE {cases} ELSE {len(HISTOGRAM_BOUNDS)} END)"
+
+
+def bucket_label(index: int) -> str:
+    if index == 0:
+        return f"< {HISTOGRAM_BOUNDS[0]:g}s"
+    if index == len(HISTOGRAM_BOUNDS):
+        return f"≥ {HISTOGRAM_BOUNDS[-1]:g}s"
+    return f"{HISTOGRAM_BOUNDS[index - 1]:g}–{HISTOGRAM_BOUNDS[index]:g}s"
+
+
+def prompt_key(prompt: str) -> str:
+    """Prompts differing only in case or spacing are counted together."""
+    return _SPACES_RE.sub(" ", prompt.strip().lower())
+
+
+def record_prompt(cursor: sqlite3.Cursor, prompt: str, capacity: int = SKETCH_CAPACITY) -> None:
+    """Count one occurrence of a prompt in the heavy-hitters sketch."""
+    key = prompt_key(prompt)
+    cursor.execute("UPDATE prompt_sketch SET count = count + 1 WHERE key = ?", (key,))
+    if cursor.rowcount:
+        return
+
+    cursor.execute("SELECT COUNT(*) FROM prompt_sketch")
+    if cursor.fetchone()[0] < capacity:
+        cursor.execute(
+            "INSERT INTO prompt_sketch (key, prompt, count, error) VALUES (?, ?, 1, 0)",
+            (key, prompt),
+        )
+        return
+
+    cursor.execute("SELECT key, count FROM prompt_sketch ORDER BY count, key LIMIT 1")
+    evicted, minimum = cursor.fetchone()
+    cursor.execute("DELETE FROM prompt_sketch WHERE key = ?", (evicted,))
+    cursor.execute(
+        "INSERT INTO prompt_sketch (key, prompt, count, error) VALUES (?, ?, ?, ?)",
+        (key, prompt, minimum + 1, minimum),
+    )
+
+
+def read_stats(cursor: sqlite3.Cursor, top: int = 5) -> Dict[str, Any]:
+    """Current counters, histogram and most frequent prompts."""
+    cursor.execute(
+        "SELECT entries, successful, successful_time_total FROM usage_stats WHERE id = 1"
+    )
+    entries, successful, successful_time = cursor.fetchone() or (0, 0, 0.0)
+
+    cursor.execute("SELECT bucket, count FROM usage_time_histogram ORDER BY bucket")
+    histogram: List[Dict[str, Any]] = [
+        {"bucket": bucket_label(bucket), "count": count} for bucket, count in cursor.fetchall()
+    ]
+
+    cursor.execute(
+        "SELECT prompt, count, error FROM prompt_sketch ORDER BY count DESC, key LIMIT ?",
+        (top,),
+    )
+    common = [
+        {"prompt": prompt, "count": count, "error": error}
+        for prompt, count, error in cursor.fetchall()
+    ]
+
+    return {
+        "total_commands": entries,
+        "successful_commands": successful,
+        "success_rate": successful / entries if entries > 0 else 0.0,
+        "average_execution_time": successful_time / successful if successful else 0.0,
+        "total_execution_time": successful_time,
+        "execution_time_histogram": histogram,
+        "common_prompts": common,
+    }
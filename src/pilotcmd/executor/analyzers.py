@@ -0,0 +1,363 @@
+"""
+Structured analysis of command output.
+
+Analyzers are registered per program name (as found by
+:func:`pilotcmd.utils.command_signature.command_signature`, so ``sudo ping``
+and ``/bin/ping`` both select the ping analyzer). Each one consumes stdout
+line by line while the command streams and produces an
+:class:`OutputAnalysis`: a short Portuguese summary plus machine-readable
+data, kept apart from the command's own output.
+
+Analyzers marked ``heavy`` (listings and process tables, which can run to
+hundreds of thousands of lines) are instead run over the retained output
+once the command ends, in a worker process when that output is large.
+"""
+
+import asyncio
+import re
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Type
+
+from pilotcmd.utils.command_signature import command_signature
+
+# Retained output size above which heavy analyzers run in the worker pool
+POOL_THRESHOLD = 256 * 1024
+
+_POOL_WORKERS = 2
+
+
+@dataclass
+class OutputAnalysis:
+    """What an analyzer found in a command's output."""
+
+    analyzer: str
+    summary: str
+    data: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"analyzer": self.analyzer, "summary": self.summary, "data": self.data}
+
+
+class OutputAnalyzer(ABC):
+    """Base class; subclasses list their ``programs`` and implement feed/finish."""
+
+    name = ""
+    programs: tuple = ()
+    heavy = False
+
+    @abstractmethod
+    def feed(self, line: str) -> None:
+        """Consume one line of stdout."""
+
+    @abstractmethod
+    def finish(self) -> Optional[OutputAnalysis]:
+        """Return the analysis, or None if nothing useful was found."""
+
+    def _result(self, summary: str, **data: Any) -> OutputAnalysis:
+        return OutputAnalysis(analyzer=self.name, summary=summary, data=data)
+
+
+ANALYZERS: Dict[str, Type[OutputAnalyzer]] = {}
+
+
+def register_analyzer(cls: Type[OutputAnalyzer]) -> Type[OutputAnalyzer]:
+    """Class decorator adding an analyzer for each of its programs."""
+    for program in cls.programs:
+        ANALYZERS[program] = cls
+    return cls
+
+
+def _program(command: str) -> str:
+    return command_signature(command).split(" ", 1)[0]
+
+
+def analyzer_for(command: str) -> Optional[OutputAnalyzer]:
+    """Create the analyzer for a command line, if one is registered."""
+    cls = ANALYZERS.get(_program(command))
+    return cls() if cls is not None else None
+
+
+@register_analyzer
+class PingAnalyzer(OutputAnalyzer):
+    name = "ping"
+    programs = ("ping", "ping6")
+
+    _TIME_RE = re.compile(r"(?i)(?:time|tempo)\s*[=<]\s*([\d.]+)\s*ms")
+    _LOSS_RE = re.compile(r"(\d+(?:\.\d+)?)%\s*(?:packet\s+)?(?:loss|perda)", re.IGNORECASE)
+
+    def __init__(self) -> None:
+        self.times: List[float] = []
+        self.loss: Optional[float] = None
+
+    def feed(self, line: str) -> None:
+        match = self._TIME_RE.search(line)
+        if match:
+            self.times.append(float(match.group(1)))
+            return
+        match = self._LOSS_RE.search(line)
+        if match:
+            self.loss = float(match.group(1))
+
+    def finish(self) -> Optional[OutputAnalysis]:
+        if not self.times:
+            if self.loss is None:
+                return None
+            return self._result(f"Sem respostas ({self.loss:g}% de perda).", loss=self.loss)
+        average = sum(self.times) / len(self.times)
+        summary = (
+            f"{len(self.times)} respostas, tempo médio {average:.1f} ms "
+            f"(mín {min(self.times):g} ms, máx {max(self.times):g} ms)"
+        )
+        if self.loss is not None:
+            summary += f", {self.loss:g}% de perda"
+        return self._result(
+            summary + ".",
+            replies=len(self.times),
+            min_ms=min(self.times),
+            avg_ms=round(average, 3),
+            max_ms=max(self.times),
+            loss=self.loss,
+        )
+
+
+@register_analyzer
+class InterfaceAnalyzer(OutputAnalyzer):
+    name = "interfaces"
+    programs = ("ip", "ifconfig", "ipconfig")
+
+    _IPV4_RE = re.compile(
+        r"(?i)(?:\binet\s+(?:addr:)?|IPv4[^:]*:\s*)(\d{1,3}(?:\.\d{1,3}){3})"
+    )
+    _DNS_RE = re.compile(r"(?i)dns[- ]*server(?:s)?[^:]*:\s*(\d{1,3}(?:\.\d{1,3}){3})")
+    # ipconfig /all lists further DNS servers on indented lines of their own
+    _CONTINUATION_RE = re.compile(r"^\s{20,}(\d{1,3}(?:\.\d{1,3}){3})\s*$")
+
+    def __init__(self) -> None:
+        self.addresses: List[str] = []
+        self.dns_servers: List[str] = []
+        self._in_dns = False
+
+    def feed(self, line: str) -> None:
+        match = self._DNS_RE.search(line)
+        if match:
+            self.dns_servers.append(match.group(1))
+            self._in_dns = True
+            return
+        if self._in_dns:
+            match = self._CONTINUATION_RE.match(line)
+            if match:
+                self.dns_servers.append(match.group(1))
+                return
+            self._in_dns = False
+        match = self._IPV4_RE.search(line)
+        if match and not match.group(1).startswith("127."):
+            self.addresses.append(match.group(1))
+
+    def finish(self) -> Optional[OutputAnalysis]:
+        parts = []
+        if self.addresses:
+            parts.append("Endereços IPv4: " + ", ".join(self.addresses) + ".")
+        if self.dns_servers:
+            parts.append("Os seus servidores DNS são: " + ", ".join(self.dns_servers) + ".")
+        if not parts:
+            return None
+        return self._result(
+            " ".join(parts), addresses=self.addresses, dns_servers=self.dns_servers
+        )
+
+
+@register_analyzer
+class DiskAnalyzer(OutputAnalyzer):
+    name = "disk"
+    programs = ("df",)
+
+    # Usage percentage followed by the mount point, at the end of the line
+    _USAGE_RE = re.compile(r"\s(\d{1,3})%\s+(/\S*)\s*$")
+    FULL_PERCENT = 90
+
+    def __init__(self) -> None:
+        self.mounts: Dict[str, int] = {}
+
+    def feed(self, line: str) -> None:
+        match = self._USAGE_RE.search(line)
+        if match:
+            self.mounts[match.group(2)] = int(match.group(1))
+
+    def finish(self) -> Optional[OutputAnalysis]:
+        if not self.mounts:
+            return None
+        fullest = max(self.mounts, key=lambda mount: self.mounts[mount])
+        full = sorted(
+            mount for mount, used in self.mounts.items() if used >= self.FULL_PERCENT
+        )
+        summary = (
+            f"{len(self.mounts)} sistemas de arquivos; o mais cheio é {fullest} "
+            f"({self.mounts[fullest]}%)."
+        )
+        if full:
+            summary += f" Acima de {self.FULL_PERCENT}%: " + ", ".join(full) + "."
+        return self._result(summary, usage=self.mounts, full=full)
+
+
+@register_analyzer
+class TracerouteAnalyzer(OutputAnalyzer):
+    name = "traceroute"
+    programs = ("tracert", "traceroute", "tracepath")
+
+    _HOP_RE = re.compile(r"^\s*(\d+)\s")
+    _TIME_RE = re.compile(r"<?(\d+(?:\.\d+)?)\s*ms")
+
+    def __init__(self) -> None:
+        self.hops: List[Optional[float]] = []
+
+    def feed(self, line: str) -> None:
+        if not self._HOP_RE.match(line):
+            return
+        times = [float(value) for value in self._TIME_RE.findall(line)]
+        # Hops that did not answer ("* * *") have no time
+        self.hops.append(min(times) if times else None)
+
+    def finish(self) -> Optional[OutputAnalysis]:
+        if not self.hops:
+            return None
+        silent = sum(1 for hop in self.hops if hop is None)
+        summary = f"{len(self.hops)} saltos até o destino"
+        if self.hops[-1] is not None:
+            summary += f", último a {self.hops[-1]:g} ms"
+        if silent:
+            summary += f", {silent} sem resposta"
+        return self._result(summary + ".", hops=self.hops, silent_hops=silent)
+
+
+@register_analyzer
+class ProcessAnalyzer(OutputAnalyzer):
+    name = "processes"
+    programs = ("ps", "tasklist")
+    heavy = True
+
+    TOP = 3
+
+    def __init__(self) -> None:
+        self.count = 0
+        self._header_checked = False
+        self._cpu_column: Optional[int] = None
+        self._command_column = 0
+        self._usage: List[tuple] = []
+
+    def feed(self, line: str) -> None:
+        # tasklist underlines its header with "=" characters
+        if not line.strip() or line.startswith("="):
+            return
+        if not self._header_checked:
+            self._header_checked = True
+            columns = line.split()
+            if "PID" in columns or "Image" in columns:
+                if "%CPU" in columns:
+                    self._cpu_column = columns.index("%CPU")
+                    # The command is last and may contain spaces
+                    self._command_column = len(columns) - 1
+                return
+        self.count += 1
+        if self._cpu_column is not None:
+            columns = line.split(None, self._command_column)
+            try:
+                self._usage.append((float(columns[self._cpu_column]), columns[-1]))
+            except (IndexError, ValueError):
+                pass
+
+    def finish(self) -> Optional[OutputAnalysis]:
+        if not self.count:
+            return None
+        top = sorted(self._usage, key=lambda item: item[0], reverse=True)[: self.TOP]
+        summary = f"{self.count} processos em execução."
+        if top:
+            summary += " Maior uso de CPU: " + ", ".join(
+                f"{command.split()[0]} ({cpu:g}%)" for cpu, command in top
+            ) + "."
+        return self._result(
+            summary,
+            processes=self.count,
+            top_cpu=[{"command": command, "cpu": cpu} for cpu, command in top],
+        )
+
+
+@register_analyzer
+class ListingAnalyzer(OutputAnalyzer):
+    name = "listing"
+    programs = ("ls", "dir")
+    heavy = True
+
+    # Windows "dir" entries start with a date
+    _DIR_ENTRY_RE = re.compile(r"^\d{1,4}[/.-]\d{1,2}[/.-]\d{1,4}\s")
+
+    def __init__(self) -> None:
+        self.entries = 0
+        self.directories = 0
+        self._windows = False
+
+    def feed(self, line: str) -> None:
+        if not line.strip() or line.startswith("total "):
+            return
+        if self._DIR_ENTRY_RE.match(line):
+            if not self._windows:
+                # Everything before the first dated entry was header
+                self._windows = True
+                self.entries = self.directories = 0
+            self.entries += 1
+            if "<DIR>" in line:
+                self.directories += 1
+        elif not self._windows:
+            self.entries += 1
+            if line.startswith("d"):
+                self.directories += 1
+
+    def finish(self) -> Optional[OutputAnalysis]:
+        if not self.entries:
+            return None
+        return self._result(
+            f"Listagem de arquivos/diretórios com {self.entries} entradas.",
+            entries=self.entries,
+            directories=self.directories,
+        )
+
+
+def analyze_text(command: str, text: str) -> Optional[OutputAnalysis]:
+    """Run a command's analyzer over its complete stdout."""
+    analyzer = analyzer_for(command)
+    if analyzer is None:
+        return None
+    for line in text.splitlines():
+        analyzer.feed(line)
+    return analyzer.finish()
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _worker_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=_POOL_WORKERS)
+    return _pool
+
+
+async def analyze_in_background(
+    command: str, text: str, threshold: int = POOL_THRESHOLD
+) -> Optional[OutputAnalysis]:
+    """
+    Analyze complete output without blocking the event loop.
+
+    Output above ``threshold`` bytes is analyzed in a worker process, smaller
+    output in a thread. A broken or unavailable pool falls back to a thread.
+    """
+    global _pool
+    if len(text) > threshold:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(_worker_pool(), analyze_text, command, text)
+        except (BrokenProcessPool, OSError):
+            _pool = None
+    return await asyncio.to_thread(analyze_text, command, text)
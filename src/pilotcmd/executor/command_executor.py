@@ -6,15 +6,57 @@ import subprocess
 import shlex
 import asyncio
 import os
+import re
+import signal
 import time
 from dataclasses import dataclass
-from typing import List, Optional, Dict, Any
+from typing import Callable, List, Optional, Dict, Any, Union
 from enum import Enum
 
+from pilotcmd.executor.analyzers import (
+    OutputAnalysis,
+    analyze_in_background,
+    analyze_text,
+    analyzer_for,
+)
+from pilotcmd.executor.concurrency import AdaptiveLimiter, children_cpu_time
+from pilotcmd.executor.direct_exec import direct_argv
+from pilotcmd.executor.output import (
+    DEFAULT_OUTPUT_LIMIT,
+    LineCallback,
+    OutputProcess,
+    ProcessOutput,
+    collect_output,
+)
+from pilotcmd.executor.persistent_shell import PersistentShell, ShellTimeoutError
+from pilotcmd.executor.resources import (
+    DEFAULT_RESOURCE_LIMITS,
+    TERMINATE_GRACE_SECONDS,
+    ResourceLimits,
+    ResourceUsage,
+    accounting_supported,
+    limits_supported,
+    signal_command,
+    spawn_accounted,
+)
+from pilotcmd.executor.result_cache import ResultCache
+from pilotcmd.executor.speculation import SpeculativeRun, is_side_effect_free
+from pilotcmd.executor.transports import Transport
 from pilotcmd.nlp.parser import Command, SafetyLevel
 from pilotcmd.os_utils.detector import OSInfo
 
 
+# Programs that prompt on the controlling terminal (/dev/tty); they stay in
+# pilotcmd's session so the prompt can be answered
+TERMINAL_PROGRAMS = {"sudo", "su", "doas", "passwd"}
+
+# Shell operators that start a new pipeline or list segment
+SEGMENT_OPERATORS = set("();|&")
+# Words that may precede a segment's program
+COMMAND_PREFIXES = {"!", "{", "exec", "time", "nohup", "then", "do", "else"}
+ASSIGNMENT = re.compile(r"[A-Za-z_][A-Za-z0-9_]*=")
+
+
 class ExecutionStatus(Enum):
     """Command execution status."""
     SUCCESS = "success"
@@ -35,20 +77,85 @@ class ExecutionResult:
     execution_time: float
     timestamp: float
     error_message: Optional[str] = None
+    # Total output size; stdout/stderr keep only the head and tail when truncated
+    stdout_bytes: int = 0
+    stderr_bytes: int = 0
+    output_truncated: bool = False
+    # Output was already shown line by line while the command ran
+    streamed: bool = False
+    # Reused from the result cache instead of running the command again
+    cached: bool = False
+    # CPU, memory and I/O used by the command (Unix, spawned commands only)
+    resource_usage: Optional[ResourceUsage] = None
+    # Structured findings of the program's output analyzer, if it has one
+    analysis: Optional[OutputAnalysis] = None
+    # Set when the command ran as part of a concurrent group
+    parallel_group: Optional[int] = None
+    group_wall_time: Optional[float] = None
+    group_summed_time: Optional[float] = None
+    group_cpu_time: Optional[float] = None
     
     @property
     def success(self) -> bool:
         """Check if execution was successful."""
         return self.status == ExecutionStatus.SUCCESS and self.return_code == 0
 
+    @property
+    def speedup(self) -> Optional[float]:
+        """Summed command time over wall-clock time for the command's group."""
+        if not self.group_wall_time or self.group_summed_time is None:
+            return None
+        return self.group_summed_time / self.group_wall_time
+
 
 class CommandExecutor:
     """Executes system commands safely with proper validation."""
     
-    def __init__(self, os_info: OSInfo, timeout: int = 30):
+    def __init__(
+        self,
+        os_info: OSInfo,
+        timeout: int = 30,
+        output_limit: int = DEFAULT_OUTPUT_LIMIT,
+        output_callback: Optional[Callable[[Command, str, str], None]] = None,
+        persistent_shell: Optional[PersistentShell] = None,
+        timeout_provider: Optional[Callable[[Command], float]] = None,
+        progress_callback: Optional[
+            Callable[[int, Command, Optional["ExecutionResult"]], None]
+        ] = None,
+        resource_limits: Optional[Dict[str, ResourceLimits]] = None,
+        direct_exec: bool = True,
+        transport: Optional[Transport] = None,
+        result_cache: Optional[ResultCache] = None,
+        fresh: bool = False,
+    ):
         self.os_info = os_info
         self.timeout = timeout
+        self.output_limit = output_limit
+        self.output_callback = output_callback
+        # Unix only; when set, every command runs in this one shell
+        self.persistent_shell = persistent_shell
+        # Per-command timeout (e.g. TimeoutPolicy.timeout_for); defaults to timeout
+        self.timeout_provider = timeout_provider
+        # Called with (plan index, command, None) when a step starts and with
+        # its result when it ends
+        self.progress_callback = progress_callback
+        # setrlimit caps per safety level for spawned Unix commands
+        self.resource_limits = (
+            DEFAULT_RESOURCE_LIMITS if resource_limits is None else resource_limits
+        )
+        # Run commands that need no shell features without a shell
+        self.direct_exec = direct_exec
+        # Target to run commands on (a directory, container or host); None
+        # means locally in the current directory
+        self.transport = transport
+        # Reuse recent results of read-only commands; with fresh, every
+        # command runs (and refreshes the cache)
+        self.result_cache = result_cache
+        self.fresh = fresh
         self.dry_run = False
+        self.parallel = 1
+        self.last_hidden_latency = 0.0
+        self._speculation: Optional[SpeculativeRun] = None
         
         # Shell configuration based on OS
         if os_info.is_windows():
@@ -61,18 +168,78 @@ class CommandExecutor:
     def set_dry_run(self, dry_run: bool) -> None:
         """Enable or disable dry run mode."""
         self.dry_run = dry_run
+
+    def set_parallel(self, max_concurrency: int) -> None:
+        """Allow up to ``max_concurrency`` independent commands to run at once."""
+        self.parallel = max(1, max_concurrency)
+
+    def start_speculation(self, commands: List[Command]) -> bool:
+        """
+        Start running a read-only plan in the background before confirmation.
+
+        Speculation only starts when every command in the plan is side-effect
+        free, so running it early can never change what the user agrees to.
+        The buffered results are used by the next :meth:`execute_commands`
+        call for the same plan.
+
+        Args:
+            commands: The plan awaiting confirmation
+
+        Returns:
+            True if speculation was started
+        """
+        self.discard_speculation()
+        # A fresh process would not see the persistent shell's cwd and variables
+        if self.dry_run or not commands or self.persistent_shell is not None:
+            return False
+        if not all(is_side_effect_free(command) for command in commands):
+            return False
+
+        self._speculation = SpeculativeRun(self, commands)
+        return True
+
+    def discard_speculation(self) -> None:
+        """Cancel a pending speculative run and drop its results."""
+        if self._speculation is not None:
+            self._speculation.discard()
+            self._speculation = None
     
-    async def execute_command(self, command: Command) -> ExecutionResult:
+    def timeout_for(self, command: Command) -> float:
+        """Timeout in seconds for a command."""
+        if self.timeout_provider is not None:
+            return self.timeout_provider(command)
+        return self.timeout
+
+    @property
+    def cwd(self) -> str:
+        """Working directory for spawned commands."""
+        if self.transport is not None and self.transport.cwd is not None:
+            return self.transport.cwd
+        return os.getcwd()
+
+    def limits_for(self, command: Command) -> Optional[ResourceLimits]:
+        """Resource limits for a command, based on its safety level."""
+        level = getattr(command.safety_level, "value", command.safety_level)
+        return self.resource_limits.get(str(level))
+
+    async def execute_command(
+        self, command: Command, stream: bool = True, speculative: bool = False
+    ) -> ExecutionResult:
         """
         Execute a single command.
         
         Args:
             command: Command object to execute
+            stream: Report output lines to ``output_callback`` as they arrive
+            speculative: Running before confirmation; stdin is /dev/null so
+                the command cannot read input meant for the prompt
             
         Returns:
             ExecutionResult with execution details
         """
         start_time = time.time()
+        started = time.monotonic()
+        timeout = self.timeout_for(command)
         
         try:
             # Validate command safety
@@ -100,26 +267,100 @@ class CommandExecutor:
                     timestamp=start_time
                 )
             
+            cache = self.result_cache
+            cache_key = None
+            cache_ttl = cache.ttl_for(command) if cache is not None else 0.0
+            if cache is not None and cache_ttl > 0:
+                target = self.transport.name if self.transport is not None else ""
+                cache_key = cache.key(command, self.cwd, target)
+                if not self.fresh:
+                    cached = cache.get(cache_key, command)
+                    if cached is not None:
+                        return cached
+            elif cache is not None:
+                # The command may change what cached commands would report
+                cache.clear()
+
             # Prepare command for execution
             prepared_cmd = self._prepare_command(command)
             
+            callback = self.output_callback if stream else None
+            analyzer = analyzer_for(command.command)
+            # Light analyzers read stdout as it streams; heavy ones run on
+            # the retained output afterwards
+            feed = analyzer.feed if analyzer is not None and not analyzer.heavy else None
+
+            on_line: Optional[LineCallback] = None
+            if callback is not None or feed is not None:
+
+                def forward_line(stream_name: str, line: str) -> None:
+                    if feed is not None and stream_name == "stdout":
+                        feed(line)
+                    if callback is not None:
+                        callback(command, stream_name, line)
+
+                on_line = forward_line
+
             # Execute command
-            if self.os_info.is_windows():
-                result = await self._execute_windows_command(prepared_cmd)
+            stdin = subprocess.DEVNULL if speculative else None
+            shell = self.persistent_shell
+            terminal = self._prompts_on_terminal(prepared_cmd)
+            if shell is not None and terminal:
+                # The shell's commands have no terminal to prompt on: run
+                # this one on its own, from the shell's current directory
+                directory = await asyncio.to_thread(shell.working_directory)
+                if directory is not None:
+                    prepared_cmd = f"cd {shlex.quote(directory)} && {prepared_cmd}"
+            if shell is not None and not terminal:
+                result = await self._execute_persistent_command(
+                    shell, prepared_cmd, on_line, timeout
+                )
             else:
-                result = await self._execute_unix_command(prepared_cmd)
+                argv = self.transport.wrap(prepared_cmd) if self.transport else None
+                # Limits would only cap the local docker/ssh client
+                limits = self.limits_for(command) if argv is None else None
+                if argv is None and self.direct_exec:
+                    argv = direct_argv(prepared_cmd, windows=self.os_info.is_windows())
+                if self.os_info.is_windows():
+                    result = await self._execute_windows_command(
+                        prepared_cmd, on_line, timeout, argv, stdin
+                    )
+                else:
+                    new_session = speculative or self.transport is not None or not terminal
+                    result = await self._execute_unix_command(
+                        prepared_cmd, on_line, timeout, limits, argv, stdin, new_session
+                    )
             
-            execution_time = time.time() - start_time
+            execution_time = time.monotonic() - started
+
+            analysis = None
+            if analyzer is not None:
+                if analyzer.heavy:
+                    analysis = await analyze_in_background(command.command, result.stdout)
+                else:
+                    analysis = analyzer.finish()
             
-            return ExecutionResult(
+            execution = ExecutionResult(
                 command=command,
                 status=ExecutionStatus.SUCCESS if result.returncode == 0 else ExecutionStatus.FAILED,
                 return_code=result.returncode,
-                stdout=result.stdout.decode('utf-8', errors='replace') if result.stdout else "",
-                stderr=result.stderr.decode('utf-8', errors='replace') if result.stderr else "",
+                stdout=result.stdout,
+                stderr=result.stderr,
                 execution_time=execution_time,
-                timestamp=start_time
+                timestamp=start_time,
+                stdout_bytes=result.stdout_bytes,
+                stderr_bytes=result.stderr_bytes,
+                output_truncated=result.truncated,
+                streamed=callback is not None,
+                resource_usage=result.resource_usage,
+                analysis=analysis,
+                error_message=self._describe_signal(result.returncode)
             )
+            if cache is not None and cache_key is not None:
+                cache.put(cache_key, execution, cache_ttl)
+            elif cache is not None:
+                cache.clear()
+            return execution
             
         except asyncio.TimeoutError:
             return ExecutionResult(
@@ -127,13 +368,13 @@ class CommandExecutor:
                 status=ExecutionStatus.TIMEOUT,
                 return_code=-1,
                 stdout="",
-                stderr=f"Command timed out after {self.timeout} seconds",
-                execution_time=self.timeout,
+                stderr=f"Command timed out after {timeout:g} seconds",
+                execution_time=timeout,
                 timestamp=start_time,
                 error_message="Command timeout"
             )
         except Exception as e:
-            execution_time = time.time() - start_time
+            execution_time = time.monotonic() - started
             return ExecutionResult(
                 command=command,
                 status=ExecutionStatus.FAILED,
@@ -147,7 +388,11 @@ class CommandExecutor:
     
     async def execute_commands(self, commands: List[Command]) -> List[ExecutionResult]:
         """
-        Execute multiple commands in sequence.
+        Execute multiple commands in plan order.
+
+        With parallelism enabled, consecutive independent commands run
+        concurrently (see :meth:`plan_groups`); results are still returned in
+        plan order.
         
         Args:
             commands: List of Command objects to execute
@@ -155,20 +400,130 @@ class CommandExecutor:
         Returns:
             List of ExecutionResult objects
         """
+        confirmed_at = time.monotonic()
         results = []
-        
-        for command in commands:
-            result = await self.execute_command(command)
-            result.stdout = result.stdout + "\n\nExplicação: " + self.explain_output(command.command, result.stdout)
-            results.append(result)
-            
-            # Stop on dangerous command or critical failure
-            if (result.status == ExecutionStatus.FAILED and 
-                command.safety_level == SafetyLevel.DANGEROUS):
+        self.last_hidden_latency = 0.0
+
+        speculative: List[ExecutionResult] = []
+        speculation, self._speculation = self._speculation, None
+        if speculation is not None:
+            if speculation.matches(commands):
+                speculative = await asyncio.to_thread(speculation.collect, confirmed_at)
+                self.last_hidden_latency = speculation.hidden_latency
+            else:
+                speculation.discard()
+
+        limiter = AdaptiveLimiter(self.parallel)
+        for group_id, group in enumerate(self.plan_groups(commands)):
+            pending = [index for index in group if index >= len(speculative)]
+            if len(pending) > 1:
+                executed = await self._execute_group(commands, pending, limiter, group_id)
+            else:
+                executed = [await self._execute_step(index, commands[index]) for index in pending]
+            executed_by_index = dict(zip(pending, executed))
+
+            stop = False
+            for index in group:
+                command = commands[index]
+                result = executed_by_index.get(index) or speculative[index]
+                results.append(result)
+
+                # Stop on dangerous command or critical failure
+                if (result.status == ExecutionStatus.FAILED and 
+                    command.safety_level == SafetyLevel.DANGEROUS):
+                    stop = True
+            if stop:
                 break
         
         return results
+
+    def plan_groups(self, commands: List[Command]) -> List[List[int]]:
+        """
+        Split a plan into groups of command indices that may run together.
+
+        A command joins the current group when the model marked it
+        independent of earlier steps. A side-effect-free command joins too,
+        as long as the group holds no command that changes state it could
+        observe. Without parallelism, or with a persistent shell (which runs
+        one command at a time), every group holds a single command.
+        """
+        groups: List[List[int]] = []
+        group_writes = False
+        concurrent = self.parallel > 1 and self.persistent_shell is None
+        for index, command in enumerate(commands):
+            read_only = is_side_effect_free(command)
+            joins = concurrent and bool(groups) and (
+                command.independent or (read_only and not group_writes)
+            )
+            if joins:
+                groups[-1].append(index)
+                group_writes = group_writes or not read_only
+            else:
+                groups.append([index])
+                group_writes = not read_only
+        return groups
+
+    async def _execute_step(self, index: int, command: Command) -> ExecutionResult:
+        """Execute one plan step, reporting its progress."""
+        if self.progress_callback is not None:
+            self.progress_callback(index, command, None)
+        result = await self.execute_command(command)
+        if self.progress_callback is not None:
+            self.progress_callback(index, command, result)
+        return result
+
+    async def _execute_group(
+        self,
+        commands: List[Command],
+        indices: List[int],
+        limiter: AdaptiveLimiter,
+        group_id: int,
+    ) -> List[ExecutionResult]:
+        """Run a group of independent commands concurrently, keeping their order."""
+
+        async def run(index: int) -> ExecutionResult:
+            async with limiter:
+                return await self._execute_step(index, commands[index])
+
+        cpu_before = children_cpu_time()
+        started = time.monotonic()
+        results = await asyncio.gather(*(run(index) for index in indices))
+        wall_time = time.monotonic() - started
+        cpu_after = children_cpu_time()
+
+        summed_time = sum(result.execution_time for result in results)
+        cpu_time = None
+        if cpu_before is not None and cpu_after is not None:
+            cpu_time = cpu_after - cpu_before
+        for result in results:
+            result.parallel_group = group_id
+            result.group_wall_time = wall_time
+            result.group_summed_time = summed_time
+            result.group_cpu_time = cpu_time
+        return list(results)
     
+    @staticmethod
+    def _prompts_on_terminal(prepared_cmd: str) -> bool:
+        """Whether any segment of a prepared command runs a program that prompts on /dev/tty."""
+        lexer = shlex.shlex(prepared_cmd.replace("\n", ";"), posix=True, punctuation_chars=True)
+        lexer.whitespace_split = True
+        try:
+            tokens = list(lexer)
+        except ValueError:
+            # Unbalanced quotes: keep the command in pilotcmd's session
+            return True
+        segment_start = True
+        for token in tokens:
+            if set(token) <= SEGMENT_OPERATORS:
+                segment_start = True
+            elif segment_start and (token in COMMAND_PREFIXES or ASSIGNMENT.match(token)):
+                continue
+            elif segment_start:
+                if token.rsplit("/", 1)[-1] in TERMINAL_PROGRAMS:
+                    return True
+                segment_start = False
+        return False
+
     def _prepare_command(self, command: Command) -> str:
         """Prepare command string for execution."""
         cmd = command.command.strip()
@@ -181,37 +536,23 @@ class CommandExecutor:
         return cmd
     
     def explain_output(self, command_str: str, output: str) -> str:
-        """Retorna uma explicação do output com base em heurísticas para diversos comandos."""
-        explanation = ""
-        cmd_lower = command_str.lower()
-        if "ipconfig" in cmd_lower or "ifconfig" in cmd_lower:
-            import re
-            dns = re.findall(r"(?i)(?:dns[- ]*server(?:s)?[^:]*:\s*)([\d\.]+)", output)
-            if dns:
-                explanation += "Os seus servidores DNS são: " + ", ".join(dns) + ". "
-        elif "ping" in cmd_lower:
-            import re
-            times = re.findall(r"time[=<]\s*(\d+ms)", output)
-            if times:
-                explanation += "Tempos de resposta do ping: " + ", ".join(times) + ". "
-        elif "tracert" in cmd_lower:
-            import re
-            hops = re.findall(r"(\d+\s+ms)", output)
-            if hops:
-                explanation += "Tempos de resposta dos saltos (tracert): " + ", ".join(hops) + ". "
-        elif "dir" in cmd_lower or "ls" in cmd_lower:
-            lines = output.splitlines()
-            if lines:
-                explanation += "Listagem de arquivos/diretórios com " + str(len(lines)) + " linhas retornadas. "
-        # Outras heurísticas podem ser adicionadas para outros comandos.
-        if not explanation:
-            explanation = "Comando executado com sucesso."
-        return explanation
-    
-    async def _execute_windows_command(self, command: str) -> subprocess.CompletedProcess:
-        """Execute command on Windows."""
+        """Retorna um resumo do output (ver :mod:`pilotcmd.executor.analyzers`)."""
+        analysis = analyze_text(command_str, output)
+        return analysis.summary if analysis is not None else "Comando executado com sucesso."
+
+    async def _execute_windows_command(
+        self,
+        command: str,
+        on_line: Optional[LineCallback] = None,
+        timeout: Optional[float] = None,
+        argv: Optional[List[str]] = None,
+        stdin: Optional[int] = None,
+    ) -> ProcessOutput:
+        """Execute command on Windows, directly when ``argv`` is given."""
         # Use appropriate shell
-        if self.shell_cmd == "pwsh" or self.shell_cmd == "powershell":
+        if argv is not None:
+            full_cmd = argv
+        elif self.shell_cmd == "pwsh" or self.shell_cmd == "powershell":
             # PowerShell
             full_cmd = [self.shell_cmd, "-Command", command]
         else:
@@ -220,53 +561,150 @@ class CommandExecutor:
         
         process = await asyncio.create_subprocess_exec(
             *full_cmd,
+            stdin=stdin,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
-            cwd=os.getcwd()
+            cwd=self.cwd
         )
         
         try:
-            stdout, stderr = await asyncio.wait_for(
-                process.communicate(), 
-                timeout=self.timeout
-            )
-            
-            return subprocess.CompletedProcess(
-                args=full_cmd,
-                returncode=process.returncode,
-                stdout=stdout,
-                stderr=stderr
+            return await asyncio.wait_for(
+                collect_output(process, self.output_limit, on_line),
+                timeout=self.timeout if timeout is None else timeout
             )
-        except asyncio.TimeoutError:
+        except (asyncio.TimeoutError, asyncio.CancelledError):
             process.kill()
             await process.wait()
             raise
     
-    async def _execute_unix_command(self, command: str) -> subprocess.CompletedProcess:
-        """Execute command on Unix-like systems."""
-        process = await asyncio.create_subprocess_shell(
-            command,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            cwd=os.getcwd()
-        )
+    async def _execute_unix_command(
+        self,
+        command: str,
+        on_line: Optional[LineCallback] = None,
+        timeout: Optional[float] = None,
+        limits: Optional[ResourceLimits] = None,
+        argv: Optional[List[str]] = None,
+        stdin: Optional[int] = None,
+        new_session: bool = True,
+    ) -> ProcessOutput:
+        """Execute command on Unix-like systems, directly when ``argv`` is given."""
+        if not limits_supported():
+            limits = None
+        # Own session, so the command and everything it spawns can be stopped
+        # together (except for commands that prompt on the terminal)
+        process: OutputProcess
+        if accounting_supported():
+            process = await spawn_accounted(
+                command if argv is None else argv,
+                cwd=self.cwd,
+                limits=limits,
+                stdin=stdin,
+                new_session=new_session,
+            )
+        else:
+            args: Union[str, List[str]] = command if argv is None else argv
+            if limits is not None:
+                args = limits.wrap(args)
+            # The spawn is shielded: cancelling it half-way would leave the
+            # command's children running with our pipes open
+            if isinstance(args, str):
+                spawn = asyncio.ensure_future(
+                    asyncio.create_subprocess_shell(
+                        args,
+                        stdin=stdin,
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.PIPE,
+                        cwd=self.cwd,
+                        start_new_session=new_session,
+                    )
+                )
+            else:
+                spawn = asyncio.ensure_future(
+                    asyncio.create_subprocess_exec(
+                        *args,
+                        stdin=stdin,
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.PIPE,
+                        cwd=self.cwd,
+                        start_new_session=new_session,
+                    )
+                )
+            try:
+                process = await asyncio.shield(spawn)
+            except asyncio.CancelledError:
+                process = await spawn
+                await self._terminate_process_group(process, group=new_session)
+                raise
         
         try:
-            stdout, stderr = await asyncio.wait_for(
-                process.communicate(),
-                timeout=self.timeout
+            return await asyncio.wait_for(
+                collect_output(process, self.output_limit, on_line),
+                timeout=self.timeout if timeout is None else timeout
             )
-            
-            return subprocess.CompletedProcess(
-                args=command,
-                returncode=process.returncode,
-                stdout=stdout,
-                stderr=stderr
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            await self._terminate_process_group(process, group=new_session)
+            raise
+
+    async def _execute_persistent_command(
+        self,
+        shell: PersistentShell,
+        command: str,
+        on_line: Optional[LineCallback] = None,
+        timeout: Optional[float] = None,
+    ) -> ProcessOutput:
+        """Execute command in the session's persistent shell."""
+        run = asyncio.ensure_future(
+            asyncio.to_thread(
+                shell.run,
+                command,
+                self.timeout if timeout is None else timeout,
+                self.output_limit,
+                on_line,
             )
-        except asyncio.TimeoutError:
-            process.kill()
-            await process.wait()
+        )
+        try:
+            return await asyncio.shield(run)
+        except ShellTimeoutError:
+            raise asyncio.TimeoutError()
+        except asyncio.CancelledError:
+            # Killing the shell ends the command and unblocks the worker thread
+            shell.interrupt()
+            await asyncio.gather(run, return_exceptions=True)
             raise
+
+    async def _terminate_process_group(
+        self, process: OutputProcess, grace: float = TERMINATE_GRACE_SECONDS, group: bool = True
+    ) -> None:
+        """
+        Stop a command's whole process group and reap the shell.
+
+        The group gets SIGTERM first so commands can clean up; whatever is
+        still running after the grace period (including grandchildren that
+        outlived the shell) is killed with SIGKILL. Without ``group`` (a
+        command sharing pilotcmd's session, see :data:`TERMINAL_PROGRAMS`)
+        only the command itself is signalled.
+        """
+        signal_command(process.pid, signal.SIGTERM, group)
+        try:
+            await asyncio.wait_for(asyncio.shield(process.wait()), timeout=grace)
+        except asyncio.TimeoutError:
+            pass
+        signal_command(process.pid, signal.SIGKILL, group)
+        await process.wait()
+
+    @staticmethod
+    def _describe_signal(returncode: int) -> Optional[str]:
+        """Explain a return code that means the command was killed by a signal."""
+        if returncode >= 0:
+            return None
+        try:
+            name = signal.Signals(-returncode).name
+        except ValueError:
+            name = f"signal {-returncode}"
+        reason = f"Killed by {name}"
+        if name in ("SIGXCPU", "SIGXFSZ"):
+            reason += " (resource limit exceeded)"
+        return reason
     
     def validate_command_safety(self, command: Command) -> bool:
         """Validate if command is safe to execute."""
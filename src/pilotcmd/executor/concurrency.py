@@ -0,0 +1,135 @@
+"""
+Adaptive concurrency limiting for parallel command execution.
+
+Independent commands may run side by side, but spawning several shells at
+once on a machine that is already busy (or close to its open file limit)
+only makes every command slower. The limiter below caps the number of
+commands in flight at the requested parallelism and lowers that cap while
+the system load or file-descriptor usage is high.
+"""
+
+import asyncio
+import os
+import time
+from typing import Callable, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None  # type: ignore
+
+# File descriptors one running command holds in this process (stdout and
+# stderr pipes plus the child watcher's pidfd), with some margin
+FDS_PER_COMMAND = 4
+
+# Load average per CPU above which concurrency is reduced, and above which
+# commands run one at a time
+LOAD_SOFT_LIMIT = 1.0
+LOAD_HARD_LIMIT = 2.0
+
+# Fraction of the open file limit kept free for everything else
+FD_RESERVE = 0.2
+
+# How long a load / fd sample stays valid
+SAMPLE_INTERVAL = 0.5
+
+
+def load_per_cpu() -> Optional[float]:
+    """One-minute load average divided by the CPU count, if available."""
+    try:
+        load = os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return None
+    return load / (os.cpu_count() or 1)
+
+
+def fd_usage() -> Optional[Tuple[int, int]]:
+    """Return (open descriptors, soft limit) for this process, if available."""
+    if resource is None:
+        return None
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return None
+    for fd_dir in ("/proc/self/fd", "/dev/fd"):
+        try:
+            return len(os.listdir(fd_dir)), soft
+        except OSError:
+            continue
+    return None
+
+
+def children_cpu_time() -> Optional[float]:
+    """User plus system CPU time consumed by reaped child processes."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class AdaptiveLimiter:
+    """
+    Async context manager bounding how many commands run at once.
+
+    Works like an ``asyncio.Semaphore`` with ``max_concurrency`` slots, except
+    that the number of usable slots is re-evaluated from the system load and
+    file-descriptor headroom before each acquisition. It never drops below one,
+    so progress is always possible.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        load_probe: Callable[[], Optional[float]] = load_per_cpu,
+        fd_probe: Callable[[], Optional[Tuple[int, int]]] = fd_usage,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.active = 0
+        self.peak = 0
+        self._load_probe = load_probe
+        self._fd_probe = fd_probe
+        self._limit = self.max_concurrency
+        self._sampled_at: Optional[float] = None
+        self._condition = asyncio.Condition()
+
+    @property
+    def limit(self) -> int:
+        """Current number of usable slots."""
+        now = time.monotonic()
+        if self._sampled_at is None or now - self._sampled_at >= SAMPLE_INTERVAL:
+            self._limit = self._compute_limit()
+            self._sampled_at = now
+        return self._limit
+
+    def _compute_limit(self) -> int:
+        limit = self.max_concurrency
+
+        load = self._load_probe()
+        if load is not None:
+            if load >= LOAD_HARD_LIMIT:
+                limit = 1
+            elif load >= LOAD_SOFT_LIMIT:
+                # Scale down linearly between the soft and hard limits
+                headroom = (LOAD_HARD_LIMIT - load) / (LOAD_HARD_LIMIT - LOAD_SOFT_LIMIT)
+                limit = min(limit, max(1, int(self.max_concurrency * headroom)))
+
+        fds = self._fd_probe()
+        if fds is not None:
+            open_fds, soft_limit = fds
+            usable = int(soft_limit * (1 - FD_RESERVE)) - open_fds
+            # Slots already in use hold descriptors counted in open_fds
+            budget = self.active + usable // FDS_PER_COMMAND
+            limit = min(limit, max(1, budget))
+
+        return limit
+
+    async def __aenter__(self) -> "AdaptiveLimiter":
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        async with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
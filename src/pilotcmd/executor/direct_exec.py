@@ -0,0 +1,75 @@
+"""
+Shell-less execution of simple commands.
+
+Most generated commands are a single program with literal arguments
+(``ls -la``, ``uname -a``, ``df -h``). Those need nothing from the shell, so
+they are split with :mod:`shlex` and executed directly, saving the extra
+``/bin/sh`` (or ``cmd /c``) process per command. Anything the shell would
+interpret (pipes, redirections, globs, variables, builtins) keeps going
+through the shell.
+"""
+
+import functools
+import shlex
+import shutil
+from typing import List, Optional
+
+# Characters that make the shell do more than split words: chaining,
+# redirection, substitution, variables, globbing, history and comments
+_UNIX_SPECIAL = set(";&|<>`$(){}[]*?~!#\n\\")
+# cmd.exe and PowerShell interpret these
+_WINDOWS_SPECIAL = set(";&|<>^%!`$(){}[]*?@\n")
+
+# Builtins only the shell can run (or that behave differently outside it)
+_UNIX_BUILTINS = {
+    ".", ":", "alias", "bg", "cd", "command", "eval", "exec", "exit", "export",
+    "fg", "hash", "jobs", "read", "readonly", "set", "shift", "source", "trap",
+    "type", "ulimit", "umask", "unalias", "unset", "wait",
+}
+_WINDOWS_BUILTINS = {
+    "assoc", "call", "cd", "chdir", "cls", "copy", "del", "dir", "echo", "erase",
+    "for", "ftype", "if", "md", "mkdir", "mklink", "move", "path", "popd",
+    "pushd", "rd", "ren", "rename", "rmdir", "set", "start", "time", "title",
+    "type", "ver", "vol",
+}
+
+
+@functools.lru_cache(maxsize=256)
+def _resolve(program: str) -> Optional[str]:
+    return shutil.which(program)
+
+
+def direct_argv(command: str, windows: bool = False) -> Optional[List[str]]:
+    """
+    Split a command line for direct execution, if it needs no shell.
+
+    Args:
+        command: The command line
+        windows: Apply cmd.exe/PowerShell rules instead of POSIX ones
+
+    Returns:
+        The argument vector with the program resolved to its full path, or
+        None if the command must run through the shell
+    """
+    special = _WINDOWS_SPECIAL if windows else _UNIX_SPECIAL
+    if not command.strip() or special.intersection(command):
+        return None
+    try:
+        argv = shlex.split(command, posix=not windows)
+    except ValueError:
+        return None
+    if windows:
+        # Non-POSIX splitting keeps the quotes around arguments
+        argv = [arg[1:-1] if len(arg) > 1 and arg[0] == arg[-1] == '"' else arg for arg in argv]
+
+    program = argv[0]
+    builtins = _WINDOWS_BUILTINS if windows else _UNIX_BUILTINS
+    if program.lower() in builtins or "=" in program:
+        return None
+    path = _resolve(program)
+    if path is None:
+        return None
+    if windows and path.lower().endswith((".bat", ".cmd")):
+        # Batch files are always run by cmd.exe
+        return None
+    return [path, *argv[1:]]
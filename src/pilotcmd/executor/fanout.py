@@ -0,0 +1,113 @@
+"""
+Running one plan on many targets.
+
+The plan is translated once and executed on every target (directories,
+containers or hosts, see :mod:`pilotcmd.executor.transports`) with its own
+:class:`CommandExecutor`. Targets run concurrently under an
+:class:`AdaptiveLimiter`, each within an optional overall timeout, and each
+target's results are reported as soon as it finishes.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from pilotcmd.executor.command_executor import CommandExecutor, ExecutionResult
+from pilotcmd.executor.concurrency import AdaptiveLimiter
+from pilotcmd.executor.transports import Transport
+from pilotcmd.nlp.parser import Command
+
+DEFAULT_FANOUT_PARALLELISM = 4
+
+
+@dataclass
+class TargetResult:
+    """Outcome of a plan on one target."""
+
+    target: str
+    results: List[ExecutionResult] = field(default_factory=list)
+    elapsed: float = 0.0
+    timed_out: bool = False
+    error: Optional[str] = None
+
+    @property
+    def success(self) -> bool:
+        return (
+            not self.timed_out
+            and self.error is None
+            and all(result.success for result in self.results)
+        )
+
+
+class FanoutRunner:
+    """Executes a plan on several targets with bounded parallelism."""
+
+    def __init__(
+        self,
+        executor_factory: Callable[[Transport], CommandExecutor],
+        max_parallel: int = DEFAULT_FANOUT_PARALLELISM,
+        target_timeout: Optional[float] = None,
+        on_target_done: Optional[Callable[[TargetResult], None]] = None,
+    ):
+        """
+        Args:
+            executor_factory: Creates the executor for a target
+            max_parallel: Most targets running at once
+            target_timeout: Seconds allowed for the whole plan on one target
+            on_target_done: Called with each target's result as it finishes
+        """
+        self.executor_factory = executor_factory
+        self.max_parallel = max(1, max_parallel)
+        self.target_timeout = target_timeout
+        self.on_target_done = on_target_done
+
+    async def run(
+        self, commands: List[Command], transports: List[Transport]
+    ) -> List[TargetResult]:
+        """
+        Run the plan on every target.
+
+        Returns:
+            One result per target, in target order
+        """
+        limiter = AdaptiveLimiter(self.max_parallel)
+
+        async def run_target(transport: Transport) -> TargetResult:
+            async with limiter:
+                outcome = await self._run_target(commands, transport)
+            if self.on_target_done is not None:
+                self.on_target_done(outcome)
+            return outcome
+
+        return list(await asyncio.gather(*(run_target(t) for t in transports)))
+
+    async def _run_target(
+        self, commands: List[Command], transport: Transport
+    ) -> TargetResult:
+        outcome = TargetResult(target=transport.name)
+        executor = self.executor_factory(transport)
+        # Finished steps are kept even if the target later times out
+        finished = {}
+        callback = executor.progress_callback
+
+        def track(index: int, command: Command, result: Optional[ExecutionResult]) -> None:
+            if result is not None:
+                finished[index] = result
+            if callback is not None:
+                callback(index, command, result)
+
+        executor.progress_callback = track
+        started = time.monotonic()
+        try:
+            outcome.results = await asyncio.wait_for(
+                executor.execute_commands(commands), timeout=self.target_timeout
+            )
+        except asyncio.TimeoutError:
+            outcome.timed_out = True
+            outcome.results = [finished[index] for index in sorted(finished)]
+        except Exception as e:
+            outcome.error = str(e)
+            outcome.results = [finished[index] for index in sorted(finished)]
+        outcome.elapsed = time.monotonic() - started
+        return outcome
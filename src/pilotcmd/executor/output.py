@@ -0,0 +1,212 @@
+"""
+Streaming capture of command output.
+
+Output is read from the child's pipes in chunks as it arrives, handed to an
+optional per-line callback for live display, and retained in a bounded
+head+tail buffer. Memory use therefore stays flat regardless of how much a
+command prints, while the total byte count is still recorded.
+"""
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Deque, Optional, Protocol
+
+if TYPE_CHECKING:  # pragma: no cover - import cycle guard
+    from pilotcmd.executor.resources import ResourceUsage
+
+# Bytes of output retained per stream by default (half head, half tail)
+DEFAULT_OUTPUT_LIMIT = 1024 * 1024
+
+# Read size for pipe chunks
+CHUNK_SIZE = 64 * 1024
+
+# Longest partial line held back while waiting for its newline
+MAX_LINE_LENGTH = 64 * 1024
+
+LineCallback = Callable[[str, str], None]
+
+
+class OutputProcess(Protocol):
+    """A child process with piped output, as started by the executor."""
+
+    @property
+    def pid(self) -> int:
+        ...
+
+    @property
+    def stdout(self) -> Optional[asyncio.StreamReader]:
+        ...
+
+    @property
+    def stderr(self) -> Optional[asyncio.StreamReader]:
+        ...
+
+    async def wait(self) -> int:
+        ...
+
+
+class HeadTailBuffer:
+    """
+    Keeps the first and last bytes written to it, up to ``limit`` in total.
+
+    The head is filled first; everything after it goes into a ring of
+    chunks from which the oldest bytes are dropped once the tail is full.
+    """
+
+    def __init__(self, limit: int = DEFAULT_OUTPUT_LIMIT):
+        self.limit = max(0, limit)
+        self._head_limit = self.limit // 2
+        self._tail_limit = self.limit - self._head_limit
+        self._head = bytearray()
+        self._tail: Deque[bytes] = deque()
+        self._tail_size = 0
+        self.total_bytes = 0
+
+    def write(self, data: bytes) -> None:
+        """Append a chunk of output."""
+        self.total_bytes += len(data)
+
+        room = self._head_limit - len(self._head)
+        if room > 0:
+            self._head += data[:room]
+            data = data[room:]
+        if not data or not self._tail_limit:
+            return
+
+        self._tail.append(data)
+        self._tail_size += len(data)
+        while self._tail_size - len(self._tail[0]) >= self._tail_limit:
+            self._tail_size -= len(self._tail.popleft())
+        excess = self._tail_size - self._tail_limit
+        if excess > 0:
+            self._tail[0] = self._tail[0][excess:]
+            self._tail_size -= excess
+
+    @property
+    def retained_bytes(self) -> int:
+        return len(self._head) + self._tail_size
+
+    @property
+    def truncated(self) -> bool:
+        """Whether bytes were dropped from the middle of the output."""
+        return self.total_bytes > self.retained_bytes
+
+    def getvalue(self) -> bytes:
+        """Return the retained output, marking where bytes were dropped."""
+        parts = [bytes(self._head)]
+        if self.truncated:
+            omitted = self.total_bytes - self.retained_bytes
+            parts.append(f"\n... [{omitted} bytes omitted] ...\n".encode())
+        parts.extend(self._tail)
+        return b"".join(parts)
+
+    def decode(self) -> str:
+        return self.getvalue().decode("utf-8", errors="replace")
+
+
+@dataclass
+class ProcessOutput:
+    """Exit status and captured output of a finished process."""
+
+    returncode: int
+    stdout: str
+    stderr: str
+    stdout_bytes: int = 0
+    stderr_bytes: int = 0
+    truncated: bool = False
+    resource_usage: Optional["ResourceUsage"] = None
+
+
+class LineSplitter:
+    """Turns a stream of byte chunks into decoded lines for a callback."""
+
+    def __init__(self, stream_name: str, on_line: LineCallback):
+        self.stream_name = stream_name
+        self.on_line = on_line
+        self._pending = b""
+
+    def _emit(self, line: bytes) -> None:
+        self.on_line(self.stream_name, line.rstrip(b"\r").decode("utf-8", errors="replace"))
+
+    def feed(self, chunk: bytes) -> None:
+        """Report every line completed by this chunk."""
+        self._pending += chunk
+        *lines, self._pending = self._pending.split(b"\n")
+        for line in lines:
+            self._emit(line)
+        if len(self._pending) > MAX_LINE_LENGTH:
+            self._emit(self._pending)
+            self._pending = b""
+
+    def close(self) -> None:
+        """Report a final line without a trailing newline."""
+        if self._pending:
+            self._emit(self._pending)
+            self._pending = b""
+
+
+async def pump_stream(
+    stream: Optional[asyncio.StreamReader],
+    buffer: HeadTailBuffer,
+    stream_name: str,
+    on_line: Optional[LineCallback] = None,
+) -> None:
+    """
+    Copy a pipe into a buffer until EOF, reporting complete lines as they arrive.
+
+    Args:
+        stream: The process pipe to read
+        buffer: Buffer retaining the output
+        stream_name: ``"stdout"`` or ``"stderr"``, passed to the callback
+        on_line: Called with the stream name and each decoded line
+    """
+    if stream is None:
+        return
+
+    splitter = LineSplitter(stream_name, on_line) if on_line else None
+    while True:
+        chunk = await stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer.write(chunk)
+        if splitter is not None:
+            splitter.feed(chunk)
+
+    if splitter is not None:
+        splitter.close()
+
+
+async def collect_output(
+    process: OutputProcess,
+    limit: int = DEFAULT_OUTPUT_LIMIT,
+    on_line: Optional[LineCallback] = None,
+) -> ProcessOutput:
+    """
+    Stream a process's stdout and stderr until it exits.
+
+    Args:
+        process: Process started with piped stdout and stderr
+        limit: Bytes retained per stream
+        on_line: Optional live line callback, see :func:`pump_stream`
+
+    Returns:
+        The exit status with the retained output
+    """
+    stdout = HeadTailBuffer(limit)
+    stderr = HeadTailBuffer(limit)
+    await asyncio.gather(
+        pump_stream(process.stdout, stdout, "stdout", on_line),
+        pump_stream(process.stderr, stderr, "stderr", on_line),
+    )
+    returncode = await process.wait()
+    return ProcessOutput(
+        returncode=returncode,
+        stdout=stdout.decode(),
+        stderr=stderr.decode(),
+        stdout_bytes=stdout.total_bytes,
+        stderr_bytes=stderr.total_bytes,
+        truncated=stdout.truncated or stderr.truncated,
+        # Only set for processes reaped with os.wait4 (see executor.resources)
+        resource_usage=getattr(process, "resource_usage", None),
+    )
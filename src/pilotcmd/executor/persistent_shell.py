@@ -0,0 +1,311 @@
+"""
+Long-lived shell co-process for running a session's commands.
+
+Instead of starting a new shell per command, commands are written to one
+shell's stdin, each followed by unique sentinel markers on stdout and stderr
+that carry the exit status. This saves the shell startup for every step, and
+state such as the working directory or exported variables carries over from
+one command to the next, as it would in an interactive terminal.
+
+The shell is respawned transparently if it exits (for example after an
+``exit`` command). A command that times out or is cancelled stops the shell
+and everything it started; the next command then gets a fresh shell.
+Resource limits are not applied here, since they would accumulate over the
+shell's lifetime rather than per command.
+"""
+
+import os
+import selectors
+import shlex
+import signal
+import subprocess
+import threading
+import time
+import uuid
+from typing import IO, Optional, Tuple
+
+from pilotcmd.executor.output import (
+    CHUNK_SIZE,
+    DEFAULT_OUTPUT_LIMIT,
+    HeadTailBuffer,
+    LineCallback,
+    LineSplitter,
+    ProcessOutput,
+)
+from pilotcmd.executor.resources import TERMINATE_GRACE_SECONDS
+from pilotcmd.os_utils.detector import OSInfo
+
+_MARKER_PREFIX = "__PILOTCMD_DONE_"
+
+
+class ShellTimeoutError(TimeoutError):
+    """Raised when a command does not finish within its timeout."""
+
+
+class _MarkedStream:
+    """Receives one command's output, watching for its end marker."""
+
+    def __init__(
+        self,
+        marker: bytes,
+        limit: int,
+        stream_name: str,
+        on_line: Optional[LineCallback],
+    ):
+        # The marker is printed on a line of its own, after a newline we add
+        self.marker = b"\n" + marker
+        self.buffer = HeadTailBuffer(limit)
+        self.splitter = LineSplitter(stream_name, on_line) if on_line else None
+        self.trailer: Optional[bytes] = None
+        self.eof = False
+        self._pending = b""
+
+    @property
+    def done(self) -> bool:
+        return self.trailer is not None or self.eof
+
+    def _emit(self, data: bytes) -> None:
+        if data:
+            self.buffer.write(data)
+            if self.splitter is not None:
+                self.splitter.feed(data)
+
+    def feed(self, chunk: bytes) -> None:
+        self._pending += chunk
+        index = self._pending.find(self.marker)
+        if index >= 0:
+            end = self._pending.find(b"\n", index + len(self.marker))
+            if end < 0:
+                return
+            self._emit(self._pending[:index])
+            self.trailer = self._pending[index + len(self.marker) : end]
+            self._pending = b""
+            return
+        # Hold back anything that could be the start of a split marker
+        safe = len(self._pending) - len(self.marker)
+        if safe > 0:
+            self._emit(self._pending[:safe])
+            self._pending = self._pending[safe:]
+
+    def close(self) -> None:
+        """Flush held-back bytes and any unterminated last line."""
+        self._emit(self._pending)
+        self._pending = b""
+        if self.splitter is not None:
+            self.splitter.close()
+
+
+class PersistentShell:
+    """A shell kept running across commands, driven through its stdin."""
+
+    def __init__(self, shell_path: str = "/bin/sh", cwd: Optional[str] = None):
+        self.shell_path = shell_path
+        self.cwd = cwd
+        self.spawn_count = 0
+        self._process: Optional["subprocess.Popen[bytes]"] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_os(cls, os_info: OSInfo) -> "PersistentShell":
+        """Create a shell matching the detected Unix shell."""
+        shell_path = f"/bin/{os_info.shell}"
+        if not os.path.exists(shell_path):
+            shell_path = "/bin/sh"
+        return cls(shell_path)
+
+    @staticmethod
+    def supported(os_info: OSInfo) -> bool:
+        """Persistent shells are only available on Unix-like systems."""
+        return not os_info.is_windows()
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._process.pid if self._process is not None else None
+
+    def _spawn(self) -> "subprocess.Popen[bytes]":
+        self._process = subprocess.Popen(
+            [self.shell_path],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=self.cwd or os.getcwd(),
+            start_new_session=True,
+            bufsize=0,
+        )
+        self.spawn_count += 1
+        return self._process
+
+    @staticmethod
+    def _pipes(process: "subprocess.Popen[bytes]") -> Tuple[IO[bytes], IO[bytes], IO[bytes]]:
+        """The shell's stdin, stdout and stderr, which :meth:`_spawn` always opens."""
+        assert process.stdin is not None
+        assert process.stdout is not None
+        assert process.stderr is not None
+        return process.stdin, process.stdout, process.stderr
+
+    def working_directory(self) -> Optional[str]:
+        """The running shell's current directory, or None without a shell."""
+        if not self.alive:
+            return None
+        try:
+            result = self.run("pwd", timeout=TERMINATE_GRACE_SECONDS)
+        except ShellTimeoutError:
+            return None
+        directory = result.stdout.rstrip("\n")
+        return directory if result.returncode == 0 and directory else None
+
+    def run(
+        self,
+        command: str,
+        timeout: Optional[float] = None,
+        output_limit: int = DEFAULT_OUTPUT_LIMIT,
+        on_line: Optional[LineCallback] = None,
+    ) -> ProcessOutput:
+        """
+        Run a command in the shell and wait for it to finish.
+
+        Args:
+            command: Shell command line
+            timeout: Seconds to wait before killing the shell
+            output_limit: Bytes retained per stream
+            on_line: Optional live line callback
+
+        Returns:
+            The command's exit status and output
+
+        Raises:
+            ShellTimeoutError: If the command did not finish in time
+        """
+        with self._lock:
+            process = self._process
+            if process is None or process.poll() is not None:
+                process = self._spawn()
+            stdin_pipe, stdout_pipe, stderr_pipe = self._pipes(process)
+            marker = f"{_MARKER_PREFIX}{uuid.uuid4().hex}__".encode()
+            streams = {
+                stdout_pipe.fileno(): _MarkedStream(
+                    marker, output_limit, "stdout", on_line
+                ),
+                stderr_pipe.fileno(): _MarkedStream(
+                    marker, output_limit, "stderr", on_line
+                ),
+            }
+
+            # "command eval" keeps a syntax error from exiting the shell, and
+            # commands must not read the shell's own stdin
+            script = (
+                f"command eval {shlex.quote(command)} </dev/null\n"
+                "__pilotcmd_status=$?\n"
+                f"printf '\\n%s %s\\n' '{marker.decode()}' \"$__pilotcmd_status\"\n"
+                f"printf '\\n%s\\n' '{marker.decode()}' >&2\n"
+            )
+            try:
+                stdin_pipe.write(script.encode())
+                stdin_pipe.flush()
+            except (BrokenPipeError, OSError):
+                pass
+
+            deadline = None if timeout is None else time.monotonic() + timeout
+            with selectors.DefaultSelector() as selector:
+                for fd in streams:
+                    selector.register(fd, selectors.EVENT_READ)
+                while not all(stream.done for stream in streams.values()):
+                    wait = None
+                    if deadline is not None:
+                        wait = deadline - time.monotonic()
+                        if wait <= 0:
+                            self._kill(process)
+                            raise ShellTimeoutError(
+                                f"Command timed out after {timeout} seconds"
+                            )
+                    events = selector.select(wait)
+                    for key, _ in events:
+                        chunk = os.read(key.fd, CHUNK_SIZE)
+                        if chunk:
+                            streams[key.fd].feed(chunk)
+                        else:
+                            # The shell exited before finishing the command
+                            selector.unregister(key.fd)
+                            streams[key.fd].eof = True
+
+            stdout = streams[stdout_pipe.fileno()]
+            stderr = streams[stderr_pipe.fileno()]
+            stdout.close()
+            stderr.close()
+            status = (stdout.trailer or b"").strip()
+            if status.isdigit():
+                returncode = int(status)
+            else:
+                returncode = process.wait()
+                self._close_pipes(process)
+                self._process = None
+
+            return ProcessOutput(
+                returncode=returncode,
+                stdout=stdout.buffer.decode(),
+                stderr=stderr.buffer.decode(),
+                stdout_bytes=stdout.buffer.total_bytes,
+                stderr_bytes=stderr.buffer.total_bytes,
+                truncated=stdout.buffer.truncated or stderr.buffer.truncated,
+            )
+
+    def _kill(
+        self, process: "subprocess.Popen[bytes]", grace: float = TERMINATE_GRACE_SECONDS
+    ) -> None:
+        """Stop the shell's whole session, SIGTERM first and SIGKILL after ``grace``."""
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait(timeout=grace)
+        except (ProcessLookupError, subprocess.TimeoutExpired):
+            pass
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        process.wait()
+        self._close_pipes(process)
+        if self._process is process:
+            self._process = None
+
+    @staticmethod
+    def _close_pipes(process: "subprocess.Popen[bytes]") -> None:
+        for pipe in (process.stdin, process.stdout, process.stderr):
+            if pipe is not None and not pipe.closed:
+                pipe.close()
+
+    def interrupt(self, grace: float = TERMINATE_GRACE_SECONDS) -> None:
+        """Stop the running command (and the shell) from another thread."""
+        process = self._process
+        if process is None or process.poll() is not None:
+            return
+
+        def kill() -> None:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        timer = threading.Timer(grace, kill)
+        timer.daemon = True
+        timer.start()
+
+    def close(self) -> None:
+        """Stop the shell."""
+        process, self._process = self._process, None
+        if process is None:
+            return
+        if process.poll() is None:
+            try:
+                self._pipes(process)[0].close()
+                process.wait(timeout=1)
+            except (OSError, subprocess.TimeoutExpired):
+                self._kill(process)
+        self._close_pipes(process)
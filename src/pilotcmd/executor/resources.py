@@ -0,0 +1,298 @@
+"""
+Per-command resource accounting and limits.
+
+Unix commands are started with ``subprocess.Popen`` and reaped with
+``os.wait4`` on a worker thread, which returns the exit status together with
+the child's resource usage (CPU time, peak RSS, block I/O, context
+switches). The pipes are attached to the running event loop, so output is
+still streamed asynchronously. Collecting the usage costs one blocking
+system call per command and nothing while it runs.
+
+Each spawned command can also be capped (CPU seconds, address space, file
+size, open files) according to its safety level, so a runaway generated
+command cannot exhaust a shared machine. The limits are set by ``sh``'s
+``ulimit`` before the command runs, not by a ``preexec_fn``: running Python
+code between fork and exec can deadlock while other threads (the history
+writer, the speculation loop) hold locks.
+"""
+
+import asyncio
+import functools
+import os
+import signal
+import subprocess
+import sys
+from dataclasses import dataclass, fields
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None  # type: ignore
+
+# Seconds between SIGTERM and SIGKILL when stopping a command's process group
+TERMINATE_GRACE_SECONDS = 2.0
+
+# Extra CPU seconds between the soft limit (SIGXCPU) and the hard one (SIGKILL)
+_CPU_HARD_MARGIN = 5
+
+# ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+_MAXRSS_DIVISOR = 1024 if sys.platform == "darwin" else 1
+
+
+@dataclass
+class ResourceUsage:
+    """Resources consumed by a command and everything it waited for."""
+
+    user_time: float
+    system_time: float
+    max_rss_kb: int
+    block_input: int
+    block_output: int
+    voluntary_switches: int
+    involuntary_switches: int
+
+    @property
+    def cpu_time(self) -> float:
+        return self.user_time + self.system_time
+
+    @classmethod
+    def from_rusage(cls, usage: Any) -> "ResourceUsage":
+        return cls(
+            user_time=usage.ru_utime,
+            system_time=usage.ru_stime,
+            max_rss_kb=int(usage.ru_maxrss // _MAXRSS_DIVISOR),
+            block_input=usage.ru_inblock,
+            block_output=usage.ru_oublock,
+            voluntary_switches=usage.ru_nvcsw,
+            involuntary_switches=usage.ru_nivcsw,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "user_time": round(self.user_time, 6),
+            "system_time": round(self.system_time, 6),
+            "max_rss_kb": self.max_rss_kb,
+            "block_input": self.block_input,
+            "block_output": self.block_output,
+            "voluntary_switches": self.voluntary_switches,
+            "involuntary_switches": self.involuntary_switches,
+        }
+
+
+@dataclass(frozen=True)
+class ResourceLimits:
+    """Caps applied to a command's process (None means unchanged)."""
+
+    cpu_seconds: Optional[int] = None
+    address_space_mb: Optional[int] = None
+    file_size_mb: Optional[int] = None
+    open_files: Optional[int] = None
+
+    def merged(self, overrides: Dict[str, Any]) -> "ResourceLimits":
+        """Return a copy with the given fields replaced."""
+        values = {f.name: getattr(self, f.name) for f in fields(self)}
+        values.update(
+            {key: value for key, value in overrides.items() if key in values}
+        )
+        return ResourceLimits(**values)
+
+    def _rlimits(self) -> List[Tuple[int, int, int]]:
+        """(resource, soft, hard) triples to apply."""
+        if resource is None:
+            return []
+        mb = 1024 * 1024
+        limits = []
+        if self.cpu_seconds:
+            limits.append(
+                (resource.RLIMIT_CPU, self.cpu_seconds, self.cpu_seconds + _CPU_HARD_MARGIN)
+            )
+        if self.address_space_mb and hasattr(resource, "RLIMIT_AS"):
+            value = self.address_space_mb * mb
+            limits.append((resource.RLIMIT_AS, value, value))
+        if self.file_size_mb:
+            value = self.file_size_mb * mb
+            limits.append((resource.RLIMIT_FSIZE, value, value))
+        if self.open_files:
+            limits.append((resource.RLIMIT_NOFILE, self.open_files, self.open_files))
+        return limits
+
+    def wrap(self, args: Union[str, Sequence[str]]) -> Union[str, List[str]]:
+        """
+        Command line that applies these limits, then runs ``args``.
+
+        A shell command line keeps running in the same shell; an argument
+        vector is started through ``sh``, which replaces itself with the
+        command. Limits are only ever lowered: a requested value above the
+        current hard limit is clamped to it.
+        """
+        limits = self._rlimits()
+        if not limits:
+            return args if isinstance(args, str) else list(args)
+
+        steps = []
+        for which, soft, hard in limits:
+            _, current_hard = resource.getrlimit(which)
+            if current_hard != resource.RLIM_INFINITY:
+                soft = min(soft, current_hard)
+                hard = min(hard, current_hard)
+            flag, unit = _ULIMIT_OPTIONS[which]
+            steps.append(f"ulimit -S -{flag} {soft // unit} && ulimit -H -{flag} {hard // unit}")
+        prologue = " && ".join(steps) + " || exit 126"
+        if isinstance(args, str):
+            return f"{prologue}\n{args}"
+        return ["/bin/sh", "-c", f'{prologue}\nexec "$@"', "sh", *args]
+
+
+# ulimit option and unit (in bytes or seconds) per resource; -f counts
+# 512-byte blocks in POSIX sh
+_ULIMIT_OPTIONS: Dict[int, Tuple[str, int]] = (
+    {
+        resource.RLIMIT_CPU: ("t", 1),
+        resource.RLIMIT_FSIZE: ("f", 512),
+        resource.RLIMIT_NOFILE: ("n", 1),
+        **({resource.RLIMIT_AS: ("v", 1024)} if hasattr(resource, "RLIMIT_AS") else {}),
+    }
+    if resource is not None
+    else {}
+)
+
+# Caps per command safety level; dangerous commands are never executed
+DEFAULT_RESOURCE_LIMITS: Dict[str, ResourceLimits] = {
+    "safe": ResourceLimits(cpu_seconds=600, file_size_mb=1024, open_files=1024),
+    "caution": ResourceLimits(cpu_seconds=3600, file_size_mb=16384, open_files=4096),
+}
+
+
+def resource_limits_from_config(
+    overrides: Optional[Dict[str, Dict[str, Any]]],
+) -> Dict[str, ResourceLimits]:
+    """
+    Merge per-safety-level overrides (e.g. from the config file) into the defaults.
+
+    Example override: ``{"safe": {"cpu_seconds": 60, "address_space_mb": 2048}}``
+    """
+    limits = dict(DEFAULT_RESOURCE_LIMITS)
+    for level, values in (overrides or {}).items():
+        base = limits.get(level, ResourceLimits())
+        limits[level] = base.merged(values or {})
+    return limits
+
+
+def limits_supported() -> bool:
+    """Whether resource limits can be applied on this platform."""
+    return resource is not None
+
+
+def accounting_supported() -> bool:
+    """Whether child resource usage can be collected on this platform."""
+    return resource is not None and hasattr(os, "wait4")
+
+
+class AccountedProcess:
+    """
+    A running child process reaped with ``os.wait4``.
+
+    Exposes the subset of ``asyncio.subprocess.Process`` used by the
+    executor (``pid``, ``stdout``, ``stderr``, ``returncode``, ``wait()``),
+    plus the collected :class:`ResourceUsage`.
+    """
+
+    def __init__(self, popen: subprocess.Popen):
+        self._popen = popen
+        self.pid = popen.pid
+        self.stdout: Optional[asyncio.StreamReader] = None
+        self.stderr: Optional[asyncio.StreamReader] = None
+        self.returncode: Optional[int] = None
+        self.resource_usage: Optional[ResourceUsage] = None
+        self._transports: List[asyncio.ReadTransport] = []
+        loop = asyncio.get_running_loop()
+        self._reaped = loop.run_in_executor(None, os.wait4, self.pid, 0)
+
+    async def _attach(self) -> None:
+        loop = asyncio.get_running_loop()
+        readers = []
+        for pipe in (self._popen.stdout, self._popen.stderr):
+            reader = asyncio.StreamReader(loop=loop)
+            transport, _ = await loop.connect_read_pipe(
+                functools.partial(asyncio.StreamReaderProtocol, reader, loop=loop),
+                pipe,
+            )
+            self._transports.append(transport)
+            readers.append(reader)
+        self.stdout, self.stderr = readers
+
+    async def wait(self) -> int:
+        """Wait for the process to exit and collect its resource usage."""
+        if self.returncode is None:
+            _, status, usage = await asyncio.shield(self._reaped)
+            self.returncode = os.waitstatus_to_exitcode(status)
+            self.resource_usage = ResourceUsage.from_rusage(usage)
+            # Keep Popen from trying to reap the process again
+            self._popen.returncode = self.returncode
+            self.close_pipes()
+        return self.returncode
+
+    def close_pipes(self) -> None:
+        for transport in self._transports:
+            transport.close()
+        self._transports = []
+
+
+def signal_command(pid: int, sig: int, group: bool = True) -> None:
+    """
+    Send a signal to a command and, with ``group``, to every process in its
+    session (a command started with ``new_session=False`` shares pilotcmd's
+    process group and must be signalled alone).
+    """
+    try:
+        if group:
+            os.killpg(pid, sig)
+        else:
+            os.kill(pid, sig)
+    except ProcessLookupError:
+        pass
+
+
+async def spawn_accounted(
+    args: Union[str, Sequence[str]],
+    cwd: Optional[str] = None,
+    limits: Optional[ResourceLimits] = None,
+    stdin: Optional[int] = None,
+    new_session: bool = True,
+) -> AccountedProcess:
+    """
+    Start a command with resource accounting, by default in its own session.
+
+    Args:
+        args: Shell command line, or an argument vector to execute directly
+        cwd: Working directory (defaults to the current one)
+        limits: Resource limits to apply to the command
+        stdin: Standard input (inherited by default)
+        new_session: Detach from the terminal so the command and everything it
+            spawns can be stopped together; commands that prompt on the
+            terminal (sudo) need it off
+
+    Returns:
+        The running process, with stdout and stderr attached to the loop
+    """
+    if limits is not None:
+        args = limits.wrap(args)
+    popen = subprocess.Popen(
+        args,
+        shell=isinstance(args, str),
+        stdin=stdin,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=cwd or os.getcwd(),
+        start_new_session=new_session,
+    )
+    process = AccountedProcess(popen)
+    try:
+        await process._attach()
+    except BaseException:
+        # Never leave a command running that nobody reads from
+        signal_command(process.pid, signal.SIGKILL, group=new_session)
+        process.close_pipes()
+        raise
+    return process
@@ -0,0 +1,129 @@
+"""
+Short-lived cache of read-only command results.
+
+Probes such as ``uname -a``, ``ip addr show`` or ``df -h`` are often run
+several times within seconds in a shell session. Results of commands that
+:func:`~pilotcmd.executor.speculation.is_side_effect_free` accepts are kept
+for a per-program time to live: long for facts that practically never change
+(``uname``, ``hostname``), a few seconds for live state (``ps``, ``free``).
+Running any other command clears the cache, since it may have changed what
+the cached commands would report.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from dataclasses import replace
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Tuple
+
+from pilotcmd.executor.speculation import is_side_effect_free
+from pilotcmd.nlp.parser import Command
+from pilotcmd.utils.command_signature import command_signature
+
+if TYPE_CHECKING:  # pragma: no cover - import cycle guard
+    from pilotcmd.executor.command_executor import ExecutionResult
+
+# Seconds a result stays valid, by program; 0 disables caching
+CACHE_TTLS: Dict[str, float] = {
+    "uname": 3600.0,
+    "hostname": 3600.0,
+    "nproc": 3600.0,
+    "lscpu": 3600.0,
+    "ver": 3600.0,
+    "systeminfo": 600.0,
+    "whoami": 3600.0,
+    "id": 600.0,
+    "groups": 600.0,
+    "lspci": 600.0,
+    "which": 300.0,
+    "lsusb": 60.0,
+    "lsblk": 60.0,
+    "ip": 30.0,
+    "ipconfig": 30.0,
+    "df": 30.0,
+    "du": 30.0,
+    "uptime": 10.0,
+    "free": 5.0,
+    "ss": 5.0,
+    "netstat": 5.0,
+    "ps": 2.0,
+    "tasklist": 2.0,
+    "date": 0.0,
+    "sleep": 0.0,
+}
+DEFAULT_CACHE_TTL = 10.0
+
+MAX_CACHE_ENTRIES = 256
+
+# Environment variables that can change what a read-only command reports
+KEY_ENV_VARS = ("PATH", "HOME", "USER", "LANG", "LC_ALL", "LC_MESSAGES", "TZ")
+
+CacheKey = Tuple[str, str, str, Tuple[Optional[str], ...]]
+
+
+class ResultCache:
+    """LRU map of command results, each with an expiry time."""
+
+    def __init__(
+        self,
+        ttls: Optional[Dict[str, float]] = None,
+        default_ttl: float = DEFAULT_CACHE_TTL,
+        max_entries: int = MAX_CACHE_ENTRIES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttls = CACHE_TTLS if ttls is None else ttls
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[CacheKey, Tuple[float, ExecutionResult]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def ttl_for(self, command: Command) -> float:
+        """Time to live for a command's result; 0 if it must not be cached."""
+        if not is_side_effect_free(command):
+            return 0.0
+        program = command_signature(command.command).split(" ", 1)[0]
+        return self.ttls.get(program, self.default_ttl)
+
+    @staticmethod
+    def key(command: Command, cwd: str, target: str = "") -> CacheKey:
+        env = tuple(os.environ.get(name) for name in KEY_ENV_VARS)
+        return (command.command.strip(), cwd, target, env)
+
+    def get(self, key: CacheKey, command: Command) -> Optional["ExecutionResult"]:
+        """Return a live cached result as a copy for ``command``, marked as cached."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= self.clock():
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return replace(
+            entry[1],
+            command=command,
+            cached=True,
+            streamed=False,
+            timestamp=time.time(),
+            parallel_group=None,
+            group_wall_time=None,
+            group_summed_time=None,
+            group_cpu_time=None,
+        )
+
+    def put(self, key: CacheKey, result: "ExecutionResult", ttl: float) -> None:
+        if ttl <= 0 or not result.success:
+            return
+        self._entries[key] = (self.clock() + ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
@@ -0,0 +1,280 @@
+"""
+Speculative execution of read-only commands.
+
+While the user is asked to confirm a plan, commands that are provably free of
+side effects can already run in the background with their output buffered.
+If the plan is confirmed the buffered results are used as-is; otherwise they
+are thrown away. Speculative commands read /dev/null instead of the terminal,
+which belongs to the confirmation prompt.
+
+The same allowlist decides which results may be cached and which commands
+may run in parallel, so it accepts options per program: anything that could
+write a file, kill, set the clock or hostname, or execute another command is
+rejected.
+"""
+
+import asyncio
+import shlex
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+from pilotcmd.nlp.parser import Command, SafetyLevel
+
+if TYPE_CHECKING:  # pragma: no cover - import cycle guard
+    from pilotcmd.executor.command_executor import CommandExecutor, ExecutionResult
+
+# Characters that let a command redirect output, chain or substitute commands
+_SHELL_METACHARS = set(";&|<>`$(){}\n\\")
+
+_IP_OBJECTS = {"a", "addr", "address", "l", "link", "r", "route", "n", "neigh", "rule"}
+_IP_READ_VERBS = {"show", "list", "ls", "get"}
+
+
+def _ip_is_read_only(args: List[str]) -> bool:
+    words = [arg for arg in args if not arg.startswith("-")]
+    if not words:
+        return True
+    if words[0] not in _IP_OBJECTS:
+        return False
+    return len(words) == 1 or words[1] in _IP_READ_VERBS
+
+
+def _has_option(args: List[str], short: str = "", long: Tuple[str, ...] = ()) -> bool:
+    """
+    Whether any of the given options is present.
+
+    Short options are also found bundled or with an attached value (``-tK``,
+    ``-s2020-01-01``), long ones also abbreviated (``--se``) or with
+    ``=value``. Anything after ``--`` is an operand.
+    """
+    for arg in args:
+        if arg == "--":
+            break
+        if arg.startswith("--"):
+            name = arg[2:].split("=", 1)[0]
+            if name and any(option.startswith(name) for option in long):
+                return True
+        elif arg.startswith("-") and any(letter in arg[1:] for letter in short):
+            return True
+    return False
+
+
+def _without(short: str = "", long: Tuple[str, ...] = ()) -> Callable[[List[str]], bool]:
+    """Rule accepting any arguments except the given options."""
+    return lambda args: not _has_option(args, short, long)
+
+
+def _no_args(args: List[str]) -> bool:
+    return not args
+
+
+def _env_is_read_only(args: List[str]) -> bool:
+    # Only printing (part of) the environment: any option other than -u/-0
+    # (-S, -i, --chdir...) or an operand that is not NAME=VALUE runs a command
+    expect_name = False
+    for arg in args:
+        if expect_name:
+            expect_name = False
+        elif arg in ("-u", "--unset"):
+            expect_name = True
+        elif arg in ("-0", "--null") or arg.startswith("--unset="):
+            continue
+        elif arg.startswith("-u") and not arg.startswith("--"):
+            continue
+        elif arg.startswith("-") or "=" not in arg.lstrip("="):
+            return False
+    return True
+
+
+_DATE_FLAGS = {"-u", "--utc", "--universal", "-R", "--rfc-email", "--debug", "-I", "--iso-8601"}
+_DATE_VALUE_OPTIONS = {"-d", "--date", "-r", "--reference", "-f", "--file"}
+
+
+def _date_is_read_only(args: List[str]) -> bool:
+    # Only +FORMAT operands and options that pick the date or its format: a
+    # bare operand (MMDDhhmm[[CC]YY]) or -s sets the clock
+    expect_value = False
+    for arg in args:
+        if expect_value:
+            expect_value = False
+        elif arg.startswith("+") or arg in _DATE_FLAGS:
+            continue
+        elif arg in _DATE_VALUE_OPTIONS:
+            expect_value = True
+        elif arg.startswith(("-d", "-r", "-f", "-I")) and not arg.startswith("--"):
+            continue
+        elif arg.startswith(("--date=", "--reference=", "--file=", "--iso-8601=", "--rfc-3339=")):
+            continue
+        else:
+            return False
+    return True
+
+
+_FIND_WRITERS = {
+    "-delete", "-exec", "-execdir", "-ok", "-okdir",
+    "-fprint", "-fprint0", "-fprintf", "-fls",
+}
+
+
+def _find_is_read_only(args: List[str]) -> bool:
+    return not _FIND_WRITERS.intersection(args)
+
+
+def _ipconfig_is_read_only(args: List[str]) -> bool:
+    return all(arg.lower() in ("/all", "/displaydns") for arg in args)
+
+
+_SYSTEMCTL_READ_VERBS = {
+    "status", "list-units", "list-unit-files", "is-active", "is-enabled", "show",
+}
+
+
+def _systemctl_is_read_only(args: List[str]) -> bool:
+    words = [arg for arg in args if not arg.startswith("-")]
+    return bool(words) and words[0] in _SYSTEMCTL_READ_VERBS
+
+
+# Programs allowed to run speculatively; a rule, when present, must accept
+# the arguments. Options that write, kill, set or execute are rejected per
+# program.
+READ_ONLY_COMMANDS: Dict[str, Optional[Callable[[List[str]], bool]]] = {
+    "ls": None,
+    "dir": None,
+    "pwd": None,
+    "cat": None,
+    "head": None,
+    # Following a file never terminates
+    "tail": _without("fF", ("follow",)),
+    "wc": None,
+    "echo": None,
+    "df": None,
+    "du": None,
+    "free": None,
+    "ps": None,
+    "uptime": None,
+    "uname": None,
+    "whoami": None,
+    "id": None,
+    "groups": None,
+    "env": _env_is_read_only,
+    "printenv": None,
+    "which": None,
+    "lsblk": None,
+    "lscpu": None,
+    "lsusb": None,
+    "lspci": None,
+    "nproc": None,
+    "sleep": None,
+    "stat": None,
+    "file": _without("C", ("compile",)),
+    "tree": _without("o", ("output",)),
+    "find": _find_is_read_only,
+    "date": _date_is_read_only,
+    "hostname": _no_args,
+    "ip": _ip_is_read_only,
+    # -K kills sockets, -D dumps raw data to a file
+    "ss": _without("KD", ("kill", "diag")),
+    "netstat": None,
+    "systemctl": _systemctl_is_read_only,
+    "ipconfig": _ipconfig_is_read_only,
+    "tasklist": None,
+    "systeminfo": None,
+    "ver": None,
+}
+
+
+def is_side_effect_free(command: Command) -> bool:
+    """
+    Decide whether a command can run without the user's confirmation.
+
+    A command qualifies only if the safety classifier rated it safe, it does
+    not need elevated privileges, it uses no redirection, chaining or
+    substitution, and its program (and arguments) are on the read-only
+    allowlist.
+    """
+    # Handle both enum and string safety levels
+    safety_level = getattr(command.safety_level, "value", command.safety_level)
+    if safety_level != SafetyLevel.SAFE.value or command.requires_sudo:
+        return False
+
+    cmd = command.command.strip()
+    if not cmd or any(char in _SHELL_METACHARS for char in cmd):
+        return False
+
+    try:
+        parts = shlex.split(cmd)
+    except ValueError:
+        return False
+    if not parts:
+        return False
+
+    program = parts[0].rsplit("/", 1)[-1].lower()
+    if program not in READ_ONLY_COMMANDS:
+        return False
+    rule = READ_ONLY_COMMANDS[program]
+    return rule is None or rule(parts[1:])
+
+
+class SpeculativeRun:
+    """Runs a plan of read-only commands on a background event loop."""
+
+    def __init__(self, executor: "CommandExecutor", commands: List[Command]):
+        self.executor = executor
+        self.commands = list(commands)
+        self.results: List["ExecutionResult"] = []
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.hidden_latency = 0.0
+
+        self._loop = asyncio.new_event_loop()
+        self._task = self._loop.create_task(self._execute_all())
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.close()
+
+    async def _execute_all(self) -> None:
+        for command in self.commands:
+            # Never stream or read stdin: the user is still answering the
+            # confirmation prompt
+            self.results.append(
+                await self.executor.execute_command(command, stream=False, speculative=True)
+            )
+        self.finished_at = time.monotonic()
+
+    def matches(self, commands: List[Command]) -> bool:
+        """Check whether this run was started for the given plan."""
+        return self.commands == list(commands)
+
+    def collect(self, confirmed_at: float) -> List["ExecutionResult"]:
+        """
+        Wait for the speculative results of a confirmed plan.
+
+        Args:
+            confirmed_at: Monotonic time at which the plan was confirmed
+
+        Returns:
+            Buffered execution results, in plan order
+        """
+        self._thread.join()
+        end = min(self.finished_at or confirmed_at, confirmed_at)
+        self.hidden_latency = max(0.0, end - self.started_at)
+        return self.results
+
+    def discard(self) -> None:
+        """Cancel the run, killing any command still in flight."""
+        try:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        except RuntimeError:
+            # Loop already finished and closed
+            pass
+        self._thread.join(timeout=5)
+        self.results = []
@@ -0,0 +1,116 @@
+"""
+Per-command timeouts learned from execution history.
+
+The history database keeps a window of recent run times per command
+signature (see :func:`pilotcmd.utils.command_signature.command_signature`).
+Once a signature has a few samples its timeout becomes the 95th percentile
+run time times a safety factor, so a quick ``ping`` that hangs is given up on
+early while a slow ``apt-get install`` is left to finish. Signatures known to
+run long never go below their starting timeout: the signature leaves out the
+packages, and three quick installs say nothing about the next one.
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from pilotcmd.nlp.parser import Command
+from pilotcmd.utils.command_signature import command_signature
+
+# Run times kept per signature
+SAMPLE_WINDOW = 50
+
+# Samples needed before the learned timeout replaces the default
+MIN_SAMPLES = 3
+
+SAFETY_FACTOR = 3.0
+MIN_TIMEOUT = 5.0
+MAX_TIMEOUT = 3600.0
+
+# Starting points for signatures known to run long, and floors for their
+# learned timeouts
+SLOW_COMMAND_TIMEOUTS: Dict[str, float] = {
+    "apt install": 900.0,
+    "apt upgrade": 1800.0,
+    "apt-get install": 900.0,
+    "apt-get upgrade": 1800.0,
+    "dnf install": 900.0,
+    "dnf upgrade": 1800.0,
+    "yum install": 900.0,
+    "brew install": 900.0,
+    "brew upgrade": 1800.0,
+    "choco install": 900.0,
+    "winget install": 900.0,
+    "pip install": 600.0,
+    "pip3 install": 600.0,
+    "npm install": 600.0,
+    "docker build": 1800.0,
+    "docker pull": 600.0,
+    "git clone": 600.0,
+}
+
+
+def percentile(samples: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty sample list."""
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+@dataclass
+class CommandTiming:
+    """Run time statistics for one command signature."""
+
+    signature: str
+    count: int
+    p50: float
+    p95: float
+    samples: List[float]
+
+    @classmethod
+    def from_samples(cls, signature: str, samples: List[float], count: int) -> "CommandTiming":
+        samples = samples[-SAMPLE_WINDOW:]
+        return cls(
+            signature=signature,
+            count=count,
+            p50=percentile(samples, 0.5),
+            p95=percentile(samples, 0.95),
+            samples=samples,
+        )
+
+
+class TimeoutPolicy:
+    """Derives per-command timeouts and ETAs from recorded timings."""
+
+    def __init__(self, timings: Dict[str, CommandTiming], default_timeout: float = 30):
+        self.timings = timings
+        self.default_timeout = default_timeout
+
+    def timing_for(self, command: Command) -> Optional[CommandTiming]:
+        timing = self.timings.get(command_signature(command.command))
+        if timing is None or timing.count < MIN_SAMPLES:
+            return None
+        return timing
+
+    def timeout_for(self, command: Command) -> float:
+        """Timeout in seconds for a command."""
+        signature = command_signature(command.command)
+        slow = SLOW_COMMAND_TIMEOUTS.get(signature)
+        timing = self.timing_for(command)
+        if timing is not None:
+            learned = min(MAX_TIMEOUT, max(MIN_TIMEOUT, timing.p95 * SAFETY_FACTOR))
+            return max(learned, slow) if slow is not None else learned
+        return slow if slow is not None else self.default_timeout
+
+    def estimate(self, command: Command) -> Optional[float]:
+        """Expected run time of a command (median), if known."""
+        timing = self.timing_for(command)
+        return timing.p50 if timing is not None else None
+
+    def estimate_plan(self, commands: List[Command]) -> Optional[float]:
+        """Expected run time of a plan, if every command's is known."""
+        estimates = [self.estimate(command) for command in commands]
+        known = [estimate for estimate in estimates if estimate is not None]
+        if not known or len(known) < len(estimates):
+            return None
+        return sum(known)
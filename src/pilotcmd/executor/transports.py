@@ -0,0 +1,138 @@
+"""
+Where a command runs.
+
+A transport turns a command line into what is started locally: the command
+itself in a given working directory, or a ``docker exec`` / ``ssh``
+invocation that runs it elsewhere. The executor uses the local process
+machinery (timeouts, process groups, output capture) unchanged for all of
+them.
+"""
+
+import glob
+import os
+from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence
+
+
+class Transport(ABC):
+    """Base class; ``wrap`` returns None to run the command locally."""
+
+    def __init__(self, name: str, cwd: Optional[str] = None):
+        self.name = name
+        self.cwd = cwd
+
+    @abstractmethod
+    def wrap(self, command: str) -> Optional[List[str]]:
+        """Argument vector that runs ``command`` on the target, or None."""
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.name!r})"
+
+
+class LocalTransport(Transport):
+    """Runs commands on this machine, in a given working directory."""
+
+    cwd: str
+
+    def __init__(self, cwd: str):
+        cwd = os.path.abspath(os.path.expanduser(cwd))
+        super().__init__(cwd, cwd)
+
+    def wrap(self, command: str) -> Optional[List[str]]:
+        return None
+
+
+class DockerTransport(Transport):
+    """Runs commands inside a running container with ``docker exec``."""
+
+    def __init__(self, container: str, shell: str = "sh", docker: str = "docker"):
+        super().__init__(f"docker:{container}")
+        self.container = container
+        self.shell = shell
+        self.docker = docker
+
+    def wrap(self, command: str) -> Optional[List[str]]:
+        return [self.docker, "exec", self.container, self.shell, "-c", command]
+
+
+class SshTransport(Transport):
+    """
+    Runs commands on a remote host through an ssh-compatible client.
+
+    ``ssh_command`` is the client and its options; any program taking
+    ``<host> <command>`` like ``ssh`` does can be used (which is how this
+    transport is tested against localhost).
+    """
+
+    DEFAULT_SSH = ("ssh", "-o", "BatchMode=yes", "-o", "ConnectTimeout=10")
+
+    def __init__(self, host: str, ssh_command: Sequence[str] = DEFAULT_SSH):
+        super().__init__(f"ssh:{host}")
+        self.host = host
+        self.ssh_command = list(ssh_command)
+
+    def wrap(self, command: str) -> Optional[List[str]]:
+        # ssh joins its arguments into one remote shell command line
+        return [*self.ssh_command, self.host, command]
+
+
+def parse_target(spec: str, ssh_command: Optional[Sequence[str]] = None) -> Transport:
+    """
+    Build a transport from a target spec.
+
+    ``docker:<container>`` and ``ssh:[user@]host`` select those transports;
+    anything else is a local directory.
+    """
+    kind, _, rest = spec.partition(":")
+    if kind == "docker" and rest:
+        return DockerTransport(rest)
+    if kind == "ssh" and rest:
+        if ssh_command is not None:
+            return SshTransport(rest, ssh_command)
+        return SshTransport(rest)
+    return LocalTransport(spec)
+
+
+def expand_targets(
+    specs: Sequence[str], ssh_command: Optional[Sequence[str]] = None
+) -> List[Transport]:
+    """
+    Build transports for target specs, expanding globs in local paths.
+
+    Local patterns (``~/src/*``) only match directories. Duplicate targets
+    are dropped, keeping the first occurrence.
+
+    Raises:
+        ValueError: If a local directory does not exist
+    """
+    transports: List[Transport] = []
+    seen = set()
+    for spec in specs:
+        transport = parse_target(spec, ssh_command)
+        candidates: List[Transport]
+        if isinstance(transport, LocalTransport):
+            pattern = os.path.expanduser(spec)
+            if glob.has_magic(pattern):
+                matches = sorted(path for path in glob.glob(pattern) if os.path.isdir(path))
+                candidates = [LocalTransport(path) for path in matches]
+            elif os.path.isdir(transport.cwd):
+                candidates = [transport]
+            else:
+                raise ValueError(f"Target directory not found: {spec}")
+        else:
+            candidates = [transport]
+        for candidate in candidates:
+            if candidate.name not in seen:
+                seen.add(candidate.name)
+                transports.append(candidate)
+    return transports
+
+
+def read_targets_file(path: str) -> List[str]:
+    """Target specs from a file, one per line; blank lines and # comments are skipped."""
+    with open(path, encoding="utf-8") as handle:
+        return [
+            line.strip()
+            for line in handle
+            if line.strip() and not line.strip().startswith("#")
+        ]
@@ -3,7 +3,68 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from enum import Enum
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from pilotcmd.os_utils.detector import OSInfo
+
+
+# JSON schemas for structured outputs. They follow the strict subset accepted by
+# OpenAI (every property required, optional values nullable, no extra keys),
+# which Ollama accepts as well.
+_COMMAND_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "step": {"type": ["integer", "null"]},
+        "command": {"type": "string"},
+        "explanation": {"type": "string"},
+        "revert": {"type": ["string", "null"]},
+        "safety_level": {"type": "string", "enum": ["safe", "caution", "dangerous"]},
+        "requires_sudo": {"type": "boolean"},
+        "independent": {"type": "boolean"},
+    },
+    "required": [
+        "step",
+        "command",
+        "explanation",
+        "revert",
+        "safety_level",
+        "requires_sudo",
+        "independent",
+    ],
+    "additionalProperties": False,
+}
+
+_PLAN_PROPERTIES: Dict[str, Any] = {
+    "commands": {"type": "array", "items": _COMMAND_SCHEMA},
+    "os_specific": {"type": "boolean"},
+    "warning": {"type": ["string", "null"]},
+}
+
+RESPONSE_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "command_plan": {
+        "type": "object",
+        "properties": _PLAN_PROPERTIES,
+        "required": list(_PLAN_PROPERTIES),
+        "additionalProperties": False,
+    },
+    "command_batch": {
+        "type": "object",
+        "properties": {
+            "results": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"id": {"type": "string"}, **_PLAN_PROPERTIES},
+                    "required": ["id", *_PLAN_PROPERTIES],
+                    "additionalProperties": False,
+                },
+            }
+        },
+        "required": ["results"],
+        "additionalProperties": False,
+    },
+}
 
 
 class ModelType(Enum):
@@ -29,6 +90,12 @@ class ModelResponse:
         if self.metadata is None:
             self.metadata = {}
 
+    @property
+    def truncated(self) -> bool:
+        """Whether generation stopped at the token limit (finish_reason or done_reason)."""
+        metadata = self.metadata or {}
+        return "length" in (metadata.get("finish_reason"), metadata.get("done_reason"))
+
 
 class BaseModel(ABC):
     """Abstract base class for AI models."""
@@ -53,6 +120,17 @@ class BaseModel(ABC):
         """Get the model type."""
         pass
 
+    @property
+    def supports_structured_outputs(self) -> bool:
+        """Whether the backend can constrain answers to a JSON schema."""
+        return bool(self.config.get("structured_outputs", False))
+
+    def get_response_schema(self, name: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Get a named response schema if structured outputs are supported."""
+        if not name or not self.supports_structured_outputs:
+            return None
+        return RESPONSE_SCHEMAS.get(name)
+
     def get_system_prompt(self) -> str:
         """Get the system prompt for command generation."""
         if self.config.get("thinking"):
@@ -68,6 +146,7 @@ RULES:
 7. Avoid commands that could damage the system
 8. If the request is unclear or potentially dangerous, ask for clarification
 9. Provide a command to revert each step when possible
+10. Set 'independent' to true only for steps that neither need nor are affected by the results or side effects of earlier steps
 
 Response format should be JSON with the following structure:
 {
@@ -78,7 +157,8 @@ Response format should be JSON with the following structure:
       \"explanation\": \"brief explanation of what this command does\",
       \"revert\": \"command to undo or revert if possible\",
       \"safety_level\": \"safe|caution|dangerous\",
-      \"requires_sudo\": true/false
+      \"requires_sudo\": true/false,
+      \"independent\": true/false
     }
   ],
   \"os_specific\": true/false,
@@ -104,6 +184,7 @@ RULES:
 6. Avoid commands that could damage the system
 7. If the request is unclear or potentially dangerous, ask for clarification
 8. Provide a command to revert each step when possible
+9. Set "independent" to true only for commands that neither need nor are affected by the results or side effects of earlier commands
 
 Response format should be JSON with the following structure:
 {
@@ -113,7 +194,8 @@ Response format should be JSON with the following structure:
       "explanation": "brief explanation of what this command does",
       "revert": "command to undo or revert if possible",
       "safety_level": "safe|caution|dangerous",
-      "requires_sudo": true/false
+      "requires_sudo": true/false,
+      "independent": true/false
     }
   ],
   "os_specific": true/false,
@@ -129,8 +211,28 @@ Examples of DANGEROUS patterns to avoid or warn about:
 
 If you detect a potentially dangerous operation, set safety_level to "dangerous" and include a warning."""
 
+    def get_batch_system_prompt(self) -> str:
+        """Get the system prompt for packed multi-request command generation."""
+        single_prompt = self.get_system_prompt()
+        return f"""{single_prompt}
+
+BATCH MODE:
+You will receive several USER REQUESTS at once, each prefixed with an id in square brackets.
+Handle every request independently and answer ALL of them in a single JSON object with this structure:
+{{
+  "results": [
+    {{
+      "id": "the request id, exactly as given",
+      "commands": [ ...command objects as described above... ],
+      "os_specific": true/false,
+      "warning": "optional warning message if needed"
+    }}
+  ]
+}}
+Return exactly one entry per request id and keep the ids unchanged."""
+
     def format_prompt_with_context(
-        self, user_prompt: str, os_info, command_mapping: Dict[str, Any]
+        self, user_prompt: str, os_info: "OSInfo", command_mapping: Dict[str, Any]
     ) -> str:
         """Format the user prompt with OS context and command mappings."""
         system_prompt = self.get_system_prompt()
@@ -149,6 +251,34 @@ AVAILABLE COMMAND MAPPINGS:
 USER REQUEST: {user_prompt}
 
 Generate appropriate commands for this system configuration.
+"""
+
+        return f"{system_prompt}\n\n{context}"
+
+    def format_batch_prompt_with_context(
+        self, user_prompts: Dict[str, str], os_info: "OSInfo", command_mapping: Dict[str, Any]
+    ) -> str:
+        """Format several user prompts, keyed by id, behind one shared context block."""
+        system_prompt = self.get_batch_system_prompt()
+        requests = "\n".join(
+            f"[{prompt_id}] {prompt}" for prompt_id, prompt in user_prompts.items()
+        )
+
+        context = f"""
+SYSTEM CONTEXT:
+- Operating System: {os_info.name} {os_info.version}
+- OS Type: {os_info.type.value}
+- Architecture: {os_info.architecture}
+- Shell: {os_info.shell}
+- Package Manager: {os_info.package_manager or 'None detected'}
+
+AVAILABLE COMMAND MAPPINGS:
+{self._format_command_mappings(command_mapping)}
+
+USER REQUESTS:
+{requests}
+
+Generate appropriate commands for each request on this system configuration.
 """
 
         return f"{system_prompt}\n\n{context}"
@@ -23,16 +23,19 @@ class OllamaModel(BaseModel):
         self.temperature = kwargs.get("temperature", 0.1)
         self.top_p = kwargs.get("top_p", 0.9)
         self.top_k = kwargs.get("top_k", 40)
+        # Set once the server rejects a schema in ``format`` (before 0.5)
+        self.schema_rejected = False
     
     async def generate_response(self, prompt: str, **kwargs) -> ModelResponse:
         """Generate a response using Ollama API."""
         try:
-            # Prepare the request
+            # Prepare the request; constrain to a JSON schema when available
+            schema = self.get_response_schema(kwargs.get("response_schema"))
             payload = {
                 "model": self.model_name,
                 "prompt": prompt,
                 "stream": False,
-                "format": "json",  # Request JSON format
+                "format": schema if schema is not None else "json",
                 "options": {
                     "temperature": kwargs.get("temperature", self.temperature),
                     "top_p": kwargs.get("top_p", self.top_p),
@@ -45,6 +48,14 @@ class OllamaModel(BaseModel):
                     f"{self.api_url}/generate",
                     json=payload
                 )
+                if response.status_code != 200 and schema is not None:
+                    # Older servers only accept "json"; retry and stop sending schemas
+                    payload["format"] = "json"
+                    response = await client.post(
+                        f"{self.api_url}/generate",
+                        json=payload
+                    )
+                    self.schema_rejected = response.status_code == 200
                 
                 if response.status_code != 200:
                     raise Exception(f"Ollama API error: {response.status_code} - {response.text}")
@@ -75,6 +86,7 @@ class OllamaModel(BaseModel):
             "model": response.get("model", self.model_name),
             "created_at": response.get("created_at"),
             "done": response.get("done", True),
+            "done_reason": response.get("done_reason"),
             "total_duration": response.get("total_duration"),
             "load_duration": response.get("load_duration"),
             "prompt_eval_duration": response.get("prompt_eval_duration"),
@@ -115,6 +127,13 @@ class OllamaModel(BaseModel):
     def model_type(self) -> ModelType:
         """Get the model type."""
         return ModelType.OLLAMA
+
+    @property
+    def supports_structured_outputs(self) -> bool:
+        """Ollama accepts JSON schemas in ``format`` (0.5+); opt out via config."""
+        if self.schema_rejected:
+            return False
+        return bool(self.config.get("structured_outputs", True))
     
     async def get_available_models(self) -> list[str]:
         """Get list of available Ollama models."""
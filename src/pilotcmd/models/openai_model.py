@@ -11,6 +11,9 @@ from openai import OpenAI
 
 from .base import BaseModel, ModelResponse, ModelType
 
+# Model families that accept strict json_schema response formats
+STRUCTURED_OUTPUT_MODELS = ("gpt-4o", "gpt-4.1", "gpt-5", "o1", "o3", "o4")
+
 
 class OpenAIModel(BaseModel):
     """OpenAI GPT model implementation."""
@@ -59,7 +62,7 @@ class OpenAIModel(BaseModel):
         messages = [
             {
                 "role": "system",
-                "content": self.get_system_prompt()
+                "content": kwargs.get("system_prompt") or self.get_system_prompt()
             },
             {
                 "role": "user",
@@ -71,6 +74,16 @@ class OpenAIModel(BaseModel):
         temperature = kwargs.get("temperature", self.temperature)
         max_tokens = kwargs.get("max_tokens", self.max_tokens)
         top_p = kwargs.get("top_p", self.top_p)
+
+        schema_name = kwargs.get("response_schema")
+        schema = self.get_response_schema(schema_name)
+        if schema is not None:
+            response_format = {
+                "type": "json_schema",
+                "json_schema": {"name": schema_name, "strict": True, "schema": schema},
+            }
+        else:
+            response_format = {"type": "json_object"}  # Force JSON response
         
         return self.client.chat.completions.create(
             model=self.model_name,
@@ -78,7 +91,7 @@ class OpenAIModel(BaseModel):
             temperature=temperature,
             max_tokens=max_tokens,
             top_p=top_p,
-            response_format={"type": "json_object"}  # Force JSON response
+            response_format=response_format
         )
     
     def _parse_response(self, response) -> ModelResponse:
@@ -118,6 +131,13 @@ class OpenAIModel(BaseModel):
     def model_type(self) -> ModelType:
         """Get the model type."""
         return ModelType.OPENAI
+
+    @property
+    def supports_structured_outputs(self) -> bool:
+        """Whether this OpenAI model accepts strict JSON schema outputs."""
+        if "structured_outputs" in self.config:
+            return bool(self.config["structured_outputs"])
+        return self.model_name.lower().startswith(STRUCTURED_OUTPUT_MODELS)
     
     def get_available_models(self) -> list[str]:
         """Get list of available OpenAI models."""
@@ -0,0 +1,279 @@
+"""
+Entity extraction for natural language prompts.
+
+A single pass over the prompt's tokens classifies each one with precompiled
+recognizers (IP addresses, networks, hostnames, ports, paths, globs, file
+names, package names and durations). The resulting typed entity list is
+reused both for filling command templates and for building canonical,
+entity-free cache keys, so the prompt is never re-scanned.
+"""
+
+import ipaddress
+import re
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class EntityKind(Enum):
+    """Kinds of entities recognized in prompts."""
+
+    IPV4 = "ipv4"
+    IPV6 = "ipv6"
+    CIDR = "cidr"
+    HOSTNAME = "hostname"
+    PORT = "port"
+    PATH = "path"
+    GLOB = "glob"
+    FILE = "file"
+    PACKAGE = "package"
+    DURATION = "duration"
+
+
+@dataclass(frozen=True)
+class Entity:
+    """A typed span of the prompt."""
+
+    kind: EntityKind
+    value: str
+    start: int
+    end: int
+
+
+_TOKEN_RE = re.compile(r"\S+")
+_STRIP_CHARS = "\"'`,;!?()"
+_HOSTNAME_RE = re.compile(
+    r"(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z][a-z0-9-]{1,62}", re.IGNORECASE
+)
+_PATH_RE = re.compile(
+    r"(?:[a-z]:\\|~|\.{1,2}(?=[/\\])|/)?[\w.@%+=,~/\\-]*[/\\][\w.@%+=,~/\\-]*",
+    re.IGNORECASE,
+)
+_GLOB_RE = re.compile(r"[\w.@%+=,~/\\-]*[*?][\w.@%+=,~/\\*?-]*")
+_DURATION_RE = re.compile(
+    r"(\d+(?:\.\d+)?)(ms|s|sec|secs|m|min|mins|h|hr|hrs|d)", re.IGNORECASE
+)
+_DURATION_UNITS = {
+    "ms", "millisecond", "milliseconds", "s", "sec", "secs", "second", "seconds",
+    "m", "min", "mins", "minute", "minutes", "h", "hr", "hrs", "hour", "hours",
+    "d", "day", "days",
+}
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+_PACKAGE_RE = re.compile(r"[a-z0-9][a-z0-9+._@-]*", re.IGNORECASE)
+_PACKAGE_VERBS = {"install", "uninstall", "remove", "upgrade", "update", "purge"}
+_PACKAGE_SKIP = {"the", "a", "an", "package", "packages", "latest", "new"}
+_PORT_WORDS = {"port", "ports"}
+_FILE_EXTENSIONS = {
+    "txt", "md", "rst", "log", "csv", "tsv", "json", "yaml", "yml", "toml", "ini",
+    "cfg", "conf", "xml", "html", "htm", "css", "js", "ts", "py", "rb", "go", "rs",
+    "java", "c", "h", "cpp", "hpp", "sh", "bash", "ps1", "bat", "cmd", "exe", "dll",
+    "so", "tar", "gz", "tgz", "bz2", "xz", "zip", "7z", "rar", "iso", "img", "deb",
+    "rpm", "pdf", "doc", "docx", "xls", "xlsx", "png", "jpg", "jpeg", "gif", "svg",
+    "mp3", "mp4", "db", "sqlite", "sql", "bak", "tmp", "pem", "key", "crt", "env",
+    "lock", "whl",
+}
+
+# Template placeholders and the entity kinds that can fill them, in preference order
+_PLACEHOLDER_KINDS: Dict[str, Tuple[EntityKind, ...]] = {
+    "file": (EntityKind.FILE, EntityKind.PATH, EntityKind.GLOB),
+    "path": (EntityKind.PATH, EntityKind.FILE),
+    "glob": (EntityKind.GLOB,),
+    "target": (EntityKind.IPV4, EntityKind.IPV6, EntityKind.HOSTNAME),
+    "host": (EntityKind.HOSTNAME, EntityKind.IPV4, EntityKind.IPV6),
+    "ip": (EntityKind.IPV4, EntityKind.IPV6),
+    "cidr": (EntityKind.CIDR,),
+    "network": (EntityKind.CIDR,),
+    "port": (EntityKind.PORT,),
+    "package": (EntityKind.PACKAGE,),
+    "duration": (EntityKind.DURATION,),
+}
+_PLACEHOLDER_DEFAULTS = {
+    "file": "*",
+    "path": ".",
+    "target": "google.com",
+    "host": "localhost",
+}
+_PLACEHOLDER_RE = re.compile(r"\{(\w+)\}")
+
+
+def _classify_address(token: str) -> Optional[EntityKind]:
+    """Classify IP addresses and networks."""
+    if "/" in token:
+        address, _, prefix = token.partition("/")
+        if prefix.isdigit():
+            try:
+                ipaddress.ip_address(address)
+                ipaddress.ip_network(token, strict=False)
+                return EntityKind.CIDR
+            except ValueError:
+                return None
+        return None
+    try:
+        parsed = ipaddress.ip_address(token)
+    except ValueError:
+        return None
+    return EntityKind.IPV4 if parsed.version == 4 else EntityKind.IPV6
+
+
+def _classify(token: str) -> Optional[EntityKind]:
+    """Classify a single stripped token without context."""
+    kind = _classify_address(token)
+    if kind:
+        return kind
+    if _GLOB_RE.fullmatch(token):
+        return EntityKind.GLOB
+    if _PATH_RE.fullmatch(token):
+        return EntityKind.PATH
+    if _DURATION_RE.fullmatch(token):
+        return EntityKind.DURATION
+    if _HOSTNAME_RE.fullmatch(token):
+        extension = token.rsplit(".", 1)[-1].lower()
+        return EntityKind.FILE if extension in _FILE_EXTENSIONS else EntityKind.HOSTNAME
+    if token.lower() == "localhost":
+        return EntityKind.HOSTNAME
+    return None
+
+
+def _strip(token: str, start: int) -> Tuple[str, int]:
+    """Strip surrounding quotes and punctuation, keeping the span in sync."""
+    stripped = token.lstrip(_STRIP_CHARS)
+    start += len(token) - len(stripped)
+    stripped = stripped.rstrip(_STRIP_CHARS + ".:")
+    return stripped, start
+
+
+def extract_entities(prompt: str) -> List[Entity]:
+    """
+    Extract typed entities from a prompt in a single pass.
+
+    Args:
+        prompt: The natural language prompt
+
+    Returns:
+        Entities in the order they appear in the prompt
+    """
+    tokens = [_strip(m.group(), m.start()) for m in _TOKEN_RE.finditer(prompt)]
+    entities: List[Entity] = []
+    expect_package = False
+    expect_port = False
+    skip_next = False
+
+    for index, (token, start) in enumerate(tokens):
+        if skip_next:
+            skip_next = False
+            continue
+        if not token:
+            continue
+        end = start + len(token)
+        lower = token.lower()
+
+        kind = _classify(token)
+        if kind:
+            entities.append(Entity(kind, token, start, end))
+            expect_package = expect_port = False
+            continue
+
+        # host:port and [ipv6]:port
+        host, sep, port = token.rpartition(":")
+        if sep and host and port.isdigit() and int(port) <= 65535:
+            host = host.strip("[]")
+            host_kind = _classify(host)
+            if host_kind in (EntityKind.IPV4, EntityKind.IPV6, EntityKind.HOSTNAME):
+                host_start = start + token.index(host)
+                entities.append(
+                    Entity(host_kind, host, host_start, host_start + len(host))
+                )
+                entities.append(Entity(EntityKind.PORT, port, end - len(port), end))
+                expect_package = expect_port = False
+                continue
+
+        if expect_port and token.isdigit() and int(token) <= 65535:
+            entities.append(Entity(EntityKind.PORT, token, start, end))
+            expect_port = False
+            continue
+
+        # "5 minutes", "30 s"
+        if _NUMBER_RE.fullmatch(token) and index + 1 < len(tokens):
+            unit, unit_start = tokens[index + 1]
+            if unit.lower() in _DURATION_UNITS:
+                unit_end = unit_start + len(unit)
+                entities.append(
+                    Entity(EntityKind.DURATION, prompt[start:unit_end], start, unit_end)
+                )
+                skip_next = True
+                expect_package = expect_port = False
+                continue
+
+        if expect_package:
+            if lower in _PACKAGE_SKIP:
+                continue
+            if _PACKAGE_RE.fullmatch(token):
+                entities.append(Entity(EntityKind.PACKAGE, token, start, end))
+                expect_package = False
+                continue
+
+        expect_package = lower in _PACKAGE_VERBS
+        expect_port = lower in _PORT_WORDS
+
+    return entities
+
+
+def first_entity(
+    entities: Iterable[Entity], kinds: Iterable[EntityKind]
+) -> Optional[Entity]:
+    """Return the first entity of the most preferred kind available."""
+    entities = list(entities)
+    for kind in kinds:
+        for entity in entities:
+            if entity.kind == kind:
+                return entity
+    return None
+
+
+def substitute_entities(template: str, entities: List[Entity]) -> Optional[str]:
+    """
+    Fill ``{placeholder}`` fields in a command template from entities.
+
+    Args:
+        template: Command template such as ``"ping -c 4 {target}"``
+        entities: Entities extracted from the prompt
+
+    Returns:
+        The filled command, or None if a placeholder has neither a matching
+        entity nor a default value
+    """
+    missing = False
+
+    def replace(match: "re.Match[str]") -> str:
+        nonlocal missing
+        name = match.group(1)
+        kinds = _PLACEHOLDER_KINDS.get(name)
+        if kinds is None:
+            return match.group(0)
+        entity = first_entity(entities, kinds)
+        if entity is not None:
+            return entity.value
+        if name in _PLACEHOLDER_DEFAULTS:
+            return _PLACEHOLDER_DEFAULTS[name]
+        missing = True
+        return match.group(0)
+
+    result = _PLACEHOLDER_RE.sub(replace, template)
+    return None if missing else result
+
+
+def canonicalize_prompt(prompt: str, entities: List[Entity]) -> str:
+    """
+    Build an entity-free form of the prompt for use as a cache key.
+
+    Entity spans are replaced by their kind, so "ping 10.0.0.1" and
+    "ping 10.0.0.2" share the key ``"ping <ipv4>"``.
+    """
+    parts = []
+    position = 0
+    for entity in sorted(entities, key=lambda e: e.start):
+        parts.append(prompt[position : entity.start])
+        parts.append(f"<{entity.kind.value}>")
+        position = entity.end
+    parts.append(prompt[position:])
+    return " ".join("".join(parts).lower().split())
@@ -4,14 +4,22 @@ Natural Language Parser for converting prompts to system commands.
 
 import asyncio
 import json
-from dataclasses import dataclass
+from collections import deque
+from dataclasses import dataclass, field
 from enum import Enum
+from functools import lru_cache
 from typing import Any, Dict, List, Optional
 
+from pydantic import TypeAdapter, ValidationError
+
 from pilotcmd.models.base import BaseModel
 from pilotcmd.os_utils.detector import OSInfo
 from pilotcmd.utils.token_counter import estimate_tokens
 
+# Rough completion budget one packed prompt needs in the model's answer
+PACKED_TOKENS_PER_PROMPT = 150
+PACKED_TOKENS_PER_PROMPT_THINKING = 400
+
 
 class SafetyLevel(Enum):
     """Command safety levels."""
@@ -32,6 +40,8 @@ class Command:
     safety_level: SafetyLevel = SafetyLevel.SAFE
     requires_sudo: bool = False
     category: Optional[str] = None
+    # Does not depend on the outcome or side effects of earlier steps
+    independent: bool = False
 
     def __post_init__(self):
         # Convert string safety level to enum if needed
@@ -51,6 +61,45 @@ class ParseResult:
     raw_response: Optional[str] = None
 
 
+@dataclass
+class _PlanPayload:
+    """Decoded shape of a single-prompt model answer."""
+
+    commands: List[Command] = field(default_factory=list)
+    os_specific: bool = False
+    warning: Optional[str] = None
+
+
+@dataclass
+class _PackedPlanPayload(_PlanPayload):
+    """One answer inside a packed multi-prompt response."""
+
+    id: str = ""
+
+
+@dataclass
+class _BatchPayload:
+    """Decoded shape of a packed multi-prompt model answer."""
+
+    results: List[_PackedPlanPayload] = field(default_factory=list)
+
+
+@lru_cache(maxsize=None)
+def _payload_adapter(payload_type: type) -> TypeAdapter:
+    """Build (once) the validator decoding raw JSON into payload dataclasses."""
+    return TypeAdapter(payload_type)
+
+
+def _strip_code_fence(content: str) -> str:
+    """Remove a Markdown ```json fence around a model answer."""
+    content = content.strip()
+    if content.startswith("```json"):
+        content = content[7:]
+    if content.endswith("```"):
+        content = content[:-3]
+    return content
+
+
 class NLPParser:
     """Natural Language Parser that converts prompts to system commands."""
 
@@ -94,7 +143,9 @@ class NLPParser:
             )
 
             # Generate response from AI model
-            response = await self.model.generate_response(formatted_prompt)
+            response = await self.model.generate_response(
+                formatted_prompt, response_schema="command_plan"
+            )
 
             # Estimate token usage
             prompt_tokens = estimate_tokens(formatted_prompt)
@@ -120,33 +171,192 @@ class NLPParser:
 
             fallback_parser = SimpleParser(self.os_info)
             self.last_usage = None
-            return fallback_parser.parse(prompt)
+            return await fallback_parser.parse(prompt)
+
+    async def parse_batch(
+        self, prompts: List[str], max_batch_size: int = 20
+    ) -> List[List[Command]]:
+        """
+        Parse many prompts by packing them into shared model requests.
+
+        All prompts in a pack share one system prompt and command-mapping
+        block. Packs are sized so the expected answer fits in the model's
+        ``max_tokens``; packs whose answer is truncated or incomplete are
+        split and retried, down to single prompts which use :meth:`parse`.
+
+        Args:
+            prompts: Natural language prompts to translate
+            max_batch_size: Maximum number of prompts per model request
+
+        Returns:
+            One list of Command objects per prompt, in input order
+        """
+        from pilotcmd.os_utils.detector import OSDetector
+
+        results: List[List[Command]] = [[] for _ in prompts]
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        command_mapping = OSDetector().get_command_mapping()
+
+        pack_size = max(1, min(max_batch_size, self._max_prompts_per_pack()))
+        indexes = list(range(len(prompts)))
+        pending = deque(
+            indexes[i : i + pack_size] for i in range(0, len(indexes), pack_size)
+        )
+
+        while pending:
+            pack = pending.popleft()
+
+            if len(pack) == 1:
+                index = pack[0]
+                results[index] = await self.parse(prompts[index])
+                self._add_usage(usage, self.last_usage)
+                continue
+
+            ids = {f"p{index}": index for index in pack}
+            formatted_prompt = self.model.format_batch_prompt_with_context(
+                {prompt_id: prompts[index] for prompt_id, index in ids.items()},
+                self.os_info,
+                command_mapping,
+            )
+
+            try:
+                response = await self.model.generate_response(
+                    formatted_prompt,
+                    system_prompt=self.model.get_batch_system_prompt(),
+                    response_schema="command_batch",
+                )
+            except Exception:
+                middle = len(pack) // 2
+                pending.appendleft(pack[middle:])
+                pending.appendleft(pack[:middle])
+                continue
+
+            prompt_tokens = estimate_tokens(formatted_prompt)
+            completion_tokens = estimate_tokens(response.content)
+            self._add_usage(
+                usage,
+                {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            )
+
+            if response.truncated:
+                # Even an answer that parses may have lost commands at the cut
+                middle = len(pack) // 2
+                pending.appendleft(pack[middle:])
+                pending.appendleft(pack[:middle])
+                continue
+
+            answered = self._demux_batch_response(response.content)
+            missing = []
+            for prompt_id, index in ids.items():
+                if prompt_id not in answered:
+                    missing.append(index)
+                    continue
+                for command in answered[prompt_id]:
+                    self._apply_safety_checks(command)
+                results[index] = answered[prompt_id]
+
+            if len(missing) == len(pack):
+                # Nothing usable came back: halve it
+                middle = len(pack) // 2
+                pending.appendleft(pack[middle:])
+                pending.appendleft(pack[:middle])
+            elif missing:
+                pending.appendleft(missing)
+
+        self.last_usage = usage if usage["total_tokens"] else None
+        return results
+
+    def _max_prompts_per_pack(self) -> int:
+        """Estimate how many prompts fit in one packed answer."""
+        max_tokens = getattr(self.model, "max_tokens", None) or self.model.config.get(
+            "max_tokens", 1000
+        )
+        per_prompt = (
+            PACKED_TOKENS_PER_PROMPT_THINKING
+            if self.model.config.get("thinking")
+            else PACKED_TOKENS_PER_PROMPT
+        )
+        return max(1, int(max_tokens) // per_prompt)
+
+    @staticmethod
+    def _add_usage(total: Dict[str, int], usage: Optional[Dict[str, int]]) -> None:
+        """Accumulate token usage counters."""
+        if not usage:
+            return
+        for key in total:
+            total[key] += usage.get(key, 0)
+
+    def _demux_batch_response(self, response_content: str) -> Dict[str, List[Command]]:
+        """Split a packed JSON answer back into per-id command lists."""
+        response_content = _strip_code_fence(response_content)
+
+        # Fast path: validate straight into Command objects
+        try:
+            payload = _payload_adapter(_BatchPayload).validate_json(response_content)
+            return {item.id: item.commands for item in payload.results if item.id}
+        except ValidationError:
+            pass
+
+        try:
+            data = json.loads(response_content)
+        except json.JSONDecodeError:
+            return {}
+
+        answered: Dict[str, List[Command]] = {}
+        for item in data.get("results", []) if isinstance(data, dict) else []:
+            if not isinstance(item, dict) or "id" not in item:
+                continue
+            try:
+                answered[str(item["id"])] = self._commands_from_data(
+                    item.get("commands", [])
+                )
+            except (TypeError, ValueError, AttributeError):
+                continue
+        return answered
+
+    def _commands_from_data(self, items: List[Dict[str, Any]]) -> List[Command]:
+        """Build Command objects from decoded JSON command entries."""
+        commands = []
+        for cmd_data in items:
+            command = Command(
+                command=cmd_data.get("command", ""),
+                explanation=cmd_data.get("explanation", ""),
+                revert=cmd_data.get("revert"),
+                step=cmd_data.get("step"),
+                safety_level=cmd_data.get("safety_level", "safe"),
+                requires_sudo=cmd_data.get("requires_sudo", False),
+                category=cmd_data.get("category"),
+                independent=cmd_data.get("independent", False),
+            )
+            commands.append(command)
+        return commands
 
     def _parse_model_response(self, response_content: str) -> ParseResult:
         """Parse the JSON response from the AI model."""
+        response_content = _strip_code_fence(response_content)
+
+        # Fast path: validate straight into Command objects
         try:
-            # Clean and parse JSON response
-            response_content = response_content.strip()
-            if response_content.startswith("```json"):
-                response_content = response_content[7:]
-            if response_content.endswith("```"):
-                response_content = response_content[:-3]
+            payload = _payload_adapter(_PlanPayload).validate_json(response_content)
+            return ParseResult(
+                commands=payload.commands,
+                os_specific=payload.os_specific,
+                warning=payload.warning,
+                raw_response=response_content,
+            )
+        except ValidationError:
+            pass
 
+        # Lenient path for answers that do not follow the schema exactly
+        try:
             data = json.loads(response_content)
 
             # Extract commands
-            commands = []
-            for cmd_data in data.get("commands", []):
-                command = Command(
-                    command=cmd_data.get("command", ""),
-                    explanation=cmd_data.get("explanation", ""),
-                    revert=cmd_data.get("revert"),
-                    step=cmd_data.get("step"),
-                    safety_level=cmd_data.get("safety_level", "safe"),
-                    requires_sudo=cmd_data.get("requires_sudo", False),
-                    category=cmd_data.get("category"),
-                )
-                commands.append(command)
+            commands = self._commands_from_data(data.get("commands", []))
 
             return ParseResult(
                 commands=commands,
@@ -0,0 +1,289 @@
+"""
+Precompiled, memory-mapped pattern packs for the simple parser.
+
+A pattern pack holds the same pattern dictionaries used by ``SimpleParser``
+(keywords, per-OS commands, reverts...) compiled offline into a compact binary
+index. At runtime the file is memory-mapped and only the records that match a
+prompt are ever decoded, so packs with thousands of intents add no startup
+parsing or allocation cost.
+
+File layout (little endian)::
+
+    header      magic, version, max n-gram size, key count, pattern count, os tag
+    key table   sorted (key offset, key length, postings offset, postings count)
+    pattern table  (record offset, record length) per pattern id
+    data        key bytes, uint32 postings (ascending ids), JSON records
+
+Keywords are matched on whole words: a prompt matches a keyword when the
+keyword's words appear consecutively in the prompt.
+"""
+
+import json
+import mmap
+import re
+import struct
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import yaml  # type: ignore
+except ModuleNotFoundError:  # pragma: no cover - optional dependency
+    yaml = None  # type: ignore
+
+from pilotcmd.os_utils.detector import OSInfo
+
+PACK_MAGIC = b"PCPK"
+PACK_VERSION = 1
+PACK_SUFFIX = ".pcpk"
+
+_HEADER = struct.Struct("<4sHHII8s")
+_KEY_ENTRY = struct.Struct("<IHII")
+_PATTERN_ENTRY = struct.Struct("<II")
+_POSTING = struct.Struct("<I")
+
+_WORD_RE = re.compile(r"[a-z0-9_.\-/]+")
+_COMMAND_FIELDS = ("windows", "unix", "linux", "macos")
+
+
+def _words(text: str) -> List[str]:
+    """Split text into lowercase words for keyword matching."""
+    return _WORD_RE.findall(text.lower())
+
+
+def default_packs_dir() -> Path:
+    """Directory scanned for installed pattern packs."""
+    return Path.home() / ".pilotcmd" / "patterns"
+
+
+class PatternPack:
+    """Read-only view over a compiled, memory-mapped pattern pack."""
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        with open(self.path, "rb") as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._buffer) < _HEADER.size:
+            self._buffer.close()
+            raise ValueError(f"Not a pattern pack: {self.path}")
+        magic, version, max_ngram, n_keys, n_patterns, os_tag = _HEADER.unpack_from(
+            self._buffer, 0
+        )
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            self._buffer.close()
+            raise ValueError(f"Unsupported pattern pack: {self.path}")
+
+        self.max_ngram: int = max_ngram
+        self.key_count: int = n_keys
+        self.pattern_count: int = n_patterns
+        self.os_name = os_tag.rstrip(b"\0").decode("ascii") or "any"
+
+        self._keys_offset = _HEADER.size
+        self._patterns_offset = self._keys_offset + n_keys * _KEY_ENTRY.size
+        self._data_offset = self._patterns_offset + n_patterns * _PATTERN_ENTRY.size
+
+    def __len__(self) -> int:
+        return self.pattern_count
+
+    def supports(self, os_info: OSInfo) -> bool:
+        """Check whether this pack targets the given operating system."""
+        if self.os_name == "any":
+            return True
+        if self.os_name == "unix":
+            return not os_info.is_windows()
+        return self.os_name == os_info.type.value
+
+    def close(self) -> None:
+        """Release the memory map."""
+        self._buffer.close()
+
+    def _key_at(self, index: int) -> bytes:
+        key_off, key_len, _, _ = _KEY_ENTRY.unpack_from(
+            self._buffer, self._keys_offset + index * _KEY_ENTRY.size
+        )
+        start = self._data_offset + key_off
+        return self._buffer[start : start + key_len]
+
+    def _postings(self, key: bytes) -> List[int]:
+        """Binary search the key table and return the pattern ids for a key."""
+        low, high = 0, self.key_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self.key_count or self._key_at(low) != key:
+            return []
+
+        _, _, postings_off, count = _KEY_ENTRY.unpack_from(
+            self._buffer, self._keys_offset + low * _KEY_ENTRY.size
+        )
+        start = self._data_offset + postings_off
+        return [
+            _POSTING.unpack_from(self._buffer, start + i * _POSTING.size)[0]
+            for i in range(count)
+        ]
+
+    def candidates(self, prompt: str) -> List[int]:
+        """
+        Find the ids of patterns whose keywords occur in the prompt.
+
+        Args:
+            prompt: The natural language prompt
+
+        Returns:
+            Matching pattern ids in priority (source) order
+        """
+        words = _words(prompt)
+        matched = set()
+        for size in range(1, self.max_ngram + 1):
+            for start in range(len(words) - size + 1):
+                key = " ".join(words[start : start + size]).encode("utf-8")
+                matched.update(self._postings(key))
+        return sorted(matched)
+
+    def get_pattern(self, pattern_id: int) -> Dict[str, Any]:
+        """Decode a single pattern record."""
+        rec_off, rec_len = _PATTERN_ENTRY.unpack_from(
+            self._buffer, self._patterns_offset + pattern_id * _PATTERN_ENTRY.size
+        )
+        start = self._data_offset + rec_off
+        pattern: Dict[str, Any] = json.loads(self._buffer[start : start + rec_len])
+        return pattern
+
+
+def load_pattern_source(path: Path) -> Dict[str, Any]:
+    """
+    Load a pattern source file.
+
+    Sources are JSON or YAML documents holding either a list of patterns or a
+    mapping with a ``patterns`` list and an optional ``os`` target.
+    """
+    text = Path(path).read_text(encoding="utf-8")
+    if Path(path).suffix.lower() in (".yaml", ".yml"):
+        if yaml is None:
+            raise ValueError("PyYAML is required to compile YAML pattern sources")
+        data = yaml.safe_load(text)
+    else:
+        data = json.loads(text)
+
+    if isinstance(data, list):
+        data = {"patterns": data}
+    if not isinstance(data, dict) or not isinstance(data.get("patterns"), list):
+        raise ValueError(f"{path}: expected a list of patterns")
+    return data
+
+
+def _validate_pattern(pattern: Any, source: str, index: int) -> Dict[str, Any]:
+    if not isinstance(pattern, dict):
+        raise ValueError(f"{source}: pattern #{index} is not a mapping")
+    keywords = pattern.get("keywords")
+    if not isinstance(keywords, list) or not keywords:
+        raise ValueError(f"{source}: pattern #{index} needs a non-empty keywords list")
+    if not any(pattern.get(field) for field in _COMMAND_FIELDS):
+        raise ValueError(
+            f"{source}: pattern #{index} needs at least one of {', '.join(_COMMAND_FIELDS)}"
+        )
+    return pattern
+
+
+def compile_pack(
+    sources: Iterable[Path], output: Path, os_name: Optional[str] = None
+) -> int:
+    """
+    Compile pattern sources into a binary pattern pack.
+
+    Args:
+        sources: JSON or YAML pattern source files, in priority order
+        output: Path of the pack file to write
+        os_name: Target OS (windows, linux, macos, unix or any); defaults to the
+            ``os`` declared by the first source, or ``any``
+
+    Returns:
+        Number of patterns written
+    """
+    patterns: List[Dict[str, Any]] = []
+    for source in sources:
+        data = load_pattern_source(source)
+        os_name = os_name or data.get("os")
+        for index, pattern in enumerate(data["patterns"], 1):
+            patterns.append(_validate_pattern(pattern, str(source), index))
+
+    os_name = (os_name or "any").lower()
+    if os_name not in ("any", "unix", "windows", "linux", "macos"):
+        raise ValueError(f"Unknown pack OS: {os_name}")
+
+    postings: Dict[bytes, List[int]] = {}
+    max_ngram = 1
+    for pattern_id, pattern in enumerate(patterns):
+        for keyword in pattern["keywords"]:
+            words = _words(str(keyword))
+            if not words:
+                continue
+            max_ngram = max(max_ngram, len(words))
+            ids = postings.setdefault(" ".join(words).encode("utf-8"), [])
+            if not ids or ids[-1] != pattern_id:
+                ids.append(pattern_id)
+
+    keys = sorted(postings)
+    payload = bytearray()
+    key_table = bytearray()
+    for key in keys:
+        key_off = len(payload)
+        payload += key
+        postings_off = len(payload)
+        for pattern_id in postings[key]:
+            payload += _POSTING.pack(pattern_id)
+        key_table += _KEY_ENTRY.pack(key_off, len(key), postings_off, len(postings[key]))
+
+    pattern_table = bytearray()
+    for pattern in patterns:
+        record = json.dumps(pattern, separators=(",", ":")).encode("utf-8")
+        pattern_table += _PATTERN_ENTRY.pack(len(payload), len(record))
+        payload += record
+
+    header = _HEADER.pack(
+        PACK_MAGIC,
+        PACK_VERSION,
+        max_ngram,
+        len(keys),
+        len(patterns),
+        os_name.encode("ascii"),
+    )
+
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp_output = output.with_suffix(output.suffix + ".tmp")
+    with open(tmp_output, "wb") as f:
+        f.write(header)
+        f.write(key_table)
+        f.write(pattern_table)
+        f.write(payload)
+    tmp_output.replace(output)
+    return len(patterns)
+
+
+_loaded_packs: Dict[str, List[PatternPack]] = {}
+
+
+def load_installed_packs(
+    os_info: OSInfo, packs_dir: Optional[Path] = None
+) -> List[PatternPack]:
+    """
+    Memory-map the installed pattern packs that target this OS.
+
+    Packs are mapped once per process and shared between parser instances.
+    """
+    directory = Path(packs_dir) if packs_dir else default_packs_dir()
+    cache_key = str(directory)
+    if cache_key not in _loaded_packs:
+        packs = []
+        if directory.is_dir():
+            for path in sorted(directory.glob(f"*{PACK_SUFFIX}")):
+                try:
+                    packs.append(PatternPack(str(path)))
+                except (OSError, ValueError, struct.error):
+                    continue
+        _loaded_packs[cache_key] = packs
+    return [pack for pack in _loaded_packs[cache_key] if pack.supports(os_info)]
@@ -2,11 +2,23 @@
 Simple fallback parser for when AI models are not available.
 """
 
-from typing import List, Dict, Any
-import re
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
 
+from pilotcmd.nlp.entities import (
+    Entity,
+    canonicalize_prompt,
+    extract_entities,
+    substitute_entities,
+)
+from pilotcmd.nlp.pattern_pack import PatternPack, load_installed_packs
 from pilotcmd.os_utils.detector import OSInfo
 
+NO_REVERT_AVAILABLE = "No revert available"
+
+# Canonical prompts whose matching pattern is remembered per parser
+MATCH_CACHE_SIZE = 256
+
 
 class SafetyLevel:
     """Simple safety level constants."""
@@ -37,32 +49,71 @@ class Command:
 class SimpleParser:
     """Simple pattern-based parser as fallback when AI models fail."""
 
-    def __init__(self, os_info: OSInfo):
+    def __init__(self, os_info: OSInfo, pattern_packs: Optional[List[PatternPack]] = None):
         self.os_info = os_info
         self.patterns = self._get_patterns()
+        self.pattern_packs = (
+            pattern_packs if pattern_packs is not None else load_installed_packs(os_info)
+        )
+        # Canonical prompt -> pattern that produced its command (None: no match)
+        self._matches: "OrderedDict[str, Optional[Dict[str, Any]]]" = OrderedDict()
 
     async def parse(self, prompt: str) -> List[Command]:
         """Parse prompt using simple pattern matching."""
+        entities = extract_entities(prompt)
+        # Prompts that differ only in entity values ("ping 10.0.0.1" and
+        # "ping 10.0.0.2") match the same pattern
+        key = canonicalize_prompt(prompt, entities)
+        if key in self._matches:
+            self._matches.move_to_end(key)
+            pattern_info = self._matches[key]
+            cmd = self._generate_command(prompt, pattern_info, entities) if pattern_info else None
+        else:
+            pattern_info, cmd = self._find_pattern(prompt, entities)
+            # A keyword found only inside an entity ("time.example.org")
+            # says nothing about other prompts with the same canonical form
+            if pattern_info is None or self._matches_pattern(key, pattern_info):
+                self._matches[key] = pattern_info
+                if len(self._matches) > MATCH_CACHE_SIZE:
+                    self._matches.popitem(last=False)
+
+        # If no pattern matches, return empty list
+        return [cmd] if cmd else []
+
+    def _find_pattern(
+        self, prompt: str, entities: List[Entity]
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Command]]:
+        """First pattern that yields a command for the prompt, with that command."""
         prompt_lower = prompt.lower().strip()
-        commands = []
+
+        # Installed packs are more specific than the built-in patterns
+        for pack in self.pattern_packs:
+            for pattern_id in pack.candidates(prompt_lower):
+                pattern_info = pack.get_pattern(pattern_id)
+                cmd = self._generate_command(prompt, pattern_info, entities)
+                if cmd:
+                    return pattern_info, cmd
 
         # Try each pattern
         for pattern_info in self.patterns:
             if self._matches_pattern(prompt_lower, pattern_info):
-                cmd = self._generate_command(prompt, pattern_info)
+                cmd = self._generate_command(prompt, pattern_info, entities)
                 if cmd:
-                    commands.append(cmd)
-                    break
+                    return pattern_info, cmd
 
-        # If no pattern matches, return empty list
-        return commands
+        return None, None
 
     def _matches_pattern(self, prompt: str, pattern_info: Dict[str, Any]) -> bool:
         """Check if prompt matches a pattern."""
         keywords = pattern_info.get("keywords", [])
         return any(keyword in prompt for keyword in keywords)
 
-    def _generate_command(self, prompt: str, pattern_info: Dict[str, Any]) -> Command:
+    def _generate_command(
+        self,
+        prompt: str,
+        pattern_info: Dict[str, Any],
+        entities: Optional[List[Entity]] = None,
+    ) -> Optional[Command]:
         """Generate command from pattern."""
         if self.os_info.is_windows():
             cmd = pattern_info.get("windows", "")
@@ -83,11 +134,15 @@ class SimpleParser:
         if not cmd:
             return None
 
-        # Simple parameter extraction
-        cmd = self._extract_parameters(prompt, cmd)
+        if entities is None:
+            entities = extract_entities(prompt)
+
+        cmd = self._extract_parameters(prompt, cmd, entities)
+        if cmd is None:
+            return None
         if revert_cmd:
-            revert_cmd = self._extract_parameters(prompt, revert_cmd)
-        else:
+            revert_cmd = self._extract_parameters(prompt, revert_cmd, entities)
+        if not revert_cmd:
             revert_cmd = NO_REVERT_AVAILABLE
 
         return Command(
@@ -98,122 +153,122 @@ class SimpleParser:
             revert=revert_cmd,
         )
 
-    def _extract_parameters(self, prompt: str, cmd_template: str) -> str:
-        """Extract parameters from prompt and substitute in command template."""
-        # Simple parameter extraction
-        if "{file}" in cmd_template:
-            # Try to find file names in prompt
-            words = prompt.split()
-            for word in words:
-                if "." in word and not word.startswith("."):
-                    cmd_template = cmd_template.replace("{file}", word)
-                    break
-            else:
-                cmd_template = cmd_template.replace("{file}", "*")
-
-        if "{target}" in cmd_template:
-            # Try to find IP addresses or hostnames
-            words = prompt.split()
-            for word in words:
-                if "." in word and not word.startswith("."):
-                    cmd_template = cmd_template.replace("{target}", word)
-                    break
-            else:
-                cmd_template = cmd_template.replace("{target}", "google.com")
-
-        return cmd_template
+    def _extract_parameters(
+        self,
+        prompt: str,
+        cmd_template: str,
+        entities: Optional[List[Entity]] = None,
+    ) -> Optional[str]:
+        """
+        Substitute prompt entities into a command template.
+
+        Placeholders are filled by entity kind: ``{file}`` takes file names,
+        paths or globs, ``{target}`` takes IP addresses or hostnames, and
+        ``{port}``, ``{cidr}``, ``{package}``, ``{duration}`` their own kinds.
+
+        Returns:
+            The command, or None if a required placeholder has no value
+        """
+        if entities is None:
+            entities = extract_entities(prompt)
+        return substitute_entities(cmd_template, entities)
 
     def _get_patterns(self) -> List[Dict[str, Any]]:
         """Get list of command patterns."""
-        return [
-            {
-                "keywords": ["time", "current time", "show time", "what time"],
-                "explanation": "Show current time",
-                "windows": "time /t",
-                "unix": "date",
-                "safety": "safe",
-                "revert": "No revert needed",
-            },
-            {
-                "keywords": ["list", "show", "files", "directory", "folder"],
-                "explanation": "List directory contents",
-                "windows": "dir",
-                "unix": "ls -la",
-                "safety": "safe",
-                "revert": "No revert needed",
-            },
-            {
-                "keywords": ["current", "directory", "where am i", "pwd"],
-                "explanation": "Show current directory",
-                "windows": "cd",
-                "unix": "pwd",
-                "safety": "safe",
-                "revert": "No revert needed",
-            },
-            {
-                "keywords": ["ping"],
-                "explanation": "Ping a host",
-                "windows": "ping {target}",
-                "unix": "ping -c 4 {target}",
-                "safety": "safe",
-                "revert": "No revert needed",
-            },
-            {
-                "keywords": ["python", "files", "find"],
-                "explanation": "Find Python files",
-                "windows": "dir *.py /s",
-                "unix": 'find . -name "*.py"',
-                "safety": "safe",
-                "revert": "No revert needed",
-            },
-            {
-                "keywords": ["disk", "space", "usage", "free"],
-                "explanation": "Show disk usage",
-                "windows": "dir /-c",
-                "unix": "df -h",
-                "safety": "safe",
-                "revert": "No revert needed",
-            },
-            {
-                "keywords": ["process", "running", "task"],
-                "explanation": "List running processes",
-                "windows": "tasklist",
-                "unix": "ps aux",
-                "safety": "safe",
-                "revert": "No revert needed",
-            },
-            {
-                "keywords": ["ip", "address", "network"],
-                "explanation": "Show IP configuration",
-                "windows": "ipconfig",
-                "unix": "ip addr show",
-                "safety": "safe",
-                "revert": "No revert needed",
-            },
-            {
-                "keywords": ["system", "info", "information"],
-                "explanation": "Show system information",
-                "windows": "systeminfo",
-                "unix": "uname -a",
-                "safety": "safe",
-                "revert": "No revert needed",
-            },
-            {
-                "keywords": ["create", "mkdir", "folder", "directory"],
-                "explanation": "Create directory",
-                "windows": "mkdir test_folder",
-                "unix": "mkdir test_folder",
-                "safety": "safe",
-                "revert_windows": "rmdir test_folder",
-                "revert_unix": "rm -r test_folder",
-            },
-            {
-                "keywords": ["copy", "cp"],
-                "explanation": "Copy files",
-                "windows": "copy {file} backup_{file}",
-                "unix": "cp {file} backup_{file}",
-                "safety": "caution",
-                "revert_windows": "del backup_{file}",
-                "revert_unix": "rm backup_{file}",
-            },
-        ]
+        return _BUILTIN_PATTERNS
+
+
+# Built-in patterns shared by every parser instance; larger vocabularies are
+# shipped as compiled pattern packs (see pilotcmd.nlp.pattern_pack).
+_BUILTIN_PATTERNS: List[Dict[str, Any]] = [
+    {
+        "keywords": ["time", "current time", "show time", "what time"],
+        "explanation": "Show current time",
+        "windows": "time /t",
+        "unix": "date",
+        "safety": "safe",
+        "revert": "No revert needed",
+    },
+    {
+        "keywords": ["list", "show", "files", "directory", "folder"],
+        "explanation": "List directory contents",
+        "windows": "dir",
+        "unix": "ls -la",
+        "safety": "safe",
+        "revert": "No revert needed",
+    },
+    {
+        "keywords": ["current", "directory", "where am i", "pwd"],
+        "explanation": "Show current directory",
+        "windows": "cd",
+        "unix": "pwd",
+        "safety": "safe",
+        "revert": "No revert needed",
+    },
+    {
+        "keywords": ["ping"],
+        "explanation": "Ping a host",
+        "windows": "ping {target}",
+        "unix": "ping -c 4 {target}",
+        "safety": "safe",
+        "revert": "No revert needed",
+    },
+    {
+        "keywords": ["python", "files", "find"],
+        "explanation": "Find Python files",
+        "windows": "dir *.py /s",
+        "unix": 'find . -name "*.py"',
+        "safety": "safe",
+        "revert": "No revert needed",
+    },
+    {
+        "keywords": ["disk", "space", "usage", "free"],
+        "explanation": "Show disk usage",
+        "windows": "dir /-c",
+        "unix": "df -h",
+        "safety": "safe",
+        "revert": "No revert needed",
+    },
+    {
+        "keywords": ["process", "running", "task"],
+        "explanation": "List running processes",
+        "windows": "tasklist",
+        "unix": "ps aux",
+        "safety": "safe",
+        "revert": "No revert needed",
+    },
+    {
+        "keywords": ["ip", "address", "network"],
+        "explanation": "Show IP configuration",
+        "windows": "ipconfig",
+        "unix": "ip addr show",
+        "safety": "safe",
+        "revert": "No revert needed",
+    },
+    {
+        "keywords": ["system", "info", "information"],
+        "explanation": "Show system information",
+        "windows": "systeminfo",
+        "unix": "uname -a",
+        "safety": "safe",
+        "revert": "No revert needed",
+    },
+    {
+        "keywords": ["create", "mkdir", "folder", "directory"],
+        "explanation": "Create directory",
+        "windows": "mkdir test_folder",
+        "unix": "mkdir test_folder",
+        "safety": "safe",
+        "revert_windows": "rmdir test_folder",
+        "revert_unix": "rm -r test_folder",
+    },
+    {
+        "keywords": ["copy", "cp"],
+        "explanation": "Copy files",
+        "windows": "copy {file} backup_{file}",
+        "unix": "cp {file} backup_{file}",
+        "safety": "caution",
+        "revert_windows": "del backup_{file}",
+        "revert_unix": "rm backup_{file}",
+    },
+]
@@ -0,0 +1,79 @@
+"""
+Normalized command signatures.
+
+A signature groups command lines that behave alike for timing purposes:
+``sudo apt-get install -y nginx`` and ``apt-get install curl`` both become
+``apt-get install``, while ``ping -c 4 google.com`` becomes ``ping``.
+"""
+
+import re
+import shlex
+from typing import List
+
+# Programs whose first positional argument selects what they do
+SUBCOMMAND_PROGRAMS = {
+    "apt", "apt-get", "brew", "cargo", "choco", "conda", "dnf", "docker",
+    "docker-compose", "gem", "git", "go", "helm", "kubectl", "npm", "pacman",
+    "pip", "pip3", "pnpm", "podman", "poetry", "scoop", "snap", "systemctl",
+    "terraform", "winget", "yarn", "yum", "zypper",
+}
+
+# Global options taking a value that may precede the subcommand
+_GLOBAL_VALUE_OPTIONS = {
+    "git": {"-C", "-c"},
+    "docker": {"-H", "-c", "-l", "--host", "--context", "--config", "--log-level"},
+    "kubectl": {"-n", "--namespace", "--context", "--kubeconfig"},
+    "helm": {"-n", "--namespace", "--kube-context"},
+    "systemctl": {"-H", "-M", "--host", "--machine"},
+}
+
+_PREFIXES = {"sudo", "doas", "nice", "nohup", "time", "env", "command", "exec"}
+# Options of those prefixes that take a value (sudo -u user, nice -n 10)
+_PREFIX_VALUE_OPTIONS = {"-u", "-g", "-n", "-C"}
+_ASSIGNMENT_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*=")
+_SUBCOMMAND_RE = re.compile(r"^[a-z][a-z0-9-]*$")
+_SEPARATOR_RE = re.compile(r"\|\||&&|[;|]")
+
+
+def _tokens(command: str) -> List[str]:
+    # Only the first command of a pipeline or list is considered
+    first = _SEPARATOR_RE.split(command, maxsplit=1)[0]
+    try:
+        return shlex.split(first)
+    except ValueError:
+        return first.split()
+
+
+def command_signature(command: str) -> str:
+    """
+    Normalize a command line to its program (and subcommand, if any).
+
+    Args:
+        command: The command line
+
+    Returns:
+        The signature, or an empty string if the command has no program
+    """
+    tokens = _tokens(command.strip())
+    index = 0
+    while index < len(tokens) and (
+        tokens[index] in _PREFIXES or _ASSIGNMENT_RE.match(tokens[index])
+    ):
+        index += 1
+        while index < len(tokens) and tokens[index].startswith("-"):
+            index += 2 if tokens[index] in _PREFIX_VALUE_OPTIONS else 1
+    tokens = tokens[index:]
+    if not tokens:
+        return ""
+
+    program = re.split(r"[/\\]", tokens[0])[-1].lower()
+    if program.endswith(".exe"):
+        program = program[:-4]
+    if program in SUBCOMMAND_PROGRAMS:
+        value_options = _GLOBAL_VALUE_OPTIONS.get(program, set())
+        index = 1
+        while index < len(tokens) and tokens[index].startswith("-"):
+            index += 2 if tokens[index] in value_options else 1
+        if index < len(tokens) and _SUBCOMMAND_RE.match(tokens[index]):
+            return f"{program} {tokens[index]}"
+    return program
@@ -73,3 +73,30 @@ def mock_os_info():
         shell="bash",
         package_manager="apt"
     )
+
+
+@pytest.fixture
+def record_run(mock_os_info):
+    """Save a prompt and the result of its one command; returns the entry id."""
+    from pilotcmd.executor.command_executor import ExecutionResult, ExecutionStatus
+    from pilotcmd.nlp.parser import Command
+
+    def record(manager, prompt, command="echo", success=True, stdout="", seconds=0.1):
+        entry_id = manager.save_prompt(prompt, [Command(command, "")], mock_os_info)
+        manager.save_execution_results(
+            [
+                ExecutionResult(
+                    command=Command(command, ""),
+                    status=ExecutionStatus.SUCCESS if success else ExecutionStatus.FAILED,
+                    return_code=0 if success else 1,
+                    stdout=stdout,
+                    stderr="",
+                    execution_time=seconds,
+                    timestamp=0.0,
+                )
+            ],
+            entry_id,
+        )
+        return entry_id
+
+    return record
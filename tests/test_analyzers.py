@@ -0,0 +1,122 @@
+import asyncio
+
+from pilotcmd.executor import analyzers
+from pilotcmd.executor.analyzers import analyze_in_background, analyze_text, analyzer_for
+from pilotcmd.executor.command_executor import CommandExecutor
+from pilotcmd.nlp.parser import Command
+
+PING_OUTPUT = """PING example.com (93.184.216.34) 56(84) bytes of data.
+64 bytes from 93.184.216.34: icmp_seq=1 ttl=56 time=11.2 ms
+64 bytes from 93.184.216.34: icmp_seq=2 ttl=56 time=12.8 ms
+
+--- example.com ping statistics ---
+2 packets transmitted, 2 received, 0% packet loss, time 1001ms
+"""
+
+DF_OUTPUT = """Filesystem     1K-blocks     Used Available Use% Mounted on
+/dev/sda1       41152736 38000000   1000000  95% /
+tmpfs            8000000        0   8000000   0% /dev/shm
+/dev/sdb1      103080224 20000000  78000000  21% /data
+"""
+
+PS_OUTPUT = """USER   PID %CPU %MEM    VSZ   RSS TTY STAT START TIME COMMAND
+root     1  0.0  0.1 167000 11000 ?   Ss   10:00 0:01 /sbin/init splash
+app    200 42.5  3.0 900000 90000 ?   Sl   10:01 5:00 python worker.py --queue high
+app    201  7.1  1.0 300000 30000 ?   S    10:01 0:30 nginx: worker process
+"""
+
+
+def test_registry_matches_program_not_substring():
+    assert analyzer_for("ping -c 2 example.com").name == "ping"
+    assert analyzer_for("sudo /usr/sbin/ifconfig eth0").name == "interfaces"
+    assert analyzer_for("ls -la /tmp").name == "listing"
+    # "tools" contains "ls" but is not ls
+    assert analyzer_for("tools --version") is None
+    assert analyzer_for("echo ping") is None
+
+
+def test_ping_times_and_loss():
+    analysis = analyze_text("ping -c 2 example.com", PING_OUTPUT)
+
+    assert analysis.data["replies"] == 2
+    assert analysis.data["min_ms"] == 11.2
+    assert analysis.data["max_ms"] == 12.8
+    assert analysis.data["loss"] == 0
+    assert "2 respostas" in analysis.summary
+
+
+def test_df_flags_full_filesystems():
+    analysis = analyze_text("df -k", DF_OUTPUT)
+
+    assert analysis.data["usage"] == {"/": 95, "/dev/shm": 0, "/data": 21}
+    assert analysis.data["full"] == ["/"]
+
+
+def test_ps_reports_top_cpu_commands():
+    analysis = analyze_text("ps aux", PS_OUTPUT)
+
+    assert analysis.data["processes"] == 3
+    assert analysis.data["top_cpu"][0] == {
+        "command": "python worker.py --queue high",
+        "cpu": 42.5,
+    }
+
+
+def test_ipconfig_dns_servers_span_lines():
+    output = (
+        "   IPv4 Address. . . . . . . . . . . : 192.168.1.20(Preferred)\n"
+        "   DNS Servers . . . . . . . . . . . : 1.1.1.1\n"
+        "                                       8.8.8.8\n"
+        "   NetBIOS over Tcpip. . . . . . . . : Enabled\n"
+    )
+
+    analysis = analyze_text("ipconfig /all", output)
+
+    assert analysis.data["addresses"] == ["192.168.1.20"]
+    assert analysis.data["dns_servers"] == ["1.1.1.1", "8.8.8.8"]
+
+
+def test_large_heavy_output_is_analyzed_in_worker_pool():
+    listing = "\n".join(f"-rw-r--r-- 1 u g 0 Jan 1 00:00 file{i}" for i in range(5000))
+
+    analysis = asyncio.run(analyze_in_background("ls -l", listing, threshold=1024))
+
+    assert analysis.data["entries"] == 5000
+    assert analyzers._pool is not None
+
+
+def test_analysis_is_kept_out_of_stdout(mock_os_info):
+    executor = CommandExecutor(mock_os_info)
+
+    results = asyncio.run(executor.execute_commands([Command("ls -d /", "")]))
+
+    assert results[0].stdout == "/\n"
+    assert results[0].analysis.summary.startswith("Listagem")
+
+
+def test_streaming_analyzer_reads_output_as_it_arrives(monkeypatch, mock_os_info):
+    events = []
+
+    class EchoAnalyzer(analyzers.OutputAnalyzer):
+        name = "echo"
+
+        def feed(self, line):
+            events.append(("analyzer", line))
+
+        def finish(self):
+            return self._result("ok", lines=len(events))
+
+    monkeypatch.setitem(analyzers.ANALYZERS, "echo", EchoAnalyzer)
+    executor = CommandExecutor(
+        mock_os_info,
+        output_callback=lambda command, stream, line: events.append((stream, line)),
+    )
+
+    result = asyncio.run(executor.execute_command(Command("echo one; echo two >&2", "")))
+
+    # Only stdout is analyzed, line by line alongside the live display
+    assert events.index(("analyzer", "one")) < events.index(("stdout", "one"))
+    assert ("stderr", "two") in events
+    assert ("analyzer", "two") not in events
+    assert result.analysis.summary == "ok"
+    assert result.streamed
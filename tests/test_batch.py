@@ -0,0 +1,126 @@
+import asyncio
+import json
+
+from pilotcmd.models.base import BaseModel, ModelResponse, ModelType
+from pilotcmd.nlp.parser import NLPParser
+from pilotcmd.os_utils.detector import OSInfo, OSType
+
+
+TRUNCATED = '{"results": [{"id": "p0", "comm'
+
+
+class PackingModel(BaseModel):
+    """Answers packed prompts, optionally truncating large packs."""
+
+    def __init__(self, max_answer_ids=None, truncated_content=TRUNCATED, **kwargs):
+        super().__init__("packing", **kwargs)
+        self.max_answer_ids = max_answer_ids
+        self.truncated_content = truncated_content
+        self.requests = []
+
+    async def generate_response(self, prompt: str, **kwargs) -> ModelResponse:
+        self.requests.append(prompt)
+        ids = [
+            line[1 : line.index("]")]
+            for line in prompt.splitlines()
+            if line.startswith("[p")
+        ]
+        if self.max_answer_ids is not None and len(ids) > self.max_answer_ids:
+            return ModelResponse(
+                content=self.truncated_content,
+                model="packing",
+                metadata={"finish_reason": "length"},
+            )
+        if not ids:
+            content = json.dumps(
+                {"commands": [{"command": "echo single", "explanation": "single"}]}
+            )
+        else:
+            content = json.dumps(
+                {
+                    "results": [
+                        {
+                            "id": prompt_id,
+                            "commands": [
+                                {"command": f"echo {prompt_id}", "explanation": ""}
+                            ],
+                        }
+                        for prompt_id in ids
+                    ]
+                }
+            )
+        return ModelResponse(content=content, model="packing")
+
+    def is_available(self) -> bool:
+        return True
+
+    @property
+    def model_type(self) -> ModelType:
+        return ModelType.LOCAL
+
+
+def _os_info():
+    return OSInfo(
+        type=OSType.LINUX,
+        name="Linux",
+        version="1",
+        architecture="x86_64",
+        shell="bash",
+    )
+
+
+def test_parse_batch_packs_prompts_into_one_request():
+    model = PackingModel(max_tokens=3000)
+    parser = NLPParser(model, _os_info())
+
+    plans = asyncio.run(parser.parse_batch(["a", "b", "c", "d"]))
+
+    assert len(model.requests) == 1
+    assert model.requests[0].count("AVAILABLE COMMAND MAPPINGS") == 1
+    assert [plan[0].command for plan in plans] == [
+        "echo p0",
+        "echo p1",
+        "echo p2",
+        "echo p3",
+    ]
+    assert parser.last_usage["total_tokens"] > 0
+
+
+def test_parse_batch_splits_truncated_packs():
+    model = PackingModel(max_answer_ids=2, max_tokens=3000)
+    parser = NLPParser(model, _os_info())
+
+    plans = asyncio.run(parser.parse_batch(["a", "b", "c", "d"]))
+
+    # One truncated pack of four, then two packs of two
+    assert len(model.requests) == 3
+    assert [plan[0].command for plan in plans] == [
+        "echo p0",
+        "echo p1",
+        "echo p2",
+        "echo p3",
+    ]
+
+
+def test_parse_batch_does_not_trust_truncated_answers_that_parse():
+    cut = json.dumps(
+        {"results": [{"id": "p0", "commands": [{"command": "echo cut", "explanation": ""}]}]}
+    )
+    model = PackingModel(max_answer_ids=2, truncated_content=cut, max_tokens=3000)
+    parser = NLPParser(model, _os_info())
+
+    plans = asyncio.run(parser.parse_batch(["a", "b", "c", "d"]))
+
+    assert len(model.requests) == 3
+    assert plans[0][0].command == "echo p0"
+
+
+def test_parse_batch_pack_size_follows_max_tokens():
+    model = PackingModel(max_tokens=300)
+    parser = NLPParser(model, _os_info())
+
+    plans = asyncio.run(parser.parse_batch(["a", "b", "c", "d", "e"]))
+
+    # 300 tokens fit two prompts per pack; the odd one out uses a single request
+    assert len(model.requests) == 3
+    assert plans[4][0].command == "echo single"
@@ -0,0 +1,87 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+
+import pilotcmd
+
+from pilotcmd.context_db.connection import close_database, get_database
+from pilotcmd.context_db.manager import ContextManager
+from pilotcmd.context_db.schema import SCHEMA_VERSION
+from pilotcmd.nlp.parser import Command
+
+
+def test_connection_is_shared_and_tuned(tmp_path):
+    path = str(tmp_path / "context.db")
+    first = ContextManager(db_path=path)
+    second = ContextManager(db_path=path)
+
+    assert first._db is second._db
+    with first._db.transaction() as cursor:
+        assert cursor.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert cursor.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert cursor.execute("PRAGMA busy_timeout").fetchone()[0] > 0
+        assert cursor.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+
+
+def test_legacy_database_is_upgraded_in_place(tmp_path, mock_os_info):
+    path = str(tmp_path / "legacy.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("""
+            CREATE TABLE command_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL,
+                prompt TEXT NOT NULL, commands TEXT NOT NULL, os_info TEXT NOT NULL,
+                success BOOLEAN NOT NULL, execution_time REAL NOT NULL, results TEXT
+            )
+        """)
+        conn.execute(
+            "INSERT INTO command_history (timestamp, prompt, commands, os_info, success, execution_time)"
+            " VALUES ('2024-01-01T00:00:00', 'old prompt', '[\"ls\"]', '{}', 1, 0.1)"
+        )
+
+    manager = ContextManager(db_path=path)
+    manager.save_prompt("new prompt", [Command("pwd", "")], mock_os_info)
+
+    assert [entry.prompt for entry in manager.get_history()] == ["new prompt", "old prompt"]
+    assert manager._db.schema_version == SCHEMA_VERSION
+
+
+def test_concurrent_writers_do_not_hit_locked_errors(tmp_path, mock_os_info):
+    path = str(tmp_path / "context.db")
+    manager = ContextManager(db_path=path)
+    script = (
+        "import sys\n"
+        "from pilotcmd.context_db.manager import ContextManager\n"
+        "from pilotcmd.nlp.parser import Command\n"
+        "from pilotcmd.os_utils.detector import OSDetector\n"
+        "manager = ContextManager(db_path=sys.argv[1])\n"
+        "os_info = OSDetector().detect()\n"
+        "for i in range(50):\n"
+        "    manager.save_prompt(f'other {i}', [Command('ls', '')], os_info)\n"
+    )
+    src = os.path.dirname(os.path.dirname(pilotcmd.__file__))
+    other = subprocess.Popen(
+        [sys.executable, "-c", script, path], env={**os.environ, "PYTHONPATH": src}
+    )
+
+    def write(prefix):
+        for i in range(50):
+            manager.save_prompt(f"{prefix} {i}", [Command("ls", "")], mock_os_info)
+
+    threads = [threading.Thread(target=write, args=(name,)) for name in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert other.wait(timeout=60) == 0
+    assert manager.get_stats()["total_commands"] == 150
+
+
+def test_closed_database_reopens(tmp_path):
+    path = str(tmp_path / "context.db")
+    database = get_database(path)
+    close_database(path)
+
+    assert get_database(path) is not database
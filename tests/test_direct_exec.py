@@ -0,0 +1,62 @@
+import asyncio
+import os
+import shutil
+
+import pytest
+
+from pilotcmd.executor import command_executor
+from pilotcmd.executor.command_executor import CommandExecutor
+from pilotcmd.executor.direct_exec import direct_argv
+from pilotcmd.nlp.parser import Command
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="POSIX shell rules")
+
+
+def test_simple_commands_are_split_and_resolved():
+    argv = direct_argv("ls -la '/tmp/my dir'")
+
+    assert argv == [shutil.which("ls"), "-la", "/tmp/my dir"]
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        "ls | wc -l",
+        "echo done > out.txt",
+        "ls *.py",
+        "echo $HOME",
+        "cd /tmp",
+        "FOO=1 env",
+        "ls ~",
+        "true && false",
+        "definitely-not-a-program-xyz --help",
+        "echo 'unterminated",
+    ],
+)
+def test_commands_needing_a_shell_are_left_alone(command):
+    assert direct_argv(command) is None
+
+
+def test_windows_builtins_and_variables_use_the_shell():
+    assert direct_argv("dir C:\\", windows=True) is None
+    assert direct_argv("echo %PATH%", windows=True) is None
+
+
+def test_executor_spawns_simple_commands_without_shell(monkeypatch, mock_os_info):
+    spawned = []
+    original = command_executor.spawn_accounted
+
+    async def recording_spawn(args, **kwargs):
+        spawned.append(args)
+        return await original(args, **kwargs)
+
+    monkeypatch.setattr(command_executor, "accounting_supported", lambda: True)
+    monkeypatch.setattr(command_executor, "spawn_accounted", recording_spawn)
+    executor = CommandExecutor(mock_os_info)
+
+    simple = asyncio.run(executor.execute_command(Command("echo hello world", "")))
+    piped = asyncio.run(executor.execute_command(Command("echo hello | cat", "")))
+
+    assert simple.stdout == "hello world\n"
+    assert piped.stdout == "hello\n"
+    assert spawned == [[shutil.which("echo"), "hello", "world"], "echo hello | cat"]
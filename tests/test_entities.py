@@ -0,0 +1,114 @@
+import asyncio
+
+from pilotcmd.nlp.entities import (
+    EntityKind,
+    canonicalize_prompt,
+    extract_entities,
+    substitute_entities,
+)
+from pilotcmd.nlp.simple_parser import SimpleParser
+from pilotcmd.os_utils.detector import OSInfo, OSType
+
+
+def _kinds(prompt):
+    return [(e.kind, e.value) for e in extract_entities(prompt)]
+
+
+def test_extracts_addresses_ports_and_networks():
+    assert _kinds("scan 192.168.1.0/24 port 22") == [
+        (EntityKind.CIDR, "192.168.1.0/24"),
+        (EntityKind.PORT, "22"),
+    ]
+    assert _kinds("connect to db.example.com:5432") == [
+        (EntityKind.HOSTNAME, "db.example.com"),
+        (EntityKind.PORT, "5432"),
+    ]
+    assert _kinds("ping fe80::1 and 10.0.0.1") == [
+        (EntityKind.IPV6, "fe80::1"),
+        (EntityKind.IPV4, "10.0.0.1"),
+    ]
+
+
+def test_extracts_files_paths_globs_packages_and_durations():
+    assert _kinds("copy README.md to ~/backup/") == [
+        (EntityKind.FILE, "README.md"),
+        (EntityKind.PATH, "~/backup/"),
+    ]
+    assert _kinds("find *.py under /var/log") == [
+        (EntityKind.GLOB, "*.py"),
+        (EntityKind.PATH, "/var/log"),
+    ]
+    assert _kinds("install the nginx package") == [(EntityKind.PACKAGE, "nginx")]
+    assert _kinds("wait 5 minutes, then 10s") == [
+        (EntityKind.DURATION, "5 minutes"),
+        (EntityKind.DURATION, "10s"),
+    ]
+
+
+def test_substitution_uses_entity_kinds():
+    entities = extract_entities("copy notes.txt and ping example.org")
+
+    assert substitute_entities("cp {file} backup_{file}", entities) == (
+        "cp notes.txt backup_notes.txt"
+    )
+    assert substitute_entities("ping {target}", entities) == "ping example.org"
+    assert substitute_entities("ss -ltn sport = :{port}", entities) is None
+
+
+def test_canonical_prompt_drops_entity_values():
+    first = "ping 10.0.0.1 for 5 minutes"
+    second = "Ping 10.0.0.2  for 30 s"
+
+    assert canonicalize_prompt(first, extract_entities(first)) == (
+        "ping <ipv4> for <duration>"
+    )
+    assert canonicalize_prompt(first, extract_entities(first)) == canonicalize_prompt(
+        second, extract_entities(second)
+    )
+
+
+def test_simple_parser_fills_file_and_target_separately():
+    os_info = OSInfo(
+        type=OSType.LINUX,
+        name="Linux",
+        version="1",
+        architecture="x86_64",
+        shell="bash",
+    )
+    parser = SimpleParser(os_info, pattern_packs=[])
+
+    commands = asyncio.run(parser.parse("ping 8.8.8.8"))
+    assert commands[0].command == "ping -c 4 8.8.8.8"
+
+    commands = asyncio.run(parser.parse("copy report.csv"))
+    assert commands[0].command == "cp report.csv backup_report.csv"
+
+
+def test_simple_parser_reuses_the_match_of_a_canonical_prompt():
+    os_info = OSInfo(
+        type=OSType.LINUX,
+        name="Linux",
+        version="1",
+        architecture="x86_64",
+        shell="bash",
+    )
+    parser = SimpleParser(os_info, pattern_packs=[])
+    searches = []
+    find_pattern = parser._find_pattern
+    parser._find_pattern = lambda *args: searches.append(args[0]) or find_pattern(*args)
+
+    first = asyncio.run(parser.parse("ping 10.0.0.1"))
+    second = asyncio.run(parser.parse("Ping 10.0.0.2"))
+    asyncio.run(parser.parse("frobnicate 10.0.0.1"))
+    asyncio.run(parser.parse("frobnicate 10.0.0.3"))
+    asyncio.run(parser.parse("resolve time.example.org"))
+    asyncio.run(parser.parse("resolve example.org"))
+
+    assert [first[0].command, second[0].command] == ["ping -c 4 10.0.0.1", "ping -c 4 10.0.0.2"]
+    # The keyword of the last match is part of the entity: not reused
+    assert searches == [
+        "ping 10.0.0.1",
+        "frobnicate 10.0.0.1",
+        "resolve time.example.org",
+        "resolve example.org",
+    ]
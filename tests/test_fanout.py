@@ -0,0 +1,129 @@
+import asyncio
+import os
+import stat
+import time
+
+import pytest
+from typer.testing import CliRunner
+
+from pilotcmd.cli import app
+from pilotcmd.executor.command_executor import CommandExecutor
+from pilotcmd.executor.fanout import FanoutRunner
+from pilotcmd.executor.transports import (
+    DockerTransport,
+    LocalTransport,
+    SshTransport,
+    expand_targets,
+)
+from pilotcmd.nlp.parser import Command
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="uses POSIX shell scripts")
+
+
+@pytest.fixture
+def fake_ssh(tmp_path):
+    """An ssh-compatible client that runs the command on localhost."""
+    script = tmp_path / "fake-ssh"
+    script.write_text('#!/bin/sh\nhost="$1"; shift\nexport TARGET_HOST="$host"\nexec sh -c "$*"\n')
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    return [str(script)]
+
+
+def _repos(tmp_path, names):
+    for name in names:
+        (tmp_path / "src" / name).mkdir(parents=True)
+        (tmp_path / "src" / name / "README").write_text(name)
+    return str(tmp_path / "src" / "*")
+
+
+def test_expand_targets_globs_directories_and_parses_kinds(tmp_path):
+    pattern = _repos(tmp_path, ["a", "b"])
+    (tmp_path / "src" / "notes.txt").write_text("not a directory")
+
+    transports = expand_targets([pattern, "docker:web", "ssh:admin@db", pattern])
+
+    assert [t.name for t in transports] == [
+        str(tmp_path / "src" / "a"),
+        str(tmp_path / "src" / "b"),
+        "docker:web",
+        "ssh:admin@db",
+    ]
+    assert transports[2].wrap("ls") == ["docker", "exec", "web", "sh", "-c", "ls"]
+    with pytest.raises(ValueError):
+        expand_targets([str(tmp_path / "missing")])
+
+
+def test_plan_runs_once_per_local_directory(tmp_path, mock_os_info):
+    transports = expand_targets([_repos(tmp_path, ["a", "b", "c"])])
+    runner = FanoutRunner(
+        lambda transport: CommandExecutor(mock_os_info, transport=transport)
+    )
+
+    outcomes = asyncio.run(runner.run([Command("cat README", "")], transports))
+
+    assert [o.results[0].stdout for o in outcomes] == ["a", "b", "c"]
+    assert all(o.success for o in outcomes)
+
+
+def test_ssh_transport_against_localhost(mock_os_info, fake_ssh):
+    transport = SshTransport("localhost", ssh_command=fake_ssh)
+    executor = CommandExecutor(mock_os_info, transport=transport)
+
+    result = asyncio.run(executor.execute_command(Command("echo $TARGET_HOST | tr a-z A-Z", "")))
+
+    assert result.stdout == "LOCALHOST\n"
+
+
+def test_parallelism_is_bounded_and_results_stream(tmp_path, mock_os_info):
+    transports = expand_targets([_repos(tmp_path, [str(i) for i in range(4)])])
+    done = []
+    runner = FanoutRunner(
+        lambda transport: CommandExecutor(mock_os_info, transport=transport),
+        max_parallel=2,
+        on_target_done=lambda outcome: done.append(outcome.target),
+    )
+
+    started = time.monotonic()
+    outcomes = asyncio.run(runner.run([Command("sleep 0.3", "")], transports))
+    elapsed = time.monotonic() - started
+
+    assert len(done) == 4
+    assert sorted(done) == [o.target for o in outcomes]
+    # Two waves of two targets
+    assert 0.55 < elapsed < 2.0
+
+
+def test_target_timeout_keeps_finished_steps(tmp_path, mock_os_info):
+    transports = [LocalTransport(str(tmp_path))]
+    runner = FanoutRunner(
+        lambda transport: CommandExecutor(mock_os_info, transport=transport),
+        target_timeout=0.5,
+    )
+    plan = [Command("echo first", ""), Command("sleep 5", "")]
+
+    started = time.monotonic()
+    (outcome,) = asyncio.run(runner.run(plan, transports))
+
+    assert outcome.timed_out and not outcome.success
+    assert [r.stdout for r in outcome.results] == ["first\n"]
+    assert time.monotonic() - started < 4
+
+
+def test_docker_transport_wraps_in_exec():
+    transport = DockerTransport("db", shell="bash")
+
+    assert transport.wrap("df -h") == ["docker", "exec", "db", "bash", "-c", "df -h"]
+    assert transport.cwd is None
+
+
+def test_fanout_command_reports_every_target(monkeypatch, tmp_path):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    pattern = _repos(tmp_path, ["one", "two"])
+
+    result = CliRunner().invoke(
+        app, ["fanout", "show current directory", "-t", pattern, "--run", "-m", "none"]
+    )
+
+    assert result.exit_code == 0, result.stdout
+    assert "Fan-out results" in result.stdout
+    assert result.stdout.count("✅") >= 2
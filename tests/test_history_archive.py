@@ -0,0 +1,169 @@
+import gzip
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from typer.testing import CliRunner
+
+from pilotcmd.cli import app
+from pilotcmd.context_db.archive import read_archive, write_archive
+from pilotcmd.context_db.connection import close_database
+from pilotcmd.context_db.manager import ContextManager
+from pilotcmd.context_db.retention import RetentionPolicy
+
+
+def _archive(manager, **options):
+    handle = io.StringIO()
+    write_archive(handle, manager.iter_entries(**options))
+    handle.seek(0)
+    return handle
+
+
+def test_round_trip_keeps_results_and_spilled_outputs(tmp_path, record_run):
+    source = ContextManager(db_path=str(tmp_path / "source.db"), spill_threshold=100)
+    big = "line\n" * 1000
+    record_run(source, "dump log", stdout=big)
+    record_run(source, "reboot", success=False)
+
+    target = ContextManager(db_path=str(tmp_path / "target.db"), spill_threshold=100)
+    report = target.import_entries(read_archive(_archive(source)))
+
+    assert (report.imported, report.duplicates) == (2, 0)
+    entries = {entry.prompt: entry for entry in target.get_history()}
+    assert entries["dump log"].success and not entries["reboot"].success
+    results = target.get_results(entries["dump log"].id)
+    assert results[0]["stdout"] == big
+    assert results[0]["status"] == "success"
+    # Large outputs are spilled again on the importing side
+    assert len(list(target.blobs.digests())) == 1
+    assert [e.prompt for e in target.get_similar_commands("dump the log")] == ["dump log"]
+    assert target.get_stats()["total_commands"] == 2
+
+
+def test_import_skips_entries_already_present(tmp_path, record_run):
+    first = ContextManager(db_path=str(tmp_path / "first.db"))
+    second = ContextManager(db_path=str(tmp_path / "second.db"))
+    record_run(first, "only on first")
+    record_run(second, "only on second")
+
+    # Merge both ways, then once more
+    second.import_entries(read_archive(_archive(first)))
+    report = first.import_entries(read_archive(_archive(second)))
+    assert (report.imported, report.duplicates) == (1, 1)
+    report = first.import_entries(read_archive(_archive(second)), batch_size=1)
+    assert (report.imported, report.duplicates) == (0, 2)
+
+    prompts = sorted(entry.prompt for entry in first.get_history())
+    assert prompts == ["only on first", "only on second"]
+
+
+def test_duplicates_within_an_archive(tmp_path, record_run):
+    source = ContextManager(db_path=str(tmp_path / "source.db"))
+    record_run(source, "uptime")
+    lines = _archive(source).read()
+
+    target = ContextManager(db_path=str(tmp_path / "target.db"))
+    # Concatenated archives are archives too
+    report = target.import_entries(read_archive(io.StringIO(lines + lines)))
+
+    assert (report.imported, report.duplicates) == (1, 1)
+
+
+def test_export_pages_by_id(tmp_path, record_run):
+    manager = ContextManager(db_path=str(tmp_path / "context.db"))
+    for i in range(5):
+        record_run(manager, f"prompt {i}", stdout="out")
+
+    entries = manager.iter_entries(page_size=2, include_output=False)
+    first = next(entries)
+    # Entries added while exporting are included, none twice
+    record_run(manager, "late")
+    prompts = [first["prompt"]] + [entry["prompt"] for entry in entries]
+
+    assert prompts == [f"prompt {i}" for i in range(5)] + ["late"]
+    assert "stdout" not in first["results"][0]
+
+
+def test_existing_history_is_hashed_on_upgrade(tmp_path, record_run):
+    path = str(tmp_path / "context.db")
+    manager = ContextManager(db_path=path)
+    record_run(manager, "uptime")
+    archive = _archive(manager).read()
+    with manager._db.transaction() as cursor:
+        cursor.execute("DROP TABLE history_hashes")
+        cursor.execute("PRAGMA user_version = 5")
+    close_database(path)
+
+    report = ContextManager(db_path=path).import_entries(read_archive(io.StringIO(archive)))
+
+    assert (report.imported, report.duplicates) == (0, 1)
+
+
+@pytest.mark.parametrize(
+    "text, message",
+    [
+        ('{"prompt": "x"}\n', "Not a pilotcmd history archive"),
+        ('{"format": "pilotcmd-history", "version": 99}\n', "newer"),
+        ('{"format": "pilotcmd-history", "version": 1}\n{oops\n', "Line 2"),
+        ('{"format": "pilotcmd-history", "version": 1}\n{"prompt": "x"}\n', "missing"),
+    ],
+)
+def test_invalid_archives_are_rejected(text, message):
+    with pytest.raises(ValueError, match=message):
+        list(read_archive(io.StringIO(text)))
+
+
+def test_export_and_import_commands(tmp_path, monkeypatch, record_run):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    manager = ContextManager()
+    record_run(manager, "list files", stdout="a\nb\n")
+    archive = tmp_path / "history.ndjson.gz"
+
+    runner = CliRunner()
+    result = runner.invoke(app, ["history", "export", str(archive)])
+    assert result.exit_code == 0
+    assert "Exported 1 history entries" in result.stdout
+    with gzip.open(archive, "rt") as handle:
+        lines = [json.loads(line) for line in handle]
+    assert lines[1]["prompt"] == "list files"
+    assert lines[1]["results"][0]["stdout"] == "a\nb\n"
+
+    result = runner.invoke(app, ["history", "import", str(archive)])
+    assert result.exit_code == 0
+    assert "Imported 0 history entries (1 already present)" in result.stdout
+
+    result = runner.invoke(app, ["history", "export", "-"])
+    assert result.exit_code == 0
+    assert json.loads(result.stdout.splitlines()[0])["format"] == "pilotcmd-history"
+
+    result = runner.invoke(app, ["history", "import", "-"], input=archive.read_bytes())
+    assert result.exit_code == 0
+    assert "Imported 0 history entries (1 already present)" in result.stdout
+
+    bad = tmp_path / "bad.ndjson"
+    bad.write_text("not json\n")
+    result = runner.invoke(app, ["history", "import", str(bad)])
+    assert result.exit_code == 1
+    assert "Error importing history" in result.stdout
+
+
+def test_retention_counts_imported_entries_by_age(tmp_path, record_run):
+    source = ContextManager(db_path=str(tmp_path / "source.db"))
+    for i in range(5):
+        record_run(source, f"imported {i}")
+    old = (datetime.now() - timedelta(days=400)).isoformat()
+    entries = [dict(entry, timestamp=old) for entry in source.iter_entries()]
+
+    target = ContextManager(
+        db_path=str(tmp_path / "target.db"), retention=RetentionPolicy(max_rows=5)
+    )
+    local = [record_run(target, f"local {i}") for i in range(5)]
+    target.import_entries(entries)
+    record_run(target, "newest")
+    target.flush()
+
+    # The old imported entries go first, though their ids are newer
+    prompts = [entry.prompt for entry in target.get_history(limit=20)]
+    assert prompts == ["newest"] + [f"local {i}" for i in range(4, 0, -1)]
+    assert local[0] not in {entry.id for entry in target.get_history(limit=20)}
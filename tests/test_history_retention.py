@@ -0,0 +1,133 @@
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+from typer.testing import CliRunner
+
+from pilotcmd.cli import app
+from pilotcmd.config.manager import ConfigManager
+from pilotcmd.context_db.connection import close_database
+from pilotcmd.context_db.manager import ContextManager
+from pilotcmd.context_db.retention import PRUNE_BATCH, RetentionPolicy
+from pilotcmd.nlp.parser import Command
+
+
+def test_row_limit_is_enforced_on_write(tmp_path, record_run):
+    manager = ContextManager(
+        db_path=str(tmp_path / "context.db"), retention=RetentionPolicy(max_rows=5)
+    )
+    ids = [record_run(manager, f"prompt {i}") for i in range(8)]
+
+    assert [entry.id for entry in manager.get_history(limit=20)] == ids[:2:-1]
+    similar = {entry.id for entry in manager.get_similar_commands("prompt", limit=10)}
+    assert similar == set(ids[3:])
+
+
+def test_incremental_pruning_is_bounded_per_write(tmp_path, mock_os_info):
+    path = str(tmp_path / "context.db")
+    manager = ContextManager(db_path=path)
+    for i in range(PRUNE_BATCH + 10):
+        manager.save_prompt(f"prompt {i}", [Command("ls", "")], mock_os_info)
+
+    limited = ContextManager(db_path=path, retention=RetentionPolicy(max_rows=1))
+    limited.save_prompt("new", [Command("ls", "")], mock_os_info)
+
+    # One batch per write; the rest waits for later writes or prune
+    assert len(limited.get_history(limit=100)) == 11
+    report = limited.prune()
+    assert report.deleted_entries == 10
+    assert [entry.prompt for entry in limited.get_history()] == ["new"]
+
+
+def test_age_limit(tmp_path, record_run):
+    manager = ContextManager(db_path=str(tmp_path / "context.db"))
+    old = record_run(manager, "old")
+    with manager._db.transaction() as cursor:
+        cursor.execute(
+            "UPDATE command_history SET timestamp = ? WHERE id = ?",
+            ((datetime.now() - timedelta(days=40)).isoformat(), old),
+        )
+
+    report = manager.prune(RetentionPolicy(max_age_days=30))
+
+    assert report.deleted_entries == 1
+    assert manager.get_results(old) == []
+
+
+def test_size_limit_removes_oldest_entries_and_their_blobs(tmp_path, record_run):
+    manager = ContextManager(db_path=str(tmp_path / "context.db"), spill_threshold=100)
+    for i in range(20):
+        record_run(manager, f"dump {i}", stdout=os.urandom(20000).hex())
+    assert manager.blobs.total_size() > 400000
+
+    report = manager.prune(RetentionPolicy(max_bytes=1))
+
+    # The newest entries are always kept
+    assert report.deleted_entries == 10
+    assert len(list(manager.blobs.digests())) == 10
+    assert report.reclaimed_bytes > 200000
+
+
+def test_new_databases_vacuum_incrementally(tmp_path, record_run):
+    path = str(tmp_path / "context.db")
+    manager = ContextManager(db_path=path, spill_threshold=10**9)
+    for i in range(30):
+        record_run(manager, f"big {i}", stdout="x" * 50000)
+    assert manager._db.pragma("auto_vacuum") == 2
+    size = manager.disk_usage()
+
+    report = manager.prune(RetentionPolicy(max_rows=1))
+
+    assert report.deleted_entries == 29
+    assert report.bytes_before == size
+    assert manager.disk_usage() < size / 5
+
+
+def test_compact_converts_older_databases(tmp_path, record_run):
+    path = str(tmp_path / "context.db")
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA auto_vacuum = NONE")
+    conn.execute("CREATE TABLE placeholder (x)")
+    conn.close()
+    manager = ContextManager(db_path=path)
+    assert manager._db.pragma("auto_vacuum") == 0
+    for i in range(10):
+        record_run(manager, f"big {i}", stdout="y" * 50000)
+    manager.clear_history()
+
+    report = manager.compact()
+
+    assert manager._db.pragma("auto_vacuum") == 2
+    assert report.reclaimed_bytes > 100000
+    close_database(path)
+
+
+def test_default_history_follows_config(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    ConfigManager().update_config(history_limit=3, history_max_age_days=7)
+
+    policy = ContextManager().retention
+
+    assert policy == RetentionPolicy(max_rows=3, max_age_days=7, max_bytes=256 * 1024 * 1024)
+
+
+def test_prune_and_compact_commands(tmp_path, monkeypatch, record_run):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    manager = ContextManager(retention=RetentionPolicy())
+    for i in range(5):
+        record_run(manager, f"prompt {i}")
+
+    runner = CliRunner()
+    result = runner.invoke(app, ["history", "prune", "--max-rows", "2"])
+    assert result.exit_code == 0
+    assert "Removed 3 history entries" in result.stdout
+    assert "reclaimed" in result.stdout
+    assert len(manager.get_history()) == 2
+
+    result = runner.invoke(app, ["history", "compact"])
+    assert result.exit_code == 0
+    assert "Compacted" in result.stdout
+
+    result = runner.invoke(app, ["history", "--limit", "1"])
+    assert result.exit_code == 0
+    assert "prompt 4" in result.stdout
@@ -0,0 +1,89 @@
+import pytest
+from typer.testing import CliRunner
+
+from pilotcmd.cli import app
+from pilotcmd.context_db.manager import (
+    _SEARCH_SQL,
+    MATCH_END,
+    MATCH_START,
+    ContextManager,
+    fts_query,
+)
+from pilotcmd.nlp.parser import Command
+
+
+@pytest.fixture
+def manager(tmp_path, mock_os_info):
+    manager = ContextManager(db_path=str(tmp_path / "context.db"))
+    if not manager.full_text_search:
+        pytest.skip("SQLite built without FTS5")
+    plans = [
+        ("list docker containers", ["docker ps -a"]),
+        ("show disk usage", ["df -h", "du -sh ."]),
+        ("restart the docker daemon", ["sudo systemctl restart docker"]),
+        ("find large files", ["find . -size +100M"]),
+    ]
+    for prompt, commands in plans:
+        manager.save_prompt(prompt, [Command(c, "") for c in commands], mock_os_info)
+    return manager
+
+
+def test_query_words_are_quoted_prefixes():
+    assert fts_query('apt-get "in') == '"apt-get"* """in"*'
+    assert fts_query("   ") == ""
+
+
+def test_search_matches_words_not_json(manager):
+    # '",' only occurs in the JSON encoding of the commands
+    assert manager.get_history(search='",') == []
+    assert [e.prompt for e in manager.get_history(search="du")] == ["show disk usage"]
+
+
+def test_prefix_search_is_ranked_and_highlighted(manager):
+    hits = manager.get_history(search="dock")
+
+    assert {e.prompt for e in hits} == {"list docker containers", "restart the docker daemon"}
+    assert all(f"{MATCH_START}docker{MATCH_END}" in e.snippet for e in hits)
+
+
+def test_index_follows_updates_and_deletes(manager, mock_os_info):
+    manager.save_prompt("check memory", [Command("free -h", "")], mock_os_info)
+    assert [e.prompt for e in manager.get_history(search="free")] == ["check memory"]
+
+    manager.clear_history()
+
+    assert manager.get_history(search="free") == []
+
+
+def test_search_uses_the_index_on_large_history(manager):
+    with manager._db.transaction() as cursor:
+        cursor.executemany(
+            "INSERT INTO command_history (timestamp, prompt, commands, os_info, success, execution_time)"
+            " VALUES ('2024-01-01', ?, ?, '{}', 1, 0)",
+            [(f"prompt number {i} about topic{i % 997}", f'["echo {i}"]') for i in range(20000)],
+        )
+        cursor.execute(
+            "EXPLAIN QUERY PLAN " + _SEARCH_SQL,
+            (MATCH_START, MATCH_END, fts_query("topic42"), 10),
+        )
+        plan = [row[3] for row in cursor.fetchall()]
+
+    assert len(manager.get_history(search="topic42", limit=10)) == 10
+    # Matches come from the full-text index (":M" is its MATCH constraint),
+    # entries by primary key; the history table is never scanned
+    assert any(d.startswith("SCAN history_fts VIRTUAL TABLE INDEX") and ":M" in d for d in plan)
+    assert "SEARCH h USING INTEGER PRIMARY KEY (rowid=?)" in plan
+    assert not any(d.startswith("SCAN h") and "history_fts" not in d for d in plan)
+
+
+def test_history_command_shows_snippets(monkeypatch, tmp_path, mock_os_info):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    (tmp_path / ".pilotcmd").mkdir()
+    ContextManager().save_prompt(
+        "list docker containers", [Command("docker ps -a", "")], mock_os_info
+    )
+
+    result = CliRunner().invoke(app, ["history", "--search", "docker"])
+
+    assert result.exit_code == 0
+    assert "Match:" in result.stdout
@@ -0,0 +1,103 @@
+import sqlite3
+
+from pilotcmd.context_db.manager import ContextManager
+from pilotcmd.executor.command_executor import ExecutionResult, ExecutionStatus
+from pilotcmd.nlp.parser import Command
+
+
+def _result(command, stdout="", status=ExecutionStatus.SUCCESS):
+    return ExecutionResult(
+        command=Command(command=command, explanation=""),
+        status=status,
+        return_code=0 if status == ExecutionStatus.SUCCESS else 1,
+        stdout=stdout,
+        stderr="",
+        execution_time=0.5,
+        timestamp=0.0,
+    )
+
+
+def test_results_go_to_the_entry_of_their_session(tmp_path, mock_os_info):
+    manager = ContextManager(db_path=str(tmp_path / "context.db"))
+    first = manager.save_prompt("first", [Command("echo a", "")], mock_os_info)
+    second = manager.save_prompt("second", [Command("echo b", "")], mock_os_info)
+
+    # The older session finishes last
+    manager.history_writer(second).finish([_result("echo b", "b")])
+    manager.history_writer(first).finish([_result("echo a", "a")])
+
+    assert [r["stdout"] for r in manager.get_results(first)] == ["a"]
+    assert [r["stdout"] for r in manager.get_results(second)] == ["b"]
+
+
+def test_steps_are_visible_while_the_plan_runs(tmp_path, mock_os_info):
+    manager = ContextManager(db_path=str(tmp_path / "context.db"))
+    commands = [Command("echo a", ""), Command("echo b", "")]
+    entry_id = manager.save_prompt("two steps", commands, mock_os_info)
+    writer = manager.history_writer(entry_id)
+
+    writer.progress(0, commands[0], None)
+    writer.progress(0, commands[0], _result("echo a", "a"))
+
+    # Another process sees the finished step before the plan completes,
+    # once the background writer has committed it
+    manager.flush()
+    other = sqlite3.connect(str(tmp_path / "context.db"))
+    rows = other.execute(
+        "SELECT step, command, status FROM command_steps WHERE history_id = ?", (entry_id,)
+    ).fetchall()
+    other.close()
+    assert rows == [(0, "echo a", "success")]
+
+    entry = manager.get_history()[0]
+    assert not entry.success
+    assert entry.execution_time == 0.5
+
+
+def test_interrupted_plan_keeps_finished_steps(tmp_path, mock_os_info):
+    manager = ContextManager(db_path=str(tmp_path / "context.db"))
+    entry_id = manager.save_prompt("long plan", [Command("echo a", "")], mock_os_info)
+    manager.history_writer(entry_id).record_step(_result("echo a", "a"), 0)
+
+    # Ctrl-C before finish(): a new process still finds the step
+    reopened = ContextManager(db_path=str(tmp_path / "context.db"))
+    assert [r["stdout"] for r in reopened.get_results(entry_id)] == ["a"]
+    assert not reopened.get_history()[0].success
+
+
+def test_finish_stores_unreported_steps_and_outcome(tmp_path, mock_os_info):
+    manager = ContextManager(db_path=str(tmp_path / "context.db"))
+    entry_id = manager.save_prompt("plan", [Command("uname", "")], mock_os_info)
+    writer = manager.history_writer(entry_id)
+    writer.record_step(_result("echo b", "b"), 1)
+
+    # Step 0 was a speculative result that bypassed the progress callback
+    writer.finish([_result("uname", "Linux"), _result("echo b", "b")])
+
+    assert [r["command"] for r in manager.get_results(entry_id)] == ["uname", "echo b"]
+    entry = manager.get_history()[0]
+    assert entry.success
+    assert entry.execution_time == 1.0
+
+
+def test_fanout_steps_record_their_target(tmp_path, mock_os_info):
+    manager = ContextManager(db_path=str(tmp_path / "context.db"))
+    entry_id = manager.save_prompt("fan", [Command("hostname", "")], mock_os_info)
+    writer = manager.history_writer(entry_id)
+    writer.record_step(_result("hostname", "a"), target="ssh:a")
+    writer.record_step(_result("hostname", "", ExecutionStatus.FAILED), target="ssh:b")
+    writer.finish(success=False)
+
+    results = manager.get_results(entry_id)
+    assert [r["target"] for r in results] == ["ssh:a", "ssh:b"]
+    assert not manager.get_history()[0].success
+
+
+def test_deleting_entries_removes_their_steps(tmp_path, mock_os_info):
+    manager = ContextManager(db_path=str(tmp_path / "context.db"))
+    entry_id = manager.save_prompt("plan", [Command("pwd", "")], mock_os_info)
+    manager.save_execution_results([_result("pwd", "/")], entry_id)
+
+    manager.clear_history()
+
+    assert manager.get_results(entry_id) == []
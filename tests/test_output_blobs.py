@@ -0,0 +1,106 @@
+import sqlite3
+
+import pytest
+
+from pilotcmd.context_db.blob_store import BlobStore
+from pilotcmd.context_db.manager import ContextManager
+from pilotcmd.executor.command_executor import ExecutionResult, ExecutionStatus
+from pilotcmd.nlp.parser import Command
+
+
+def _result(command, stdout, stderr=""):
+    return ExecutionResult(
+        command=Command(command=command, explanation=""),
+        status=ExecutionStatus.SUCCESS,
+        return_code=0,
+        stdout=stdout,
+        stderr=stderr,
+        execution_time=0.1,
+        timestamp=0.0,
+        stdout_bytes=len(stdout),
+    )
+
+
+def test_blob_store_deduplicates_content(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+
+    first = store.put(b"x" * 10000)
+    second = store.put(b"x" * 10000)
+
+    assert first == second
+    assert store.get(first) == b"x" * 10000
+    assert list(store.digests()) == [first]
+    # Compressed on disk
+    assert sum(p.stat().st_size for p in (tmp_path / "blobs").rglob("*.z")) < 1000
+
+
+def test_large_outputs_are_spilled_and_loaded_lazily(tmp_path, mock_os_info):
+    manager = ContextManager(db_path=str(tmp_path / "context.db"), spill_threshold=100)
+    big = "line\n" * 1000
+    entry_id = manager.save_prompt("show logs", [Command("cat log", "")], mock_os_info)
+    manager.save_execution_results([_result("cat log", big, "warn"), _result("pwd", "/tmp")])
+
+    history = manager.get_history()
+    assert history[0].results is None
+
+    lazy = manager.get_results(entry_id, include_output=False)
+    assert lazy[0]["stdout"] is None and lazy[0]["stdout_blob"]
+    assert lazy[0]["stderr"] == "warn"
+    assert lazy[1]["stdout"] == "/tmp"
+
+    loaded = manager.get_results(entry_id)
+    assert loaded[0]["stdout"] == big
+
+
+def test_clearing_history_removes_orphaned_blobs(tmp_path, mock_os_info):
+    manager = ContextManager(db_path=str(tmp_path / "context.db"), spill_threshold=10)
+    manager.save_prompt("dump", [Command("seq 1000", "")], mock_os_info)
+    manager.save_execution_results([_result("seq 1000", "1\n" * 1000)])
+    manager.flush()
+    assert list(manager.blobs.digests())
+
+    manager.clear_history()
+
+    assert not list(manager.blobs.digests())
+
+
+def test_blobs_of_deleted_entries_survive_a_rollback(tmp_path, mock_os_info):
+    manager = ContextManager(db_path=str(tmp_path / "context.db"), spill_threshold=10)
+    big = "1\n" * 1000
+    entry_id = manager.save_prompt("dump", [Command("seq 1000", "")], mock_os_info)
+    manager.save_execution_results([_result("seq 1000", big)], entry_id)
+
+    with pytest.raises(RuntimeError):
+        with manager._db.transaction(immediate=True) as cursor:
+            manager._delete_entries(cursor, [entry_id])
+            raise RuntimeError("interrupted")
+
+    assert manager.get_results(entry_id)[0]["stdout"] == big
+
+    with manager._db.transaction(immediate=True) as cursor:
+        manager._delete_entries(cursor, [entry_id])
+    assert not list(manager.blobs.digests())
+
+
+def test_blob_reused_by_another_process_is_kept(tmp_path, mock_os_info, monkeypatch):
+    path = str(tmp_path / "context.db")
+    manager = ContextManager(db_path=path, spill_threshold=10)
+    manager.save_prompt("dump", [Command("seq 1000", "")], mock_os_info)
+    manager.save_execution_results([_result("seq 1000", "1\n" * 1000)])
+    manager.flush()
+    (digest,) = manager.blobs.digests()
+
+    # Another process stores the same output between the commit and the cleanup
+    cleanup = manager._db._run_after_commit
+
+    def reuse_then_cleanup():
+        other = sqlite3.connect(path)
+        other.execute("INSERT INTO output_blobs (history_id, digest) VALUES (999, ?)", (digest,))
+        other.commit()
+        other.close()
+        cleanup()
+
+    monkeypatch.setattr(manager._db, "_run_after_commit", reuse_then_cleanup)
+    manager.clear_history()
+
+    assert list(manager.blobs.digests()) == [digest]
@@ -0,0 +1,61 @@
+import asyncio
+
+from pilotcmd.executor.command_executor import CommandExecutor
+from pilotcmd.executor.output import HeadTailBuffer
+from pilotcmd.nlp.parser import Command
+
+
+def test_head_tail_buffer_keeps_both_ends():
+    buffer = HeadTailBuffer(limit=8)
+    for chunk in (b"abc", b"defghij", b"klmnop", b"qrs"):
+        buffer.write(chunk)
+
+    assert buffer.total_bytes == 19
+    assert buffer.retained_bytes == 8
+    assert buffer.truncated
+    value = buffer.getvalue()
+    assert value.startswith(b"abcd")
+    assert value.endswith(b"pqrs")
+    assert b"[11 bytes omitted]" in value
+
+
+def test_head_tail_buffer_small_output_is_verbatim():
+    buffer = HeadTailBuffer(limit=64)
+    buffer.write(b"hello\n")
+
+    assert not buffer.truncated
+    assert buffer.getvalue() == b"hello\n"
+
+
+def test_lines_are_streamed_as_they_arrive(mock_os_info):
+    seen = []
+
+    def on_line(command, stream_name, line):
+        seen.append((stream_name, line))
+
+    executor = CommandExecutor(mock_os_info, output_callback=on_line)
+    command = Command(command="echo one; echo two >&2; printf three", explanation="")
+
+    result = asyncio.run(executor.execute_command(command))
+
+    assert result.success and result.streamed
+    assert ("stdout", "one") in seen
+    assert ("stderr", "two") in seen
+    assert ("stdout", "three") in seen
+    assert result.stdout == "one\nthree"
+
+
+def test_large_output_is_bounded(mock_os_info):
+    executor = CommandExecutor(mock_os_info, output_limit=1024)
+    command = Command(command="seq 1 100000", explanation="")
+
+    result = asyncio.run(executor.execute_command(command))
+
+    assert result.success
+    assert result.output_truncated
+    assert result.stdout_bytes == len(
+        "".join(f"{i}\n" for i in range(1, 100001)).encode()
+    )
+    assert result.stdout.startswith("1\n2\n")
+    assert result.stdout.endswith("99999\n100000\n")
+    assert len(result.stdout) < 1200
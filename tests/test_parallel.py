@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+from pilotcmd.executor.command_executor import CommandExecutor
+from pilotcmd.executor.concurrency import AdaptiveLimiter
+from pilotcmd.nlp.parser import Command, SafetyLevel
+
+
+def _cmd(text, independent=False, safety=SafetyLevel.SAFE):
+    return Command(
+        command=text, explanation="", safety_level=safety, independent=independent
+    )
+
+
+def test_plan_groups_join_independent_and_read_only_commands(mock_os_info):
+    executor = CommandExecutor(mock_os_info)
+    executor.set_parallel(4)
+    commands = [
+        _cmd("mkdir build", safety=SafetyLevel.CAUTION),
+        _cmd("ls build"),
+        _cmd("df -h"),
+        _cmd("curl -sI https://example.com", independent=True),
+        _cmd("touch build/x", safety=SafetyLevel.CAUTION),
+        _cmd("uptime"),
+    ]
+
+    # ls may observe mkdir and uptime may observe touch, so both start new groups
+    assert executor.plan_groups(commands) == [[0], [1, 2, 3], [4], [5]]
+
+
+def test_plan_groups_are_singletons_without_parallelism(mock_os_info):
+    executor = CommandExecutor(mock_os_info)
+    commands = [_cmd("ls"), _cmd("df -h"), _cmd("uptime", independent=True)]
+
+    assert executor.plan_groups(commands) == [[0], [1], [2]]
+
+
+def test_independent_commands_run_concurrently_in_order(mock_os_info):
+    executor = CommandExecutor(mock_os_info)
+    executor.set_parallel(3)
+    commands = [_cmd(f"sleep 0.3; echo {i}", independent=True) for i in range(3)]
+
+    started = time.monotonic()
+    results = asyncio.run(executor.execute_commands(commands))
+    elapsed = time.monotonic() - started
+
+    assert [r.stdout.split()[0] for r in results] == ["0", "1", "2"]
+    assert elapsed < 0.8
+    assert results[0].parallel_group == results[2].parallel_group
+    assert results[0].group_summed_time > results[0].group_wall_time
+    assert results[0].speedup > 1.5
+
+
+def test_limiter_backs_off_under_load():
+    limiter = AdaptiveLimiter(8, load_probe=lambda: 1.5, fd_probe=lambda: None)
+    assert limiter.limit == 4
+
+    limiter = AdaptiveLimiter(8, load_probe=lambda: 3.0, fd_probe=lambda: None)
+    assert limiter.limit == 1
+
+
+def test_limiter_respects_fd_headroom():
+    limiter = AdaptiveLimiter(8, load_probe=lambda: None, fd_probe=lambda: (70, 100))
+    # 80 usable descriptors, 70 open: room for two more commands
+    assert limiter.limit == 2
+
+
+def test_limiter_bounds_concurrency():
+    limiter = AdaptiveLimiter(2, load_probe=lambda: None, fd_probe=lambda: None)
+
+    async def work():
+        async with limiter:
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*(work() for _ in range(6)))
+
+    asyncio.run(main())
+    assert limiter.peak == 2
+    assert limiter.active == 0
@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+import pytest
+
+from pilotcmd.nlp.pattern_pack import PatternPack, compile_pack, load_installed_packs
+from pilotcmd.nlp.simple_parser import SimpleParser
+from pilotcmd.os_utils.detector import OSInfo, OSType
+
+
+def _linux():
+    return OSInfo(
+        type=OSType.LINUX,
+        name="Linux",
+        version="1",
+        architecture="x86_64",
+        shell="bash",
+    )
+
+
+@pytest.fixture
+def pack_path(tmp_path):
+    source = tmp_path / "memory.json"
+    source.write_text(
+        json.dumps(
+            {
+                "os": "unix",
+                "patterns": [
+                    {
+                        "keywords": ["free memory", "ram"],
+                        "explanation": "Show memory usage",
+                        "unix": "free -h",
+                    },
+                    {
+                        "keywords": ["memory"],
+                        "explanation": "Show memory details",
+                        "linux": "cat /proc/meminfo",
+                    },
+                    {"keywords": ["hosts"], "windows": "type hosts"},
+                ],
+            }
+        )
+    )
+    output = tmp_path / "packs" / "memory.pcpk"
+    assert compile_pack([source], output) == 3
+    return output
+
+
+def test_pack_lookup_uses_priority_order(pack_path):
+    pack = PatternPack(str(pack_path))
+
+    assert pack.os_name == "unix"
+    assert pack.candidates("show free memory please") == [0, 1]
+    assert pack.candidates("how much memory") == [1]
+    assert pack.candidates("memorize this") == []
+    assert pack.get_pattern(0)["unix"] == "free -h"
+
+
+def test_simple_parser_prefers_pack_patterns(pack_path):
+    parser = SimpleParser(_linux(), pattern_packs=[PatternPack(str(pack_path))])
+
+    commands = asyncio.run(parser.parse("show free memory"))
+    assert commands[0].command == "free -h"
+    assert commands[0].revert == "No revert available"
+
+    # Patterns without a command for this OS fall through to the built-ins
+    commands = asyncio.run(parser.parse("show hosts"))
+    assert commands[0].command == "ls -la"
+
+
+def test_installed_packs_are_filtered_by_os(pack_path):
+    windows = OSInfo(
+        type=OSType.WINDOWS,
+        name="Windows",
+        version="10",
+        architecture="x64",
+        shell="cmd",
+    )
+
+    assert len(load_installed_packs(_linux(), pack_path.parent)) == 1
+    assert load_installed_packs(windows, pack_path.parent) == []
+
+
+def test_compile_rejects_patterns_without_commands(tmp_path):
+    source = tmp_path / "bad.json"
+    source.write_text(json.dumps([{"keywords": ["x"]}]))
+
+    with pytest.raises(ValueError):
+        compile_pack([source], tmp_path / "bad.pcpk")
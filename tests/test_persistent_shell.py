@@ -0,0 +1,128 @@
+import asyncio
+import os
+
+import pytest
+from typer.testing import CliRunner
+
+from pilotcmd.cli import app
+from pilotcmd.context_db.manager import ContextManager
+from pilotcmd.executor import command_executor
+from pilotcmd.executor.command_executor import CommandExecutor, ExecutionStatus
+from pilotcmd.executor.persistent_shell import PersistentShell, ShellTimeoutError
+from pilotcmd.nlp.parser import Command
+
+
+@pytest.fixture
+def shell(tmp_path):
+    shell = PersistentShell(cwd=str(tmp_path))
+    yield shell
+    shell.close()
+
+
+def test_state_carries_over_between_commands(shell, tmp_path):
+    (tmp_path / "sub").mkdir()
+
+    assert shell.run("cd sub && export GREETING=hi").returncode == 0
+    result = shell.run("pwd; echo $GREETING; echo oops >&2; printf tail")
+
+    assert result.stdout == f"{tmp_path / 'sub'}\nhi\ntail"
+    assert result.stderr == "oops\n"
+    assert shell.spawn_count == 1
+
+
+def test_exit_status_and_syntax_errors_keep_shell_usable(shell):
+    assert shell.run("false").returncode == 1
+    assert shell.run("if then fi").returncode != 0
+    assert shell.run("echo ok").stdout == "ok\n"
+    assert shell.spawn_count == 1
+
+
+def test_shell_is_respawned_after_exit(shell):
+    assert shell.run("exit 3").returncode == 3
+    assert not shell.alive
+
+    assert shell.run("echo back").stdout == "back\n"
+    assert shell.spawn_count == 2
+
+
+def test_timeout_kills_shell_and_command(shell):
+    with pytest.raises(ShellTimeoutError):
+        shell.run("sleep 10", timeout=0.3)
+
+    assert shell.run("echo fresh").stdout == "fresh\n"
+
+
+def test_executor_runs_plan_in_persistent_shell(mock_os_info, shell, tmp_path):
+    executor = CommandExecutor(mock_os_info, persistent_shell=shell)
+    commands = [
+        Command(command="cd /", explanation=""),
+        Command(command="pwd", explanation=""),
+    ]
+
+    results = asyncio.run(executor.execute_commands(commands))
+
+    assert all(result.success for result in results)
+    assert results[1].stdout.startswith("/\n")
+    assert not executor.start_speculation([Command(command="ls", explanation="")])
+
+
+def test_executor_timeout_in_persistent_shell(mock_os_info, shell):
+    executor = CommandExecutor(mock_os_info, timeout=0.3, persistent_shell=shell)
+
+    result = asyncio.run(executor.execute_command(Command(command="sleep 5", explanation="")))
+
+    assert result.status == ExecutionStatus.TIMEOUT
+
+
+def test_shell_repl_keeps_one_shell_across_prompts(monkeypatch, tmp_path):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "sub").mkdir()
+    prompts = iter(["cd sub", "pwd", "quit"])
+
+    class ScriptedSession:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def prompt(self, *args, **kwargs):
+            return next(prompts)
+
+    class PlanParser:
+        last_usage = None
+
+        def __init__(self, os_info):
+            pass
+
+        async def parse(self, prompt):
+            return [Command(prompt, "")]
+
+    monkeypatch.setattr("pilotcmd.cli.PromptSession", ScriptedSession)
+    monkeypatch.setattr("pilotcmd.cli.NLPParser", PlanParser)
+    monkeypatch.setattr("pilotcmd.cli.SimpleParser", PlanParser)
+
+    result = CliRunner().invoke(app, ["--run", "shell", "--mode", "restricted"])
+
+    assert result.exit_code == 0, result.stdout
+    latest = ContextManager().get_history(limit=1)[0]
+    assert latest.prompt == "pwd"
+    assert ContextManager().get_results(latest.id)[0]["stdout"].strip() == str(tmp_path / "sub")
+
+
+def test_terminal_prompts_run_outside_the_persistent_shell(
+    monkeypatch, mock_os_info, shell, tmp_path
+):
+    # sudo needs pilotcmd's terminal, which commands in the shell never get
+    monkeypatch.setattr(command_executor, "TERMINAL_PROGRAMS", {"sudo", "sh"})
+    (tmp_path / "sub").mkdir()
+    executor = CommandExecutor(mock_os_info, persistent_shell=shell)
+    commands = [
+        Command(command="cd sub", explanation=""),
+        Command(command="sh -c 'pwd; ps -o sid= -p $$'", explanation=""),
+    ]
+
+    results = asyncio.run(executor.execute_commands(commands))
+
+    directory, session = results[1].stdout.split()
+    assert directory == str(tmp_path / "sub")
+    assert int(session) == os.getsid(0)
+    assert shell.spawn_count == 1
@@ -0,0 +1,159 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from pilotcmd.executor import command_executor
+from pilotcmd.executor.command_executor import CommandExecutor, ExecutionStatus
+from pilotcmd.executor.resources import (
+    DEFAULT_RESOURCE_LIMITS,
+    ResourceLimits,
+    limits_supported,
+    resource_limits_from_config,
+)
+from pilotcmd.nlp.parser import Command, SafetyLevel
+
+pytestmark = pytest.mark.skipif(
+    not limits_supported() or os.name == "nt", reason="setrlimit needs Unix"
+)
+
+
+def _running(pid: int) -> bool:
+    """Whether a process exists and is not a zombie awaiting its reaper."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            return stat.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return True
+
+
+def test_config_overrides_merge_into_defaults():
+    limits = resource_limits_from_config(
+        {"safe": {"cpu_seconds": 60, "address_space_mb": 2048, "bogus": 1}}
+    )
+
+    assert limits["safe"].cpu_seconds == 60
+    assert limits["safe"].address_space_mb == 2048
+    assert limits["safe"].open_files == DEFAULT_RESOURCE_LIMITS["safe"].open_files
+    assert limits["caution"] == DEFAULT_RESOURCE_LIMITS["caution"]
+
+
+def test_limits_follow_safety_level(mock_os_info):
+    executor = CommandExecutor(
+        mock_os_info,
+        resource_limits={
+            "safe": ResourceLimits(open_files=64),
+            "caution": ResourceLimits(open_files=128),
+        },
+    )
+    check = "ulimit -n"
+
+    safe = asyncio.run(executor.execute_command(Command(check, "")))
+    caution = asyncio.run(
+        executor.execute_command(Command(check, "", safety_level=SafetyLevel.CAUTION))
+    )
+
+    assert safe.stdout.strip() == "64"
+    assert caution.stdout.strip() == "128"
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/limits"), reason="needs procfs")
+def test_limits_apply_to_directly_executed_commands(mock_os_info):
+    executor = CommandExecutor(
+        mock_os_info,
+        resource_limits={
+            "safe": ResourceLimits(
+                cpu_seconds=60, address_space_mb=512, file_size_mb=1, open_files=64
+            )
+        },
+    )
+
+    result = asyncio.run(executor.execute_command(Command("cat /proc/self/limits", "")))
+
+    limits = {
+        line[:26].strip(): line[26:].split()[:2] for line in result.stdout.splitlines()[1:]
+    }
+    assert limits["Max cpu time"] == ["60", "65"]
+    assert limits["Max file size"] == ["1048576", "1048576"]
+    assert limits["Max address space"] == ["536870912", "536870912"]
+    assert limits["Max open files"] == ["64", "64"]
+
+
+def test_file_size_limit_stops_runaway_writes(tmp_path, mock_os_info):
+    executor = CommandExecutor(
+        mock_os_info, resource_limits={"safe": ResourceLimits(file_size_mb=1)}
+    )
+    target = tmp_path / "big"
+    command = Command(f"trap '' XFSZ; head -c 3000000 /dev/zero > {target}", "")
+
+    result = asyncio.run(executor.execute_command(command))
+
+    assert result.status == ExecutionStatus.FAILED
+    assert target.stat().st_size <= 1024 * 1024
+
+
+def test_signal_deaths_are_explained():
+    assert CommandExecutor._describe_signal(0) is None
+    assert CommandExecutor._describe_signal(-9) == "Killed by SIGKILL"
+    assert "resource limit" in CommandExecutor._describe_signal(-25)
+
+
+def test_timeout_escalates_to_sigkill_for_whole_group(tmp_path, mock_os_info):
+    executor = CommandExecutor(mock_os_info, timeout=0.3)
+    pid_file = tmp_path / "child.pid"
+    # The child ignores SIGTERM, so only the SIGKILL escalation can stop it
+    command = Command(
+        f"sh -c 'trap \"\" TERM; echo $$ > {pid_file}; while :; do sleep 0.1; done' & wait",
+        "",
+    )
+
+    started = time.monotonic()
+    result = asyncio.run(executor.execute_command(command))
+
+    assert result.status == ExecutionStatus.TIMEOUT
+    assert time.monotonic() - started < 5
+    child = int(pid_file.read_text())
+    for _ in range(20):
+        if not _running(child):
+            break
+        time.sleep(0.05)
+    assert not _running(child)
+
+
+def test_terminal_prompts_keep_pilotcmd_session(monkeypatch, mock_os_info):
+    # sudo reads its password from /dev/tty, which a new session loses
+    monkeypatch.setattr(command_executor, "TERMINAL_PROGRAMS", {"sudo", "sh"})
+    executor = CommandExecutor(mock_os_info, timeout=0.3)
+    session = "sh -c 'ps -o sid= -p $$'"
+
+    attached = asyncio.run(executor.execute_command(Command(session, "")))
+    detached = asyncio.run(executor.execute_command(Command(f"env {session}", "")))
+
+    assert int(attached.stdout) == os.getsid(0)
+    assert int(detached.stdout) != os.getsid(0)
+
+    # Timeouts stop the command alone, never pilotcmd's own group
+    result = asyncio.run(executor.execute_command(Command("sh -c 'sleep 5'", "")))
+    assert result.status == ExecutionStatus.TIMEOUT
+
+
+@pytest.mark.parametrize(
+    "command, prompts",
+    [
+        ("sudo apt update", True),
+        ("echo x | sudo tee /etc/hosts", True),
+        ("cd /tmp && sudo make install", True),
+        ("false || LANG=C /usr/bin/su -c id; true", True),
+        ("(doas ls)", True),
+        ("echo sudo", False),
+        ("echo 'a | sudo ls'", False),
+        ("ls -la > sudo.log", False),
+    ],
+)
+def test_terminal_programs_found_in_any_segment(command, prompts):
+    assert CommandExecutor._prompts_on_terminal(command) is prompts
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from pilotcmd.context_db.manager import ContextManager
+from pilotcmd.executor.command_executor import CommandExecutor, ExecutionStatus
+from pilotcmd.executor.resources import accounting_supported
+from pilotcmd.nlp.parser import Command
+
+pytestmark = pytest.mark.skipif(
+    not accounting_supported(), reason="resource accounting needs os.wait4"
+)
+
+
+def test_resource_usage_is_collected_per_command(mock_os_info):
+    executor = CommandExecutor(mock_os_info)
+    busy = Command("i=0; while [ $i -lt 20000 ]; do i=$((i+1)); done; echo done", "")
+
+    result = asyncio.run(executor.execute_command(busy))
+
+    assert result.success
+    assert result.stdout == "done\n"
+    usage = result.resource_usage
+    assert usage is not None
+    assert usage.cpu_time > 0
+    assert usage.max_rss_kb > 0
+    assert usage.voluntary_switches + usage.involuntary_switches >= 0
+
+
+def test_timeout_still_kills_accounted_process(mock_os_info):
+    executor = CommandExecutor(mock_os_info, timeout=0.2)
+
+    result = asyncio.run(executor.execute_command(Command("sleep 5", "")))
+
+    assert result.status == ExecutionStatus.TIMEOUT
+
+
+def test_history_ranks_expensive_commands(tmp_path, mock_os_info):
+    manager = ContextManager(db_path=str(tmp_path / "context.db"))
+    executor = CommandExecutor(mock_os_info)
+    commands = [
+        Command("sh -c 'i=0; while [ $i -lt 30000 ]; do i=$((i+1)); done'", ""),
+        Command("true", ""),
+    ]
+
+    manager.save_prompt("spin", commands, mock_os_info)
+    results = asyncio.run(executor.execute_commands(commands))
+    manager.save_execution_results(results)
+
+    ranking = manager.get_expensive_commands()
+    assert [row["signature"] for row in ranking] == ["sh", "true"]
+    assert ranking[0]["cpu_time_total"] > ranking[1]["cpu_time_total"]
+    assert ranking[0]["runs"] == 1
+    saved = manager.get_results(1)
+    assert saved[0]["resources"]["user_time"] >= 0
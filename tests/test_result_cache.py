@@ -0,0 +1,153 @@
+import asyncio
+import os
+
+import pytest
+from typer.testing import CliRunner
+
+from pilotcmd.cli import app
+from pilotcmd.executor.command_executor import CommandExecutor
+from pilotcmd.executor.result_cache import ResultCache
+from pilotcmd.nlp.parser import Command
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="POSIX commands")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _run(executor, *commands):
+    return asyncio.run(executor.execute_commands([Command(c, "") for c in commands]))
+
+
+def test_ttls_follow_program_and_purity():
+    cache = ResultCache()
+
+    assert cache.ttl_for(Command("uname -a", "")) > cache.ttl_for(Command("ps aux", "")) > 0
+    assert cache.ttl_for(Command("date", "")) == 0
+    assert cache.ttl_for(Command("mkdir build", "")) == 0
+    assert cache.ttl_for(Command("ls | wc -l", "")) == 0
+
+
+def test_repeated_read_only_probe_is_served_from_cache(mock_os_info, tmp_path):
+    cache = ResultCache()
+    executor = CommandExecutor(mock_os_info, result_cache=cache)
+    probe = f"ls {tmp_path}"
+
+    first = _run(executor, probe)[0]
+    (tmp_path / "new-file").write_text("")
+    second = _run(executor, probe)[0]
+
+    assert not first.cached and second.cached
+    assert second.stdout == first.stdout
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_fresh_bypasses_and_refreshes(mock_os_info, tmp_path):
+    cache = ResultCache()
+    executor = CommandExecutor(mock_os_info, result_cache=cache)
+    probe = f"ls {tmp_path}"
+    _run(executor, probe)
+    (tmp_path / "new-file").write_text("")
+
+    executor.fresh = True
+    fresh = _run(executor, probe)[0]
+    executor.fresh = False
+    again = _run(executor, probe)[0]
+
+    assert not fresh.cached and "new-file" in fresh.stdout
+    assert again.cached and "new-file" in again.stdout
+
+
+def test_entries_expire(mock_os_info):
+    clock = FakeClock()
+    cache = ResultCache(ttls={"uname": 60.0}, clock=clock)
+    executor = CommandExecutor(mock_os_info, result_cache=cache)
+
+    _run(executor, "uname")
+    clock.now += 30
+    assert _run(executor, "uname")[0].cached
+    clock.now += 31
+    assert not _run(executor, "uname")[0].cached
+
+
+def test_state_changing_command_clears_cache(mock_os_info, tmp_path):
+    cache = ResultCache()
+    executor = CommandExecutor(mock_os_info, result_cache=cache)
+
+    results = _run(
+        executor, f"ls {tmp_path}", f"touch {tmp_path}/made", f"ls {tmp_path}"
+    )
+
+    assert not results[2].cached
+    assert "made" in results[2].stdout
+
+
+def test_key_includes_working_directory(mock_os_info, tmp_path):
+    cache = ResultCache()
+    command = Command("ls", "")
+
+    assert cache.key(command, str(tmp_path)) != cache.key(command, "/")
+
+
+class _PlanParser:
+    """Parser stub turning a prompt of ';'-separated commands into a plan."""
+
+    last_usage = None
+
+    def __init__(self, os_info):
+        pass
+
+    async def parse(self, prompt):
+        return [Command(part.strip(), "") for part in prompt.split(";")]
+
+
+@pytest.fixture
+def cli_caches(monkeypatch, tmp_path):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr("pilotcmd.cli.NLPParser", _PlanParser)
+    monkeypatch.setattr("pilotcmd.cli.SimpleParser", _PlanParser)
+    caches = []
+
+    class RecordingCache(ResultCache):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            caches.append(self)
+
+    monkeypatch.setattr("pilotcmd.cli.ResultCache", RecordingCache)
+    return caches
+
+
+def test_run_caches_within_a_plan_unless_fresh(cli_caches, tmp_path):
+    plan = f"ls {tmp_path}; ls {tmp_path}"
+    runner = CliRunner()
+
+    result = runner.invoke(app, ["run", plan, "--run", "--no-stream"])
+    assert result.exit_code == 0, result.stdout
+    result = runner.invoke(app, ["run", plan, "--run", "--fresh", "--no-stream"])
+    assert result.exit_code == 0, result.stdout
+    assert [(cache.hits, cache.misses) for cache in cli_caches] == [(1, 1), (0, 0)]
+
+
+def test_shell_shares_one_cache_across_prompts(cli_caches, monkeypatch, tmp_path):
+    prompts = iter([f"ls {tmp_path}", f"ls {tmp_path}", "quit"])
+
+    class ScriptedSession:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def prompt(self, *args, **kwargs):
+            return next(prompts)
+
+    monkeypatch.setattr("pilotcmd.cli.PromptSession", ScriptedSession)
+
+    result = CliRunner().invoke(
+        app, ["--run", "shell", "--mode", "restricted", "--no-persistent"]
+    )
+
+    assert result.exit_code == 0, result.stdout
+    assert [(cache.hits, cache.misses) for cache in cli_caches] == [(1, 1)]
@@ -0,0 +1,88 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from typer.testing import CliRunner
+
+from pilotcmd.cli import app
+from pilotcmd.context_db.embeddings import VectorIndex, embed
+from pilotcmd.context_db.manager import ContextManager
+
+
+def test_embeddings_relate_paraphrases():
+    disk = embed("disk usage")
+
+    assert embed("disk usage").dtype == np.float32
+    assert abs(float(np.linalg.norm(disk)) - 1.0) < 1e-6
+    assert float(embed("show free space") @ disk) > float(embed("restart nginx") @ disk)
+    # Accents and case do not matter
+    assert np.allclose(embed("Espaço em DISCO"), embed("espaco em disco"))
+
+
+def test_paraphrase_finds_past_successful_command(tmp_path, record_run):
+    manager = ContextManager(db_path=str(tmp_path / "context.db"))
+    disk = record_run(manager, "show free space", "df -h")
+    record_run(manager, "restart nginx", "systemctl restart nginx")
+    record_run(manager, "free space on the backup disk", "rm -rf /backup", success=False)
+
+    matches = manager.get_semantic_matches("disk usage")
+
+    assert [entry.id for entry in matches] == [disk]
+    assert matches[0].commands == ["df -h"]
+    assert 0 < matches[0].similarity <= 1
+
+
+def test_index_is_built_on_first_search_then_appended(tmp_path, record_run):
+    manager = ContextManager(db_path=str(tmp_path / "context.db"))
+    first = record_run(manager, "list running containers", "docker ps")
+    assert not manager.vectors.exists()
+
+    assert [e.id for e in manager.get_semantic_matches("show docker containers")] == [first]
+    assert len(manager.vectors) == 1
+
+    second = record_run(manager, "check memory", "free -h")
+    manager.flush()
+    assert len(manager.vectors) == 2
+    assert manager.get_semantic_matches("show ram")[0].id == second
+
+
+def test_cleared_entries_are_not_returned(tmp_path, record_run):
+    manager = ContextManager(db_path=str(tmp_path / "context.db"))
+    record_run(manager, "show free space", "df -h")
+    manager.get_semantic_matches("disk usage")
+
+    manager.clear_history()
+
+    assert manager.get_semantic_matches("disk usage") == []
+
+
+def test_vector_index_search_and_removal(tmp_path):
+    index = VectorIndex(str(tmp_path / "vectors"), dimensions=64)
+    index.add([(1, "disk usage"), (2, "list files"), (3, "check disk space")])
+
+    best = index.search("disk space", k=2, min_similarity=0.0)
+    assert best[0][0] == 3
+    assert {entry_id for entry_id, _ in best} == {1, 3}
+
+    index.remove([3])
+    assert [entry_id for entry_id, _ in index.search("disk space", k=1)] == [1]
+
+    # A torn append (vector written, id missing) is ignored and overwritten
+    with open(index.vectors_path, "ab") as handle:
+        handle.write(b"\0" * 64 * 4)
+    assert len(index) == 3
+    index.add([(4, "network interfaces")])
+    assert len(index) == 4
+    assert index.search("network", k=1)[0][0] == 4
+
+
+def test_history_similar_option(tmp_path, monkeypatch, record_run):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    manager = ContextManager()
+    record_run(manager, "show free space", "df -h")
+
+    result = CliRunner().invoke(app, ["history", "--similar", "disk usage"])
+
+    assert result.exit_code == 0
+    assert "show free space" in result.stdout
+    assert "Similarity:" in result.stdout
@@ -23,17 +23,7 @@ def test_shell_creates_history(monkeypatch, tmp_path):
                 self.history.append_string(text)
             return text
 
-    def fake_run_command(
-        ctx,
-        prompt,
-        model=None,
-        dry_run=False,
-        auto_run=False,
-        verbose=False,
-        thinking=False,
-        allowed_commands=None,
-        blocked_commands=None,
-    ):
+    def fake_run_command(ctx, prompt, **options):
         calls.append(prompt)
 
     calls = []
@@ -77,6 +67,19 @@ def test_restricted_mode_blocks_command(monkeypatch, capsys):
         def save_execution_results(self, *args, **kwargs):
             pass
 
+        def flush(self):
+            pass
+
+        def history_writer(self, entry_id):
+            class DummyWriter:
+                def progress(self, *args):
+                    pass
+
+                def finish(self, *args, **kwargs):
+                    pass
+
+            return DummyWriter()
+
     class DummyParser:
         last_usage = None
 
@@ -0,0 +1,103 @@
+import sqlite3
+
+from pilotcmd.context_db import prompt_index
+from pilotcmd.context_db.connection import close_database
+from pilotcmd.context_db.manager import ContextManager
+from pilotcmd.nlp.parser import Command
+
+
+def test_rare_words_outrank_common_ones(tmp_path, record_run):
+    manager = ContextManager(db_path=str(tmp_path / "context.db"))
+    for i in range(10):
+        record_run(manager, f"show the files in folder {i}", "ls")
+    nginx = record_run(manager, "restart the nginx service", "systemctl restart nginx")
+
+    similar = manager.get_similar_commands("show nginx logs")
+
+    assert similar[0].id == nginx
+    assert similar[0].commands == ["systemctl restart nginx"]
+    assert len(similar) == 5
+
+
+def test_only_successful_entries_are_suggested(tmp_path, mock_os_info, record_run):
+    manager = ContextManager(db_path=str(tmp_path / "context.db"))
+    record_run(manager, "compress the backups", "tar czf b.tgz b", success=False)
+    manager.save_prompt("compress logs", [Command("gzip *.log", "")], mock_os_info)
+
+    assert manager.get_similar_commands("compress backups") == []
+
+    kept = record_run(manager, "compress the backups", "tar czf b.tgz b")
+    assert [entry.id for entry in manager.get_similar_commands("compress backups")] == [kept]
+
+
+def test_index_follows_deleted_entries(tmp_path, record_run):
+    manager = ContextManager(db_path=str(tmp_path / "context.db"))
+    record_run(manager, "check disk usage", "df -h")
+
+    manager.clear_history()
+
+    assert manager.get_similar_commands("disk usage") == []
+    with manager._db.transaction() as cursor:
+        cursor.execute("SELECT documents, total_length FROM prompt_index_stats")
+        assert cursor.fetchone() == (0, 0)
+        cursor.execute("SELECT COUNT(*) FROM prompt_index_df")
+        assert cursor.fetchone()[0] == 0
+
+
+def test_top_k_matches_exhaustive_bm25(tmp_path, record_run):
+    manager = ContextManager(db_path=str(tmp_path / "context.db"))
+    prompts = [
+        "show network interfaces",
+        "show disk usage",
+        "list docker containers",
+        "show docker images",
+        "restart docker",
+        "show network routes and docker networks",
+        "check memory usage",
+    ]
+    for prompt in prompts:
+        record_run(manager, prompt, "true")
+
+    query = "show docker network usage"
+    with manager._db.transaction() as cursor:
+        best = prompt_index.top_k(cursor, query, 3)
+
+    # Reference: score every prompt
+    terms = set(prompt_index.tokenize(query))
+    tokens = [prompt_index.tokenize(prompt) for prompt in prompts]
+    average = sum(map(len, tokens)) / len(tokens)
+    expected = []
+    for entry_id, words in enumerate(tokens, start=1):
+        score = 0.0
+        for term in terms & set(words):
+            df = sum(term in other for other in tokens)
+            tf = words.count(term)
+            norm = prompt_index.BM25_K1 * (
+                1 - prompt_index.BM25_B + prompt_index.BM25_B * len(words) / average
+            )
+            score += prompt_index.idf(len(tokens), df) * tf * (prompt_index.BM25_K1 + 1) / (tf + norm)
+        if score:
+            expected.append((entry_id, score))
+    expected.sort(key=lambda item: (item[1], item[0]), reverse=True)
+
+    assert [entry_id for entry_id, _ in best] == [entry_id for entry_id, _ in expected[:3]]
+    for (_, score), (_, reference) in zip(best, expected):
+        assert abs(score - reference) < 1e-9
+
+
+def test_existing_history_is_indexed_on_upgrade(tmp_path, record_run):
+    path = str(tmp_path / "context.db")
+    manager = ContextManager(db_path=path)
+    entry_id = record_run(manager, "find large files", "du -ah | sort -h")
+    with manager._db.transaction() as cursor:
+        prompt_index.unindex_prompt(cursor, entry_id)
+        cursor.execute("DROP TABLE prompt_index_terms")
+        cursor.execute("PRAGMA user_version = 3")
+
+    close_database(path)
+    upgraded = ContextManager(db_path=path)
+
+    assert [entry.id for entry in upgraded.get_similar_commands("large files")] == [entry_id]
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] >= 4
+    conn.close()
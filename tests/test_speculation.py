@@ -0,0 +1,126 @@
+import asyncio
+import subprocess
+import time
+
+import pytest
+
+from pilotcmd.executor import command_executor
+from pilotcmd.executor.command_executor import CommandExecutor
+from pilotcmd.executor.speculation import is_side_effect_free
+from pilotcmd.nlp.parser import Command, SafetyLevel
+
+
+def _cmd(text, safety=SafetyLevel.SAFE, sudo=False):
+    return Command(command=text, explanation="", safety_level=safety, requires_sudo=sudo)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "ls -la",
+        "df -h",
+        "ps aux",
+        "ip addr show",
+        "ip -br a",
+        "uname -a",
+        "find . -name x",
+        "env",
+        "env -u HOME -0 LANG=C",
+        "ss -tlnp",
+        "date +%F",
+        "date -u -d yesterday +%s",
+        "date -Iseconds",
+        "tree -L 2",
+        "file -b notes.txt",
+        "hostname",
+    ],
+)
+def test_read_only_commands_are_side_effect_free(text):
+    assert is_side_effect_free(_cmd(text))
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "ls > out.txt",
+        "ls; rm x",
+        "echo $(whoami)",
+        "ip addr add 10.0.0.1/24 dev eth0",
+        "find . -delete",
+        "tail -f /var/log/syslog",
+        "date -s 10:00",
+        "hostname newname",
+        "rm -rf build",
+        'env "-Srm -rf /tmp/zz"',
+        "env -i sh",
+        "env FOO=1 touch x",
+        "tree -o listing.txt",
+        "date -s2020-01-01",
+        "date --se=10:00",
+        "date 010100002030",
+        "date -u 010100002030",
+        "ss -K dst 10.0.0.1",
+        "ss -tK",
+        "hostname -F /etc/hostname",
+        "hostname -I",
+        "file -C -m x",
+        "tail -fn 5 log",
+    ],
+)
+def test_writing_commands_are_not_side_effect_free(text):
+    assert not is_side_effect_free(_cmd(text))
+
+
+def test_caution_and_sudo_commands_are_not_side_effect_free():
+    assert not is_side_effect_free(_cmd("ls", safety=SafetyLevel.CAUTION))
+    assert not is_side_effect_free(_cmd("ls", sudo=True))
+
+
+def test_confirmed_speculation_reuses_buffered_output(mock_os_info):
+    executor = CommandExecutor(mock_os_info)
+    commands = [_cmd("echo prefetched")]
+
+    assert executor.start_speculation(commands)
+    time.sleep(0.2)
+    results = asyncio.run(executor.execute_commands(commands))
+
+    assert results[0].success
+    assert results[0].stdout.startswith("prefetched")
+    assert executor.last_hidden_latency > 0
+
+
+def test_speculation_is_skipped_for_plans_with_side_effects(mock_os_info):
+    executor = CommandExecutor(mock_os_info)
+
+    assert not executor.start_speculation([_cmd("ls"), _cmd("mkdir build")])
+
+
+def test_discarded_speculation_stops_running_commands(mock_os_info):
+    executor = CommandExecutor(mock_os_info)
+    assert executor.start_speculation([_cmd("sleep 10")])
+
+    started = time.monotonic()
+    executor.discard_speculation()
+
+    assert time.monotonic() - started < 5
+    assert executor._speculation is None
+
+
+def test_speculative_commands_do_not_read_the_terminal(monkeypatch, mock_os_info):
+    spawned = []
+    original = command_executor.spawn_accounted
+
+    async def recording_spawn(args, **kwargs):
+        spawned.append(kwargs.get("stdin"))
+        return await original(args, **kwargs)
+
+    monkeypatch.setattr(command_executor, "accounting_supported", lambda: True)
+    monkeypatch.setattr(command_executor, "spawn_accounted", recording_spawn)
+    executor = CommandExecutor(mock_os_info)
+    commands = [_cmd("cat")]
+
+    assert executor.start_speculation(commands)
+    results = asyncio.run(executor.execute_commands(commands))
+
+    assert results[0].success and results[0].stdout == ""
+    assert spawned == [subprocess.DEVNULL]
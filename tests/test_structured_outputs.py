@@ -0,0 +1,138 @@
+import asyncio
+import json
+
+import pytest
+
+from pilotcmd.models.base import RESPONSE_SCHEMAS
+from pilotcmd.nlp.parser import NLPParser, SafetyLevel
+from pilotcmd.os_utils.detector import OSInfo, OSType
+
+openai_model = pytest.importorskip("pilotcmd.models.openai_model")
+
+
+class FakeCompletions:
+    def __init__(self):
+        self.kwargs = None
+
+    def create(self, **kwargs):
+        self.kwargs = kwargs
+        return None
+
+
+def _openai(model_name, **kwargs):
+    model = openai_model.OpenAIModel(model_name, api_key="test", **kwargs)
+    completions = FakeCompletions()
+    model.client = type(
+        "Client", (), {"chat": type("Chat", (), {"completions": completions})()}
+    )()
+    return model, completions
+
+
+def _parser():
+    model, _ = _openai("gpt-4o-mini")
+    os_info = OSInfo(
+        type=OSType.LINUX,
+        name="Linux",
+        version="1",
+        architecture="x86_64",
+        shell="bash",
+    )
+    return NLPParser(model, os_info)
+
+
+def test_openai_requests_strict_schema_when_supported():
+    model, completions = _openai("gpt-4o-mini")
+
+    model._make_openai_request("list files", {"response_schema": "command_plan"})
+
+    response_format = completions.kwargs["response_format"]
+    assert response_format["type"] == "json_schema"
+    assert response_format["json_schema"]["strict"] is True
+    assert response_format["json_schema"]["schema"] == RESPONSE_SCHEMAS["command_plan"]
+
+
+def test_openai_falls_back_to_json_object():
+    model, completions = _openai("gpt-3.5-turbo")
+
+    model._make_openai_request("list files", {"response_schema": "command_plan"})
+
+    assert completions.kwargs["response_format"] == {"type": "json_object"}
+
+
+def test_schemas_are_strict():
+    def check(schema):
+        if schema.get("type") == "object":
+            assert schema["additionalProperties"] is False
+            assert set(schema["required"]) == set(schema["properties"])
+            for child in schema["properties"].values():
+                check(child)
+        elif schema.get("type") == "array":
+            check(schema["items"])
+
+    for schema in RESPONSE_SCHEMAS.values():
+        check(schema)
+
+
+def test_schema_conforming_answer_decodes_into_commands():
+    content = json.dumps(
+        {
+            "commands": [
+                {
+                    "step": 1,
+                    "command": "df -h",
+                    "explanation": "disk usage",
+                    "revert": None,
+                    "safety_level": "caution",
+                    "requires_sudo": False,
+                }
+            ],
+            "os_specific": True,
+            "warning": None,
+        }
+    )
+
+    result = _parser()._parse_model_response(content)
+
+    assert result.os_specific is True
+    assert result.commands[0].command == "df -h"
+    assert result.commands[0].safety_level is SafetyLevel.CAUTION
+
+
+def test_non_conforming_answer_uses_lenient_decoding():
+    content = '```json\n{"commands": [{"command": "ls", "safety_level": "SAFE"}]}\n```'
+
+    result = _parser()._parse_model_response(content)
+
+    assert result.commands[0].command == "ls"
+    assert result.commands[0].explanation == ""
+    assert result.commands[0].safety_level is SafetyLevel.SAFE
+
+
+def test_ollama_falls_back_to_json_when_the_schema_is_rejected(monkeypatch):
+    httpx = pytest.importorskip("httpx")
+    from pilotcmd.models.ollama_model import OllamaModel
+
+    formats = []
+
+    def handler(request):
+        payload = json.loads(request.content)
+        formats.append(payload["format"])
+        if payload["format"] != "json":
+            return httpx.Response(400, text="invalid format")
+        return httpx.Response(200, json={"response": '{"commands": []}'})
+
+    client = httpx.AsyncClient
+    monkeypatch.setattr(
+        httpx,
+        "AsyncClient",
+        lambda **kwargs: client(transport=httpx.MockTransport(handler), **kwargs),
+    )
+    model = OllamaModel()
+
+    for _ in range(2):
+        response = asyncio.run(
+            model.generate_response("list files", response_schema="command_plan")
+        )
+        assert response.content == '{"commands": []}'
+
+    assert formats == [RESPONSE_SCHEMAS["command_plan"], "json", "json"]
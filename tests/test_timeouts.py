@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+from pilotcmd.context_db.manager import ContextManager
+from pilotcmd.executor.command_executor import (
+    CommandExecutor,
+    ExecutionResult,
+    ExecutionStatus,
+)
+from pilotcmd.executor.timeouts import (
+    MIN_TIMEOUT,
+    SAFETY_FACTOR,
+    CommandTiming,
+    TimeoutPolicy,
+    percentile,
+)
+from pilotcmd.nlp.parser import Command
+from pilotcmd.utils.command_signature import command_signature
+
+
+@pytest.mark.parametrize(
+    "command,signature",
+    [
+        ("sudo apt-get install -y nginx", "apt-get install"),
+        ("ping -c 4 google.com", "ping"),
+        ("sudo -u bob git -C repo status", "git status"),
+        ("LANG=C /usr/bin/ls -la | wc -l", "ls"),
+        ("docker --debug build .", "docker build"),
+        ("", ""),
+    ],
+)
+def test_command_signature(command, signature):
+    assert command_signature(command) == signature
+
+
+def test_percentile_nearest_rank():
+    samples = [float(i) for i in range(1, 101)]
+    assert percentile(samples, 0.5) == 50.0
+    assert percentile(samples, 0.95) == 95.0
+    assert percentile([3.0], 0.95) == 3.0
+
+
+def _timing(signature, samples):
+    return CommandTiming.from_samples(signature, samples, len(samples))
+
+
+def test_policy_learns_from_history():
+    policy = TimeoutPolicy(
+        {
+            "ping": _timing("ping", [1.0, 1.1, 1.2, 1.0]),
+            "apt-get install": _timing("apt-get install", [300.0, 400.0, 500.0]),
+        },
+        default_timeout=30,
+    )
+
+    assert policy.timeout_for(Command("ping -c 4 example.com", "")) == MIN_TIMEOUT
+    assert policy.timeout_for(Command("sudo apt-get install vim", "")) == 500.0 * SAFETY_FACTOR
+    assert policy.timeout_for(Command("uptime", "")) == 30
+    assert policy.estimate_plan([Command("ping x", ""), Command("apt-get install y", "")]) == 401.0
+    assert policy.estimate_plan([Command("uptime", "")]) is None
+
+
+def test_fast_history_does_not_shorten_slow_commands():
+    policy = TimeoutPolicy(
+        {"apt-get install": _timing("apt-get install", [0.5, 0.6, 0.7])}, default_timeout=30
+    )
+
+    # A few quick installs say nothing about the next package
+    assert policy.timeout_for(Command("sudo apt-get install -y texlive-full", "")) == 900.0
+
+
+def test_policy_uses_defaults_until_enough_samples():
+    policy = TimeoutPolicy({"pip install": _timing("pip install", [2.0])}, default_timeout=30)
+
+    # Known slow signature keeps its generous starting timeout
+    assert policy.timeout_for(Command("pip install requests", "")) > 30
+
+
+def test_timings_are_recorded_on_write(tmp_path, mock_os_info):
+    manager = ContextManager(db_path=str(tmp_path / "context.db"))
+    for duration in (0.5, 0.7, 0.6):
+        manager.save_prompt("ping", [Command("ping -c 1 x", "")], mock_os_info)
+        manager.save_execution_results(
+            [
+                ExecutionResult(
+                    command=Command("ping -c 1 x", ""),
+                    status=ExecutionStatus.SUCCESS,
+                    return_code=0,
+                    stdout="",
+                    stderr="",
+                    execution_time=duration,
+                    timestamp=0.0,
+                )
+            ]
+        )
+
+    timings = manager.get_timings(["ping", "unknown"])
+
+    assert list(timings) == ["ping"]
+    assert timings["ping"].count == 3
+    assert timings["ping"].p50 == 0.6
+    assert timings["ping"].p95 == 0.7
+
+
+def test_executor_applies_per_command_timeout(mock_os_info):
+    executor = CommandExecutor(
+        mock_os_info, timeout=30, timeout_provider=lambda command: 0.2
+    )
+
+    result = asyncio.run(executor.execute_command(Command("sleep 5", "")))
+
+    assert result.status == ExecutionStatus.TIMEOUT
+    assert "0.2 seconds" in result.stderr
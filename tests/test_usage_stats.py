@@ -0,0 +1,103 @@
+import sqlite3
+
+from typer.testing import CliRunner
+
+from pilotcmd.cli import app
+from pilotcmd.context_db import usage_stats
+from pilotcmd.context_db.connection import close_database
+from pilotcmd.context_db.manager import ContextManager
+from pilotcmd.context_db.retention import RetentionPolicy
+from pilotcmd.nlp.parser import Command
+
+
+def test_counters_follow_inserts_and_updates(tmp_path, mock_os_info, record_run):
+    manager = ContextManager(db_path=str(tmp_path / "context.db"))
+    record_run(manager, "list files", seconds=0.05)
+    record_run(manager, "list files", seconds=2.0)
+    record_run(manager, "reboot", success=False)
+    manager.save_prompt("still running", [Command("sleep 100", "")], mock_os_info)
+
+    stats = manager.get_stats()
+
+    assert stats["total_commands"] == 4
+    assert stats["successful_commands"] == 2
+    assert stats["success_rate"] == 0.5
+    assert abs(stats["average_execution_time"] - 1.025) < 1e-9
+    counts = {row["bucket"]: row["count"] for row in stats["execution_time_histogram"]}
+    assert counts["< 0.1s"] == 1
+    assert counts["1–5s"] == 1
+    assert sum(counts.values()) == 2
+    assert stats["common_prompts"][0] == {"prompt": "list files", "count": 2, "error": 0}
+
+
+def test_counters_survive_pruning(tmp_path, record_run):
+    manager = ContextManager(
+        db_path=str(tmp_path / "context.db"), retention=RetentionPolicy(max_rows=2)
+    )
+    for i in range(5):
+        record_run(manager, f"prompt {i}")
+
+    assert len(manager.get_history(limit=10)) == 2
+    assert manager.get_stats()["total_commands"] == 5
+    assert manager.get_stats()["successful_commands"] == 5
+
+
+def test_space_saving_sketch_keeps_heavy_hitters(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "sketch.db"))
+    conn.execute(
+        "CREATE TABLE prompt_sketch (key TEXT PRIMARY KEY, prompt TEXT, count INTEGER, error INTEGER)"
+    )
+    cursor = conn.cursor()
+    stream = []
+    for i in range(200):
+        stream.append("check disk")
+        if i % 2 == 0:
+            stream.append("Show  Memory")
+        stream.append(f"one-off {i}")
+
+    for prompt in stream:
+        usage_stats.record_prompt(cursor, prompt, capacity=8)
+
+    rows = cursor.execute(
+        "SELECT key, count, error FROM prompt_sketch ORDER BY count DESC"
+    ).fetchall()
+    assert len(rows) == 8
+    assert rows[0][0] == "check disk" and rows[0][1] - rows[0][2] <= 200 <= rows[0][1]
+    assert rows[1][0] == "show memory" and rows[1][1] - rows[1][2] <= 100 <= rows[1][1]
+    conn.close()
+
+
+def test_existing_history_is_counted_on_upgrade(tmp_path, record_run):
+    path = str(tmp_path / "context.db")
+    manager = ContextManager(db_path=path)
+    record_run(manager, "uptime")
+    record_run(manager, "uptime")
+    record_run(manager, "df", success=False)
+    with manager._db.transaction() as cursor:
+        for table in ("usage_stats", "usage_time_histogram", "prompt_sketch"):
+            cursor.execute(f"DROP TABLE {table}")
+        cursor.execute("PRAGMA user_version = 4")
+    close_database(path)
+
+    stats = ContextManager(db_path=path).get_stats()
+
+    assert stats["total_commands"] == 3
+    assert stats["successful_commands"] == 2
+    assert stats["common_prompts"][0]["prompt"] == "uptime"
+    assert stats["common_prompts"][0]["count"] == 2
+
+
+def test_stats_command(tmp_path, monkeypatch, record_run):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    runner = CliRunner()
+    assert "No commands recorded" in runner.invoke(app, ["stats"]).stdout
+
+    manager = ContextManager()
+    record_run(manager, "show [bold]disk[/bold]")
+
+    result = runner.invoke(app, ["stats"])
+
+    assert result.exit_code == 0
+    assert "Prompts run: 1" in result.stdout
+    assert "show [bold]disk[/bold]" in result.stdout
+    assert "Most frequent prompts" in result.stdout
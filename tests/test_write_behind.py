@@ -0,0 +1,218 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+
+from pilotcmd.cli import _flush_history
+from pilotcmd.context_db import connection
+from pilotcmd.context_db.connection import close_database, get_database
+from pilotcmd.context_db.manager import ContextManager
+from pilotcmd.executor.command_executor import ExecutionResult, ExecutionStatus
+from pilotcmd.nlp.parser import Command
+
+
+def _result(command):
+    return ExecutionResult(
+        command=Command(command, ""),
+        status=ExecutionStatus.SUCCESS,
+        return_code=0,
+        stdout=command,
+        stderr="",
+        execution_time=0.1,
+        timestamp=0.0,
+    )
+
+
+def _steps(path):
+    other = sqlite3.connect(path)
+    rows = other.execute("SELECT command FROM command_steps ORDER BY step").fetchall()
+    other.close()
+    return [row[0] for row in rows]
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_writes_are_queued_and_read_back_in_order(tmp_path, mock_os_info, monkeypatch):
+    monkeypatch.setattr(connection, "FLUSH_INTERVAL", 60)
+    path = str(tmp_path / "context.db")
+    manager = ContextManager(db_path=path)
+    entry_id = manager.save_prompt("three steps", [Command("ls", "")], mock_os_info)
+    writer = manager.history_writer(entry_id)
+    for index in range(3):
+        writer.record_step(_result(f"echo {index}"), index)
+    writer.finish()
+
+    # Not committed yet, but this process reads its own writes
+    assert _steps(path) == []
+    assert [r["command"] for r in manager.get_results(entry_id)] == ["echo 0", "echo 1", "echo 2"]
+    assert manager.get_history()[0].success
+
+    assert _steps(path) == ["echo 0", "echo 1", "echo 2"]
+
+
+def test_background_writer_flushes_after_the_interval(tmp_path, mock_os_info):
+    path = str(tmp_path / "context.db")
+    manager = ContextManager(db_path=path)
+    entry_id = manager.save_prompt("one step", [Command("ls", "")], mock_os_info)
+    manager.record_step(entry_id, 0, _result("ls"))
+
+    assert _wait_for(lambda: _steps(path) == ["ls"])
+
+
+def test_full_batch_is_written_without_waiting(tmp_path, mock_os_info, monkeypatch):
+    monkeypatch.setattr(connection, "FLUSH_INTERVAL", 60)
+    path = str(tmp_path / "context.db")
+    manager = ContextManager(db_path=path)
+    entry_id = manager.save_prompt("many steps", [Command("ls", "")], mock_os_info)
+    # save_prompt queued its own bookkeeping
+    for index in range(connection.MAX_BATCH - 1):
+        manager.record_step(entry_id, index, _result(f"echo {index}"))
+
+    assert _wait_for(lambda: len(_steps(path)) == connection.MAX_BATCH - 1)
+
+
+def test_failed_write_is_isolated_and_reported(tmp_path):
+    path = str(tmp_path / "context.db")
+    database = get_database(path)
+    with database.transaction() as cursor:
+        cursor.execute("CREATE TABLE notes (text TEXT)")
+
+    def insert(value):
+        return lambda cursor: cursor.execute("INSERT INTO notes VALUES (?)", (value,))
+
+    def broken(cursor):
+        cursor.execute("INSERT INTO no_such_table VALUES (1)")
+
+    database.enqueue(insert("before"))
+    database.enqueue(broken)
+    database.enqueue(insert("after"))
+
+    with pytest.raises(sqlite3.OperationalError):
+        database.flush()
+    # Reported once; the other writes of the batch are kept
+    database.flush()
+    with database.transaction() as cursor:
+        cursor.execute("SELECT text FROM notes ORDER BY rowid")
+        assert [row[0] for row in cursor.fetchall()] == ["before", "after"]
+    close_database(path)
+
+
+def test_writes_survive_a_locked_database(tmp_path, monkeypatch):
+    monkeypatch.setattr(connection, "RETRY_DELAY", 0.01)
+    path = str(tmp_path / "context.db")
+    database = get_database(path)
+    with database.transaction() as cursor:
+        cursor.execute("CREATE TABLE notes (text TEXT)")
+        cursor.execute("PRAGMA busy_timeout = 50")
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+
+    database.enqueue(lambda cursor: cursor.execute("INSERT INTO notes VALUES ('kept')"))
+    with pytest.raises(sqlite3.OperationalError):
+        database.flush()
+    # Reads still work while the writes wait
+    with database.transaction() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM notes")
+        assert cursor.fetchone() == (0,)
+    time.sleep(0.2)
+    assert database._writer.is_alive()
+
+    other.execute("COMMIT")
+    other.close()
+
+    # The background writer retries on its own
+    def saved():
+        check = sqlite3.connect(path)
+        rows = check.execute("SELECT text FROM notes").fetchall()
+        check.close()
+        return rows == [("kept",)]
+
+    assert _wait_for(saved)
+    close_database(path)
+
+
+def test_synchronous_mode(tmp_path, mock_os_info):
+    path = str(tmp_path / "context.db")
+    manager = ContextManager(db_path=path, write_behind=False)
+    entry_id = manager.save_prompt("sync", [Command("ls", "")], mock_os_info)
+    manager.record_step(entry_id, 0, _result("ls"))
+
+    assert _steps(path) == ["ls"]
+
+
+CRASH_SCRIPT = """
+import os, sys
+from pilotcmd.cli import _flush_history
+from pilotcmd.context_db import connection
+from pilotcmd.context_db.manager import ContextManager
+from pilotcmd.executor.command_executor import ExecutionResult, ExecutionStatus
+from pilotcmd.nlp.parser import Command
+from pilotcmd.os_utils.detector import OSInfo, OSType
+
+connection.FLUSH_INTERVAL = 60
+manager = ContextManager(db_path=sys.argv[1])
+os_info = OSInfo(OSType.LINUX, "Linux", "6", "x86_64", "bash", "apt")
+entry_id = manager.save_prompt("crash", [Command("ls", "")], os_info)
+
+def step(index):
+    manager.record_step(entry_id, index, ExecutionResult(
+        command=Command(f"echo {index}", ""), status=ExecutionStatus.SUCCESS,
+        return_code=0, stdout="", stderr="", execution_time=0.1, timestamp=0.0,
+    ))
+
+step(0)
+step(1)
+manager.flush()
+step(2)
+if sys.argv[2] == "kill":
+    os._exit(1)
+"""
+
+
+def _run_script(path, mode):
+    subprocess.run(
+        [sys.executable, "-c", textwrap.dedent(CRASH_SCRIPT), path, mode],
+        check=mode != "kill",
+        env={"PYTHONPATH": os.pathsep.join(sys.path)},
+    )
+
+
+def test_killed_process_keeps_flushed_writes(tmp_path):
+    path = str(tmp_path / "context.db")
+    _run_script(path, "kill")
+
+    # Everything up to the flush survives, the queued step is lost
+    assert _steps(path) == ["echo 0", "echo 1"]
+    other = sqlite3.connect(path)
+    assert other.execute("PRAGMA integrity_check").fetchone() == ("ok",)
+    other.close()
+
+
+def test_normal_exit_writes_everything(tmp_path):
+    path = str(tmp_path / "context.db")
+    _run_script(path, "exit")
+
+    assert _steps(path) == ["echo 0", "echo 1", "echo 2"]
+
+
+def test_cli_reports_writes_that_failed(tmp_path, capsys):
+    manager = ContextManager(db_path=str(tmp_path / "context.db"))
+
+    def broken(cursor):
+        cursor.execute("INSERT INTO no_such_table VALUES (1)")
+
+    manager._db.enqueue(broken)
+    _flush_history(manager)
+
+    assert "History was not fully saved" in capsys.readouterr().out